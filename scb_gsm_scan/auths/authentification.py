@@ -1,4 +1,5 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from scb_gsm_scan.timing import span
 
 class JWTAuthenticationFromCookie(JWTAuthentication):
     def authenticate(self, request):
@@ -7,5 +8,6 @@ class JWTAuthenticationFromCookie(JWTAuthentication):
         if not raw_token:
             return None  # pas connecté
 
-        validated_token = self.get_validated_token(raw_token)
-        return self.get_user(validated_token), validated_token
+        with span('auth'):
+            validated_token = self.get_validated_token(raw_token)
+            return self.get_user(validated_token), validated_token
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.11 on 2026-10-18 17:17
+
+import django.db.models.deletion
+import scb_gsm_scan.mixins
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # 0002 ajoute la clé primaire id avant de retirer celle de l'email, ce que
+    # PostgreSQL refuse : les nouvelles bases créent directement le schéma final.
+    replaces = [('auths', '0001_initial'), ('auths', '0002_user_id_alter_user_email')]
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Role',
+            fields=[
+                ('slug', models.SlugField(max_length=255, primary_key=True, serialize=False, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth.group')),
+            ],
+            bases=(models.Model, scb_gsm_scan.mixins.SlugifyMixin),
+        ),
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('password', models.CharField(max_length=128)),
+                ('last_login', models.DateTimeField(blank=True, null=True)),
+                ('is_staff', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_superuser', models.BooleanField(default=False)),
+                ('date_joined', models.DateTimeField(auto_now_add=True)),
+                ('groups', models.ManyToManyField(blank=True, to='auth.group')),
+                ('user_permissions', models.ManyToManyField(blank=True, to='auth.permission')),
+                ('roles', models.ManyToManyField(blank=True, to='auths.role')),
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'ordering': ('-date_joined',),
+            },
+        ),
+    ]
@@ -1,22 +1,27 @@
 from django.contrib import admin
-from gsm_coverage.models import GSMData, GSMScan, CSVLine
+from django.urls import reverse
+from django.utils.html import format_html
+from gsm_coverage.models import GSMData, GSMScan, CSVLine, IngestJob, CoverageTile, CellAggregate, MeasurementArchive
 from django.contrib.auth.models import Group
-
-# --- Inline pour CSVLine dans GSMScan ---
-class CSVLineInline(admin.TabularInline):
-    model = GSMScan.csv_lines.through  # ManyToMany via table intermédiaire
-    extra = 0
-    verbose_name = "CSV Line"
-    verbose_name_plural = "CSV Lines"
+from gsm_coverage.stats import STATISTICS_FIELDS
 
 # --- Admin GSMScan ---
 @admin.register(GSMScan)
 class GSMScanAdmin(admin.ModelAdmin):
-    list_display = ('id', 'file', 'get_operators', 'created_at')
+    list_display = ('id', 'file', 'get_operators', 'line_count', 'cell_count', 'rsrp_mean', 'time_start', 'created_at')
     search_fields = ('file',)
+    readonly_fields = (*STATISTICS_FIELDS, 'get_csv_lines')
     list_filter = ('csv_lines__rat', 'csv_lines__mccmnc', 'csv_lines__band', 'created_at')
     date_hierarchy = 'created_at'
-    inlines = [CSVLineInline]
+
+    def get_csv_lines(self, obj):
+        # Lien vers les lignes du scan (liste paginée) plutôt qu'un inline
+        # chargeant toutes les lignes en formulaires
+        if obj.pk is None:
+            return "-"
+        url = reverse('admin:gsm_coverage_csvline_changelist') + f'?scan__id__exact={obj.pk}'
+        return format_html('<a href="{}">{} ligne(s)</a>', url, obj.line_count or 0)
+    get_csv_lines.short_description = "CSV Lines"
 
     def get_operators(self, obj):
         # Retourne tous les opérateurs associés à ce scan
@@ -37,7 +42,7 @@ class OperatorListFilter(admin.SimpleListFilter):
         if self.value():
             # Filtre CSVLine via GSMScan -> GSMData -> operator
             return queryset.filter(
-                gsmscan__gsmdata__operator__id=self.value()
+                scan__gsmdata__operator__id=self.value()
             ).distinct()
         return queryset
 
@@ -45,7 +50,7 @@ class OperatorListFilter(admin.SimpleListFilter):
 class CSVLineAdmin(admin.ModelAdmin):
     list_display = ('id', 'time', 'lat', 'lon', 'alt', 'rat', 'mccmnc', 'cell_id', 'band', 'rsrp_dbm')
     search_fields = ('rat', 'mccmnc', 'cell_id')
-    list_filter = (OperatorListFilter, 'rat', 'mccmnc', 'band', 'time')
+    list_filter = (OperatorListFilter, ('scan', admin.EmptyFieldListFilter), 'rat', 'mccmnc', 'band', 'time')
     date_hierarchy = 'time'
 
 # --- Admin GSMData ---
@@ -59,3 +64,31 @@ class GSMDataAdmin(admin.ModelAdmin):
     def get_scans(self, obj):
         return ", ".join([str(scan.file) for scan in obj.gsm_scan.all()])
     get_scans.short_description = "GSM Scans"
+
+# --- Admin IngestJob ---
+@admin.register(IngestJob)
+class IngestJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'operator', 'state', 'rows_processed', 'rows_rejected', 'created_at', 'finished_at')
+    list_filter = ('state', 'operator')
+    readonly_fields = ('scan', 'rows_processed', 'rows_rejected', 'error', 'started_at', 'finished_at')
+    date_hierarchy = 'created_at'
+
+# --- Admin CoverageTile ---
+@admin.register(CoverageTile)
+class CoverageTileAdmin(admin.ModelAdmin):
+    list_display = ('id', 'operator', 'rat', 'band', 'z', 'x', 'y', 'line_count', 'updated_at')
+    list_filter = ('operator', 'rat', 'band', 'z')
+    readonly_fields = ('cells',)
+
+# --- Admin CellAggregate ---
+@admin.register(CellAggregate)
+class CellAggregateAdmin(admin.ModelAdmin):
+    list_display = ('id', 'mccmnc', 'rat', 'cell_id', 'band', 'earfcn', 'count', 'first_seen', 'last_seen')
+    search_fields = ('cell_id', 'mccmnc')
+    list_filter = ('rat', 'mccmnc', 'band')
+
+# --- Admin MeasurementArchive ---
+@admin.register(MeasurementArchive)
+class MeasurementArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'month', 'line_count', 'size', 'first_time', 'last_time', 'updated_at')
+    readonly_fields = ('month', 'file', 'line_count', 'size', 'first_time', 'last_time')
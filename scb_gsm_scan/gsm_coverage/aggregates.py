@@ -0,0 +1,370 @@
+"""
+Agrégats par cellule radio (CellAggregate), tenus à jour de façon
+incrémentale.
+
+- À l'import, les lignes insérées sont agrégées par cellule (pandas) puis
+  fusionnées dans les agrégats existants : effectifs et sommes sont
+  additionnés, extrêmes et dates comparés.
+- À la suppression de lignes (remplacement du fichier d'un scan), leurs
+  contributions sont soustraites. Les extrêmes et dates ne se soustraient
+  pas : ils ne sont recalculés depuis les lignes restantes que pour les
+  cellules dont un extrême provenait des lignes supprimées.
+
+Les agrégats comptent aussi les lignes archivées (gsm_coverage.partitions) :
+l'archivage d'un mois ne les change pas, et recalculs d'extrêmes et
+reconstruction lisent aussi les archives.
+
+Additions et soustractions sont calculées par la base (INSERT ... ON
+CONFLICT DO UPDATE, UPDATE champ = champ - valeur) et non relues puis
+réécrites : des imports simultanés (jobs, PostgreSQL) ne perdent aucune
+contribution et ne créent pas deux fois le même agrégat.
+"""
+from django.db import connection
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.utils import timezone
+from gsm_coverage.ingest import FLOAT32_DECIMALS
+from gsm_coverage.models import CellAggregate, CSVLine
+import numpy as np
+import pandas as pd
+
+
+CELL_KEY = ['mccmnc', 'rat', 'cell_id', 'band', 'earfcn']
+SIGNALS = {'rsrp': 'rsrp_dbm', 'rsrq': 'rsrq_db', 'sinr': 'sinr_db'}
+LINE_COLUMNS = CELL_KEY + ['time', 'lat', 'lon'] + list(SIGNALS.values())
+
+ADDITIVE_FIELDS = ['count', 'coord_count', 'lat_sum', 'lon_sum'] + [
+    f'{signal}_{suffix}' for signal in SIGNALS for suffix in ('count', 'sum', 'sum_sq')
+]
+MIN_FIELDS = ['first_seen'] + [f'{signal}_min' for signal in SIGNALS]
+MAX_FIELDS = ['last_seen'] + [f'{signal}_max' for signal in SIGNALS]
+AGGREGATE_FIELDS = ADDITIVE_FIELDS + MIN_FIELDS + MAX_FIELDS
+
+# Nombre de cell_id par requête de lecture des agrégats existants
+LOOKUP_CHUNK_SIZE = 500
+
+
+def _key_values(series):
+    return series.astype(object).where(series.notna(), None)
+
+
+def aggregate_frame(df):
+    """
+    Agrégats par cellule des lignes du DataFrame (colonnes du CSV).
+    Les lignes sans cell_id sont ignorées.
+    """
+    df = df[df['cell_id'].notna()]
+    if df.empty:
+        return pd.DataFrame(columns=CELL_KEY + AGGREGATE_FIELDS)
+
+    lat = pd.to_numeric(df['lat'], errors='coerce').to_numpy(dtype='float64')
+    lon = pd.to_numeric(df['lon'], errors='coerce').to_numpy(dtype='float64')
+    located = ~(np.isnan(lat) | np.isnan(lon))
+    frame = pd.DataFrame({
+        'mccmnc': _key_values(df['mccmnc'].astype('string')).to_numpy(),
+        'rat': _key_values(df['rat'].astype('string')).to_numpy(),
+        'cell_id': pd.to_numeric(df['cell_id']).astype('int64').to_numpy(),
+        'band': _key_values(df['band'].astype('string')).to_numpy(),
+        'earfcn': pd.to_numeric(df['earfcn'], errors='coerce').fillna(-1).astype('int64').to_numpy(),
+        'count': 1,
+        'time': pd.to_datetime(df['time'], utc=True, errors='coerce', format='ISO8601').array,
+        'coord_count': located.astype('int64'),
+        'lat_sum': np.where(located, lat, 0.0),
+        'lon_sum': np.where(located, lon, 0.0),
+    })
+    for signal, column in SIGNALS.items():
+        values = pd.to_numeric(df[column], errors='coerce').astype('float64').round(FLOAT32_DECIMALS).to_numpy()
+        present = ~np.isnan(values)
+        frame[f'{signal}_count'] = present.astype('int64')
+        frame[f'{signal}_sum'] = np.where(present, values, 0.0)
+        frame[f'{signal}_sum_sq'] = np.where(present, values, 0.0) ** 2
+        frame[f'{signal}_min'] = values
+        frame[f'{signal}_max'] = values
+
+    aggregations = {field: 'sum' for field in ADDITIVE_FIELDS}
+    aggregations.update({f'{signal}_min': 'min' for signal in SIGNALS})
+    aggregations.update({f'{signal}_max': 'max' for signal in SIGNALS})
+    frame['first_seen'] = frame['time']
+    frame['last_seen'] = frame['time']
+    aggregations.update({'first_seen': 'min', 'last_seen': 'max'})
+
+    result = frame.groupby(CELL_KEY, as_index=False, sort=False).agg(aggregations)
+    # earfcn manquant : -1 pour le regroupement, None en base
+    result['earfcn'] = result['earfcn'].astype(object).where(result['earfcn'] >= 0, None)
+    return result
+
+
+def _functions():
+    """
+    Minimum et maximum de deux valeurs (fonctions scalaires) du moteur.
+    """
+    if connection.vendor == 'postgresql':
+        return 'LEAST', 'GREATEST'
+    return 'MIN', 'MAX'
+
+
+def _match_key():
+    """
+    Condition SQL sur la clé de cellule ; earfcn manquant vaut -1, comme
+    dans la contrainte unique_cell_aggregate.
+    """
+    qn = connection.ops.quote_name
+    return ' AND '.join(
+        [f'{qn(field)} = %s' for field in CELL_KEY[:-1]] + [f'COALESCE({qn("earfcn")}, -1) = %s']
+    )
+
+
+def _key_params(key):
+    return list(key[:-1]) + [-1 if key[-1] is None else key[-1]]
+
+
+def _sorted(rows):
+    """
+    Lignes triées par clé : des imports simultanés verrouillent les
+    agrégats communs dans le même ordre (pas d'interblocage).
+    """
+    return sorted(rows.items(), key=lambda item: tuple(_key_params(item[0])))
+
+
+def _update(aggregates, names):
+    """
+    Enregistre les champs ``names`` des agrégats : une requête UPDATE
+    préparée exécutée par lot (executemany). ``bulk_update`` génère un CASE
+    WHEN par champ et par ligne, bien plus coûteux avec une trentaine de
+    champs.
+    """
+    if not aggregates:
+        return
+    fields = [CellAggregate._meta.get_field(name) for name in names + ['updated_at']]
+    assignments = ', '.join(f'{connection.ops.quote_name(field.column)} = %s' for field in fields)
+    sql = f'UPDATE {connection.ops.quote_name(CellAggregate._meta.db_table)} SET {assignments} WHERE id = %s'
+    params = [
+        [field.get_db_prep_save(getattr(aggregate, field.attname), connection) for field in fields] + [aggregate.pk]
+        for aggregate in aggregates
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _key(obj):
+    return tuple(getattr(obj, field) for field in CELL_KEY)
+
+
+def _existing(keys):
+    """
+    Agrégats existants des clés données, indexés par clé.
+    """
+    cell_ids = sorted({key[2] for key in keys})
+    existing = {}
+    for start in range(0, len(cell_ids), LOOKUP_CHUNK_SIZE):
+        for aggregate in CellAggregate.objects.filter(cell_id__in=cell_ids[start:start + LOOKUP_CHUNK_SIZE]):
+            existing[_key(aggregate)] = aggregate
+    return {key: existing[key] for key in keys if key in existing}
+
+
+def _rows(aggregates):
+    """
+    (clé, valeurs) de chaque agrégat, en types Python (None pour NaN / NaT).
+    """
+    frame = aggregates[CELL_KEY + AGGREGATE_FIELDS]
+    frame = frame.astype(object).where(frame.notna(), None)
+    for values in frame.to_dict('records'):
+        yield tuple(values[field] for field in CELL_KEY), values
+
+
+def _upsert_sql():
+    """
+    INSERT ... ON CONFLICT DO UPDATE : l'agrégat de la cellule est créé ou
+    complété par la base (effectifs et sommes additionnés, extrêmes
+    comparés) sous le verrou de sa ligne.
+    """
+    qn = connection.ops.quote_name
+    table = qn(CellAggregate._meta.db_table)
+    columns = [CellAggregate._meta.get_field(name).column for name in CELL_KEY + AGGREGATE_FIELDS]
+    columns += ['created_at', 'updated_at']
+    least, greatest = _functions()
+    assignments = [f'{qn(field)} = {table}.{qn(field)} + excluded.{qn(field)}' for field in ADDITIVE_FIELDS]
+    for function, fields in ((least, MIN_FIELDS), (greatest, MAX_FIELDS)):
+        assignments += [
+            f'{qn(field)} = COALESCE({function}({table}.{qn(field)}, excluded.{qn(field)}), '
+            f'{table}.{qn(field)}, excluded.{qn(field)})'
+            for field in fields
+        ]
+    assignments.append(f'{qn("updated_at")} = excluded.{qn("updated_at")}')
+    target = ', '.join([qn(field) for field in CELL_KEY[:-1]] + [f'COALESCE({qn("earfcn")}, -1)'])
+    return (
+        f'INSERT INTO {table} ({", ".join(qn(column) for column in columns)}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT ({target}) DO UPDATE SET {", ".join(assignments)}'
+    )
+
+
+def add_frame(df):
+    """
+    Ajoute les lignes du DataFrame aux agrégats de leurs cellules.
+    """
+    aggregates = aggregate_frame(df)
+    if aggregates.empty:
+        return
+    fields = [CellAggregate._meta.get_field(name) for name in CELL_KEY + AGGREGATE_FIELDS]
+    now = timezone.now()
+    params = [
+        [field.get_db_prep_save(values[field.name], connection) for field in fields] + [now, now]
+        for _, values in _sorted(dict(_rows(aggregates)))
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(_upsert_sql(), params)
+
+
+def _subtract_sql():
+    """
+    UPDATE retirant des contributions : les effectifs ne descendent pas
+    sous zéro.
+    """
+    qn = connection.ops.quote_name
+    _, greatest = _functions()
+    assignments = [
+        f'{qn(field)} = {greatest}({qn(field)} - %s, 0)' if field.endswith('count') else f'{qn(field)} = {qn(field)} - %s'
+        for field in ADDITIVE_FIELDS
+    ]
+    assignments.append(f'{qn("updated_at")} = %s')
+    return (
+        f'UPDATE {qn(CellAggregate._meta.db_table)} SET {", ".join(assignments)} '
+        f'WHERE {_match_key()}'
+    )
+
+
+def remove_frame(df):
+    """
+    Retire des agrégats les lignes du DataFrame, déjà supprimées (ou
+    modifiées) en base.
+
+    Les effectifs et sommes sont décrémentés par la base, ce qui verrouille
+    les agrégats concernés jusqu'à la fin de la transaction ; ils sont
+    ensuite relus pour supprimer les agrégats vidés et recalculer les
+    extrêmes atteints par les lignes retirées.
+    """
+    aggregates = aggregate_frame(df)
+    if aggregates.empty:
+        return
+    rows = dict(_rows(aggregates))
+    now = timezone.now()
+    params = [
+        [values[field] for field in ADDITIVE_FIELDS] + [now] + _key_params(key)
+        for key, values in _sorted(rows)
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(_subtract_sql(), params)
+
+    emptied, stale = [], []
+    for key, aggregate in _existing(rows.keys()).items():
+        values = rows[key]
+        if aggregate.count == 0:
+            emptied.append(aggregate.pk)
+        # Un extrême atteint par les lignes retirées doit être recalculé
+        elif any(
+            values[field] is not None and getattr(aggregate, field) is not None
+            and values[field] == getattr(aggregate, field)
+            for field in MIN_FIELDS + MAX_FIELDS
+        ):
+            aggregate.updated_at = now
+            stale.append(aggregate)
+
+    CellAggregate.objects.filter(pk__in=emptied).delete()
+    _refresh_extremes(stale)
+    _update(stale, MIN_FIELDS + MAX_FIELDS)
+
+
+def _fold(aggregate, values):
+    """
+    Complète extrêmes et dates de l'agrégat avec ceux de ``values``.
+    """
+    for fields, pick in ((MIN_FIELDS, min), (MAX_FIELDS, max)):
+        for field in fields:
+            value, current = values[field], getattr(aggregate, field)
+            if value is not None:
+                setattr(aggregate, field, value if current is None else pick(current, value))
+
+
+def _refresh_extremes(aggregates):
+    """
+    Recalcule extrêmes et dates des agrégats depuis les lignes en base
+    (une requête groupée par paquet de cell_id) et les lignes archivées de
+    leurs cellules.
+    """
+    from gsm_coverage import partitions
+
+    expressions = {'first_seen': Min('time'), 'last_seen': Max('time')}
+    for signal, column in SIGNALS.items():
+        expressions[f'{signal}_min'] = Min(column)
+        expressions[f'{signal}_max'] = Max(column)
+    by_key = {_key(aggregate): aggregate for aggregate in aggregates}
+    if not by_key:
+        return
+    for aggregate in by_key.values():
+        for field in expressions:
+            setattr(aggregate, field, None)
+
+    cell_ids = sorted({key[2] for key in by_key})
+    for start in range(0, len(cell_ids), LOOKUP_CHUNK_SIZE):
+        rows = (
+            CSVLine.objects.filter(cell_id__in=cell_ids[start:start + LOOKUP_CHUNK_SIZE])
+            .values(*CELL_KEY).annotate(**expressions).order_by()
+        )
+        for row in rows:
+            aggregate = by_key.get(tuple(row[field] for field in CELL_KEY))
+            if aggregate is not None:
+                _fold(aggregate, row)
+    for frame in partitions.archived_frames(LINE_COLUMNS, cell_id=cell_ids):
+        for key, values in _rows(aggregate_frame(frame)):
+            aggregate = by_key.get(key)
+            if aggregate is not None:
+                _fold(aggregate, values)
+
+
+def lines_frame(lines):
+    """
+    DataFrame des colonnes utiles aux agrégats, pour un QuerySet de lignes.
+    """
+    return pd.DataFrame.from_records(list(lines.values_list(*LINE_COLUMNS)), columns=LINE_COLUMNS)
+
+
+def delete_lines(lines):
+    """
+    Supprime les lignes du QuerySet et retire leurs contributions des agrégats.
+    """
+    df = lines_frame(lines)
+    lines.delete()
+    remove_frame(df)
+
+
+def rebuild():
+    """
+    Recalcule tous les agrégats depuis les lignes (requête SQL groupée),
+    puis y ajoute les lignes archivées, lot par lot.
+    """
+    from gsm_coverage import partitions
+
+    CellAggregate.objects.all().delete()
+    located = Q(lat__isnull=False, lon__isnull=False)
+    expressions = {
+        'count': Count('pk'),
+        'first_seen': Min('time'),
+        'last_seen': Max('time'),
+        'coord_count': Count('pk', filter=located),
+        'lat_sum': Sum('lat', filter=located),
+        'lon_sum': Sum('lon', filter=located),
+    }
+    for signal, column in SIGNALS.items():
+        expressions[f'{signal}_count'] = Count(column)
+        expressions[f'{signal}_sum'] = Sum(column)
+        expressions[f'{signal}_sum_sq'] = Sum(F(column) * F(column))
+        expressions[f'{signal}_min'] = Min(column)
+        expressions[f'{signal}_max'] = Max(column)
+    rows = CSVLine.objects.filter(cell_id__isnull=False).values(*CELL_KEY).annotate(**expressions).order_by()
+    CellAggregate.objects.bulk_create(
+        (CellAggregate(**{field: value if value is not None or field not in ADDITIVE_FIELDS else 0
+                          for field, value in row.items()}) for row in rows.iterator()),
+        batch_size=500,
+    )
+    for frame in partitions.archived_frames(LINE_COLUMNS):
+        add_frame(frame)
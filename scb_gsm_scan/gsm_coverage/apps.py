@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GsmCoverageConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gsm_coverage'
+
+    def ready(self):
+        from gsm_coverage import signals  # noqa: F401
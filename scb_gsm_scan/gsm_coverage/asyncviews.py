@@ -0,0 +1,188 @@
+"""
+Lectures asynchrones, pour un déploiement ASGI.
+
+Sous ASGI, une vue DRF (synchrone) est exécutée dans un thread pendant
+toute la requête : une lecture lente de mesures immobilise ce thread. Les
+vues ci-dessous sont des vues Django natives (``async def``) : les
+requêtes passent par l'ORM asynchrone (``aget``, ``async for``,
+``aiterator``) et les exports sont servis par un itérateur asynchrone, de
+sorte qu'un worker ASGI unique sert de nombreux clients simultanés.
+
+Elles reprennent les paramètres et les réponses des routes DRF
+correspondantes (mêmes filtres, serializers, renderers, pagination et
+cache conditionnel), sous le préfixe ``gsm_coverage/async/`` :
+
+- ``async/gsm_data/`` : gsm_data/ ;
+- ``async/gsm_scan/<pk>/`` et ``async/gsm_scan/<pk>/export/`` ;
+- ``async/measurements/`` : measurements/ (JSON, MessagePack, Arrow).
+
+Servies en WSGI, elles fonctionnent mais chaque requête crée sa boucle
+d'événements : les routes DRF restent préférables (voir ``bench_load``).
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from django_filters.rest_framework import DjangoFilterBackend
+from gsm_coverage.caching import acached_response
+from gsm_coverage.export import ASYNC_EXPORT_FORMATS
+from gsm_coverage.models import CSVLine, GSMData, GSMScan
+from gsm_coverage.pagination import MeasurementCursorPagination, query_flag
+from gsm_coverage.renderers import binary_renderers
+from gsm_coverage.serializers import (
+    CSVLineValuesSerializer, GSMDataSerializer, GSMDataSummarySerializer,
+    GSMScanSerializer, GSMScanSummarySerializer,
+)
+from gsm_coverage.views import GSMDataViewSet, GSMScanViewSet, MeasurementViewSet, export_output, scan_export_name
+from rest_framework import exceptions
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+
+class AsyncReadView(View):
+    """
+    Base des lectures asynchrones : négociation du format, version,
+    authentification et permission IsAuthenticated comme une vue DRF ;
+    erreurs au format DRF. Les sous-classes implémentent
+    ``async def read(request, *args, **kwargs)``.
+    """
+    http_method_names = ['get', 'options']
+    renderer_classes = [JSONRenderer]
+
+    def get_renderers(self):
+        return [renderer() for renderer in self.renderer_classes]
+
+    async def get(self, request, *args, **kwargs):
+        request = Request(
+            request,
+            authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+            negotiator=DefaultContentNegotiation(),
+        )
+        renderers = self.get_renderers()
+        try:
+            request.accepted_renderer, request.accepted_media_type = (
+                request.negotiator.select_renderer(request, renderers)
+            )
+            versioning = api_settings.DEFAULT_VERSIONING_CLASS
+            if versioning is not None:
+                request.version = versioning().determine_version(request, *args, **kwargs)
+            # Authentification DRF (lecture de l'utilisateur) hors de la boucle
+            user = await sync_to_async(lambda: request.user)()
+            if not (user and user.is_authenticated):
+                raise exceptions.NotAuthenticated()
+            return await self.read(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, renderers, exc)
+
+    def handle_exception(self, request, renderers, exc):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            header = request.authenticators[0].authenticate_header(request) if request.authenticators else None
+            if header:
+                exc.auth_header = header
+            else:
+                exc.status_code = 403
+        if getattr(request, 'accepted_renderer', None) is None:
+            request.accepted_renderer, request.accepted_media_type = renderers[0], renderers[0].media_type
+        response = exception_handler(exc, {'request': request, 'view': self})
+        # En-têtes propres à l'erreur (WWW-Authenticate, Retry-After)
+        headers = {name: value for name, value in response.items() if name.lower() != 'content-type'}
+        return self.render(request, response.data, status=response.status_code, headers=headers)
+
+    def render(self, request, data, status=200, headers=None):
+        """
+        Réponse rendue par le renderer négocié (comme Response de DRF).
+        """
+        renderer = request.accepted_renderer
+        content = renderer.render(data, request.accepted_media_type, {'request': request, 'view': self})
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = HttpResponse(content, status=status, content_type=content_type, headers=headers)
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+
+async def filter_queryset(request, queryset, view):
+    """
+    Filtres django-filter déclarés sur la vue DRF ``view`` (classe). La
+    validation des filtres peut interroger la base (ModelChoiceFilter créé
+    par ``filterset_fields`` pour une clé étrangère) : elle est exécutée
+    hors de la boucle.
+    """
+    return await sync_to_async(DjangoFilterBackend().filter_queryset)(request, queryset, view)
+
+
+class GSMDataListView(AsyncReadView):
+    """
+    gsm_data/ (``summary``, résumé par défaut, ``operator``), réponses
+    conditionnelles et en cache.
+    """
+
+    async def read(self, request):
+        return await acached_response(request, lambda: self.list(request))
+
+    async def list(self, request):
+        if query_flag(request, 'summary', default=True):
+            queryset, serializer_class = GSMData.objects.with_summary(), GSMDataSummarySerializer
+        else:
+            queryset, serializer_class = GSMDataViewSet.queryset.all(), GSMDataSerializer
+        queryset = await filter_queryset(request, queryset, GSMDataViewSet)
+        # async for : lignes et prefetch lus par l'ORM asynchrone, la
+        # sérialisation ne fait plus aucune requête
+        objects = [obj async for obj in queryset]
+        return self.render(request, serializer_class(objects, many=True, context={'request': request}).data)
+
+
+class GSMScanDetailView(AsyncReadView):
+    """
+    gsm_scan/<pk>/ (``summary``), réponses conditionnelles et en cache.
+    """
+
+    async def read(self, request, pk):
+        return await acached_response(request, lambda: self.retrieve(request, pk))
+
+    async def retrieve(self, request, pk):
+        if query_flag(request, 'summary'):
+            queryset, serializer_class = GSMScan.objects.order_by('-pk'), GSMScanSummarySerializer
+        else:
+            queryset, serializer_class = GSMScanViewSet.queryset.all(), GSMScanSerializer
+        queryset = await filter_queryset(request, queryset, GSMScanViewSet)
+        try:
+            scan = await queryset.aget(pk=pk)
+        except GSMScan.DoesNotExist:
+            raise exceptions.NotFound()
+        return self.render(request, serializer_class(scan, context={'request': request}).data)
+
+
+class GSMScanExportView(AsyncReadView):
+    """
+    gsm_scan/<pk>/export/ : lignes du scan en flux (``output``).
+    """
+
+    async def read(self, request, pk):
+        output = export_output(request)
+        scan = await GSMScan.objects.filter(pk=pk).afirst()
+        if scan is None:
+            raise exceptions.NotFound()
+        content_type, render = ASYNC_EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(render(scan.csv_lines.all()), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{scan_export_name(scan)}.{output}"'
+        return response
+
+
+class MeasurementListView(AsyncReadView):
+    """
+    measurements/ : filtres, ``fields`` et pagination par curseur.
+    """
+    renderer_classes = [JSONRenderer] + binary_renderers()
+
+    async def read(self, request):
+        serializer = CSVLineValuesSerializer(request.query_params.get('fields'))
+        queryset = await filter_queryset(request, CSVLine.objects.all(), MeasurementViewSet)
+        rows = queryset.values_list(*serializer.columns('time', 'pk'), named=True)
+        paginator = MeasurementCursorPagination()
+        page = await paginator.apaginate_queryset(rows, request)
+        return self.render(request, paginator.get_paginated_data(serializer.to_representation(page)))
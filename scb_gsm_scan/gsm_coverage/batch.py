@@ -0,0 +1,280 @@
+"""
+Import d'un lot de fichiers CSV (plusieurs fichiers ou une archive zip).
+
+La lecture et le nettoyage, purement pandas, sont répartis sur un pool de
+processus ; chaque fichier est ensuite enregistré dans le processus
+principal comme un GSMScan distinct rattaché au GSMData de l'opérateur.
+
+Seuls des chemins circulent entre les processus : les fichiers du lot
+(membres d'archives zip compris) sont sur disque, et chaque worker écrit
+son DataFrame nettoyé dans un fichier temporaire, relu au moment de son
+enregistrement. Les workers sont démarrés par ``spawn`` : le processus
+principal (worker web, avec le pool de threads des jobs) n'est pas forké.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from django.conf import settings
+from django.core.files.base import File
+from django.db import transaction
+from gsm_coverage.ingest import CSVCleaner, bulk_insert_lines, missing_columns, read_csv, read_header
+from gsm_coverage.models import GSMData, GSMScan, IngestJob
+from gsm_coverage.stats import ScanStatistics
+from gsm_coverage.uploadhandler import file_digest
+import django
+import logging
+import multiprocessing
+import os
+import pandas as pd
+import shutil
+import tempfile
+import zipfile
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchFile:
+    """
+    Fichier du lot, sur disque.
+    """
+    name: str
+    path: str
+
+    def open(self):
+        return open(self.path, 'rb')
+
+    def digest(self):
+        with self.open() as f:
+            return file_digest(f)
+
+
+@dataclass
+class BatchResult:
+    name: str
+    scan: int = None
+    rows_processed: int = 0
+    rows_rejected: int = 0
+    duplicate: bool = False
+    error: str = ''
+
+
+def get_workers(workers=None):
+    if workers is None:
+        workers = getattr(settings, 'GSM_BATCH_WORKERS', None) or os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def _extract(source, name, directory):
+    """
+    Copie le flux ``source`` dans un fichier de ``directory``, par blocs.
+    """
+    fd, path = tempfile.mkstemp(suffix='.csv', dir=directory)
+    with os.fdopen(fd, 'wb') as target:
+        shutil.copyfileobj(source, target)
+    return BatchFile(name=name, path=path)
+
+
+def expand_uploads(uploads, directory):
+    """
+    Transforme les fichiers uploadés (CSV ou zip) en BatchFile. Les fichiers
+    déjà sur disque sont transmis par chemin ; les membres des archives zip
+    et les fichiers gardés en mémoire sont extraits dans ``directory``
+    (répertoire temporaire de l'appelant).
+    """
+    files = []
+    for upload in uploads:
+        name = os.path.basename(upload.name)
+        if name.lower().endswith('.zip'):
+            upload.seek(0)
+            with zipfile.ZipFile(upload) as archive:
+                for member in archive.infolist():
+                    if member.is_dir() or not is_csv(member.filename):
+                        continue
+                    with archive.open(member) as source:
+                        files.append(_extract(source, os.path.basename(member.filename), directory))
+        elif hasattr(upload, 'temporary_file_path'):
+            files.append(BatchFile(name=name, path=upload.temporary_file_path()))
+        else:
+            upload.seek(0)
+            files.append(_extract(upload, name, directory))
+    return files
+
+
+def expand_paths(paths, directory):
+    """
+    Équivalent de expand_uploads pour des chemins locaux (commande de gestion).
+    """
+    files = []
+    for path in paths:
+        if path.lower().endswith('.zip'):
+            with open(path, 'rb') as f:
+                files.extend(expand_uploads([File(f, name=path)], directory))
+        else:
+            files.append(BatchFile(name=os.path.basename(path), path=path))
+    return files
+
+
+def is_csv(name):
+    return name.lower().endswith('.csv')
+
+
+def parse_and_clean(batch_file):
+    """
+    Lecture et nettoyage d'un fichier (exécuté dans un processus du pool).
+    Retourne (DataFrame nettoyé ou None, BatchResult).
+    """
+    result = BatchResult(name=batch_file.name)
+    if not is_csv(batch_file.name):
+        result.error = "Le fichier doit avoir l'extension .csv."
+        return None, result
+
+    try:
+        with batch_file.open() as f:
+            missing = missing_columns(read_header(f))
+            if missing:
+                result.error = f"Les colonnes suivantes sont manquantes dans le fichier CSV : {', '.join(missing)}"
+                return None, result
+            df = read_csv(f)
+    except ValueError:
+        result.error = "Le fichier CSV est corrompu ou mal formé."
+        return None, result
+
+    cleaner = CSVCleaner()
+    df = cleaner.clean(df)
+    result.rows_processed = cleaner.rows_read
+    result.rows_rejected = cleaner.rows_rejected
+    if len(df) == 0:
+        result.error = "Le nettoyage a supprimé toutes les lignes : vérifiez vos seuils et vos données CSV."
+        return None, result
+    return df, result
+
+
+def _clean_to_file(batch_file, directory):
+    """
+    parse_and_clean exécuté dans un processus du pool : le DataFrame
+    nettoyé est écrit dans ``directory`` et seul son chemin est retourné.
+    Les résultats terminés attendent ainsi leur enregistrement sur disque,
+    et non dans la mémoire du processus principal.
+    """
+    df, result = parse_and_clean(batch_file)
+    if df is None:
+        return None, result
+    fd, path = tempfile.mkstemp(suffix='.pkl', dir=directory)
+    os.close(fd)
+    df.to_pickle(path)
+    return path, result
+
+
+def _load(path):
+    """
+    DataFrame écrit par _clean_to_file ; le fichier est supprimé.
+    """
+    try:
+        return pd.read_pickle(path)
+    finally:
+        os.remove(path)
+
+
+def _commit(gsm_data, batch_file, df, result, digest):
+    """
+    Enregistre le scan du fichier. Une erreur est rapportée dans le
+    résultat du fichier, sans interrompre le lot.
+    """
+    scan = GSMScan(digest=digest)
+    try:
+        with transaction.atomic():
+            with batch_file.open() as f:
+                scan.file.save(batch_file.name, File(f), save=True)
+            stats = ScanStatistics()
+            bulk_insert_lines(scan, df, stats=stats)
+            stats.save(scan)
+            gsm_data.gsm_scan.add(scan)
+    except Exception:
+        logger.exception("Échec de l'enregistrement de %s", batch_file.name)
+        if scan.file:
+            scan.file.delete(save=False)
+        result.error = "Erreur lors de l'enregistrement du fichier."
+        return result
+    result.scan = scan.pk
+    return result
+
+
+def _duplicate_result(name, scan):
+    """
+    Résultat d'un fichier déjà importé : effectifs du job qui a créé le
+    scan, à défaut lignes du scan (les lignes rejetées ne sont pas
+    conservées).
+    """
+    job = IngestJob.objects.filter(scan=scan, state=IngestJob.SUCCEEDED).order_by('pk').first()
+    if job is not None:
+        rows_processed, rows_rejected = job.rows_processed, job.rows_rejected
+    else:
+        rows_processed, rows_rejected = scan.line_count or 0, 0
+    return BatchResult(
+        name=name, scan=scan.pk, rows_processed=rows_processed, rows_rejected=rows_rejected, duplicate=True,
+    )
+
+
+def ingest_batch(operator, files, workers=None, link=False):
+    """
+    Nettoie les fichiers en parallèle puis enregistre chacun comme un
+    GSMScan de l'opérateur. Un fichier en erreur n'empêche pas l'import
+    des autres. Retourne les BatchResult dans l'ordre des fichiers.
+
+    Les fichiers déjà importés (même empreinte), en base ou plus tôt dans
+    le lot, ne sont ni relus ni réinsérés ; avec ``link``, un scan
+    identique d'un autre opérateur est rattaché à celui-ci. Leur résultat
+    reprend les effectifs de l'import d'origine.
+    """
+    gsm_data = GSMData.get(operator=operator)
+    results = [None] * len(files)
+    digests = [batch_file.digest() for batch_file in files]
+
+    pending, repeated, seen = [], {}, {}
+    for index, (batch_file, digest) in enumerate(zip(files, digests)):
+        if digest in seen:
+            # Copie d'un fichier du lot : résultat du premier exemplaire
+            repeated[index] = seen[digest]
+            continue
+        seen[digest] = index
+        duplicate = GSMScan.find_duplicate(digest, operator, link=link)
+        if duplicate is None:
+            pending.append(index)
+            continue
+        gsm_data.gsm_scan.add(duplicate)
+        results[index] = _duplicate_result(batch_file.name, duplicate)
+
+    def commit(index, df, result):
+        if df is not None:
+            result = _commit(gsm_data, files[index], df, result, digests[index])
+        results[index] = result
+
+    workers = min(get_workers(workers), len(pending)) if pending else 1
+    if workers == 1:
+        for index in pending:
+            commit(index, *parse_and_clean(files[index]))
+    else:
+        # django.setup et non une fonction de ce module : l'importer charge
+        # les modèles, avant l'initialisation de Django dans le processus
+        context = multiprocessing.get_context('spawn')
+        with tempfile.TemporaryDirectory() as directory, \
+                ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as pool:
+            futures = {pool.submit(_clean_to_file, files[index], directory): index for index in pending}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    path, result = future.result()
+                except Exception:
+                    logger.exception("Échec du nettoyage de %s", files[index].name)
+                    results[index] = BatchResult(name=files[index].name, error="Erreur lors de la lecture du fichier.")
+                    continue
+                commit(index, _load(path) if path is not None else None, result)
+
+    for index, first in repeated.items():
+        original = results[first]
+        results[index] = BatchResult(
+            name=files[index].name, scan=original.scan, rows_processed=original.rows_processed,
+            rows_rejected=original.rows_rejected, duplicate=original.scan is not None, error=original.error,
+        )
+    return results
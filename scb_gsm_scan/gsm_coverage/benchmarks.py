@@ -0,0 +1,68 @@
+"""
+Outils communs aux commandes de benchmark (``manage.py bench_*``).
+"""
+from contextlib import contextmanager
+from django.db import transaction
+import numpy as np
+import pandas as pd
+import time
+
+
+class Rollback(Exception):
+    """
+    Levée pour annuler la transaction d'un benchmark.
+    """
+
+
+@contextmanager
+def rolled_back():
+    """
+    Exécute le bloc dans une transaction systématiquement annulée :
+    les benchmarks ne laissent aucune donnée en base.
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback()
+    except Rollback:
+        pass
+
+
+def timed(func, *args, **kwargs):
+    """
+    Retourne (résultat, durée en secondes) de l'appel.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def make_frame(rows, seed=0):
+    """
+    DataFrame synthétique au format des CSV de scan (14 colonnes).
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2026-01-25T09:00:00Z')
+    return pd.DataFrame({
+        'time': (start + pd.to_timedelta(np.arange(rows) * 2.3, unit='s')).strftime('%Y-%m-%dT%H:%M:%S.%f+00:00'),
+        'lat': 52.49 + rng.normal(0, 0.01, rows).cumsum() / 100,
+        'lon': 13.54 + rng.normal(0, 0.01, rows).cumsum() / 100,
+        'alt': rng.uniform(20, 60, rows).round(2),
+        'gps_fix': 3,
+        'rat': rng.choice(['LTE', 'UMTS', 'GSM'], rows),
+        'mccmnc': rng.choice(['262-01', '262-02', '262-03'], rows),
+        'cell_id': rng.integers(1_000_000, 9_000_000, rows),
+        'pci': rng.integers(0, 504, rows),
+        'band': rng.choice(['EUTRAN-BAND3', 'EUTRAN-BAND7', 'EUTRAN-BAND20'], rows),
+        'earfcn': rng.choice([1600, 3350, 6300], rows),
+        'rsrp_dbm': rng.integers(-140, -44, rows),
+        'rsrq_db': rng.uniform(-20, -3, rows).round(1),
+        'sinr_db': rng.uniform(-10, 30, rows).round(1),
+    })
+
+
+def rate(rows, seconds):
+    """
+    Débit en lignes par seconde.
+    """
+    return rows / seconds if seconds else float('inf')
@@ -0,0 +1,138 @@
+"""
+Cache HTTP des lectures gsm_data et gsm_scan.
+
+Les réponses portent un ETag fort et un Last-Modified dérivés de la
+version des données (dernière modification et effectifs des tables
+GSMData et GSMScan) : un GET conditionnel (If-None-Match /
+If-Modified-Since) reçoit un 304 sans que rien ne soit relu ni sérialisé.
+
+Le contenu rendu est aussi gardé côté serveur (cache
+``settings.GSM_RESPONSE_CACHE``), sous une clé combinant cette version,
+l'utilisateur, le chemin, les paramètres de la requête et l'en-tête
+Accept. Tout import, remplacement de fichier, modification d'une ligne ou
+rattachement d'un scan change la version : les entrées périmées ne sont
+plus jamais lues et disparaissent du cache LRU.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from gsm_coverage.models import GSMData, GSMScan
+from hashlib import sha1
+
+
+def _version(scans, data):
+    last_modified = max((value for value in (scans['last'], data['last']) if value), default=None)
+    token = f"{scans['last']}|{scans['count']}|{data['last']}|{data['count']}"
+    return last_modified, token
+
+
+def data_version():
+    """
+    (dernière modification, jeton de version) des données servies.
+    """
+    return _version(
+        GSMScan.objects.aggregate(last=Max('updated_at'), count=Count('pk')),
+        GSMData.objects.aggregate(last=Max('updated_at'), count=Count('pk')),
+    )
+
+
+async def adata_version():
+    """
+    data_version() par l'ORM asynchrone.
+    """
+    return _version(
+        await GSMScan.objects.aaggregate(last=Max('updated_at'), count=Count('pk')),
+        await GSMData.objects.aaggregate(last=Max('updated_at'), count=Count('pk')),
+    )
+
+
+def response_key(request, token):
+    """
+    Clé d'une réponse : version des données, utilisateur, chemin,
+    paramètres (triés) et représentation demandée.
+    """
+    params = sorted((name, value) for name in request.query_params for value in request.query_params.getlist(name))
+    parts = [token, str(request.user.pk), request.path, repr(params), request.META.get('HTTP_ACCEPT', '')]
+    return sha1('\n'.join(parts).encode()).hexdigest()
+
+
+def _store(key):
+    def store(response):
+        if response.status_code == 200 and len(response.content) <= settings.GSM_RESPONSE_CACHE_MAX_BYTES:
+            caches[settings.GSM_RESPONSE_CACHE].set(key, (response.content, response['Content-Type']))
+    return store
+
+
+def _validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Données propres à l'utilisateur : à revalider à chaque lecture
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Accept', 'Authorization', 'Cookie'])
+    return response
+
+
+def _lookup(request, version):
+    """
+    (clé, ETag, réponse) : 304 si le client est à jour, sinon contenu du
+    cache serveur, sinon réponse None (à calculer puis à mettre en cache).
+    """
+    last_modified, token = version
+    key = response_key(request, token)
+    etag = f'"{key}"'
+
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if not_modified is not None:
+        return key, etag, _validators(not_modified, etag, last_modified)
+
+    cached = caches[settings.GSM_RESPONSE_CACHE].get(key)
+    if cached is not None:
+        content, content_type = cached
+        return key, etag, _validators(HttpResponse(content, content_type=content_type), etag, last_modified)
+    return key, etag, None
+
+
+def cached_response(request, compute):
+    """
+    Réponse 304 si le client est à jour, sinon réponse du cache serveur,
+    sinon ``compute()`` (réponse DRF, mise en cache une fois rendue).
+    """
+    version = data_version()
+    key, etag, response = _lookup(request, version)
+    if response is not None:
+        return response
+    response = compute()
+    response.add_post_render_callback(_store(key))
+    return _validators(response, etag, version[0])
+
+
+async def acached_response(request, compute):
+    """
+    cached_response() pour les vues asynchrones : ``compute()`` est une
+    coroutine retournant une réponse déjà rendue.
+    """
+    version = await adata_version()
+    key, etag, response = _lookup(request, version)
+    if response is not None:
+        return response
+    response = await compute()
+    _store(key)(response)
+    return _validators(response, etag, version[0])
+
+
+class CachedReadMixin:
+    """
+    list / retrieve conditionnels (ETag, Last-Modified) et mis en cache.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(request, lambda: super(CachedReadMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(request, lambda: super(CachedReadMixin, self).retrieve(request, *args, **kwargs))
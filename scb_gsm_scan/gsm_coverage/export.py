@@ -0,0 +1,142 @@
+"""
+Export en flux des mesures d'un scan (NDJSON ou CSV).
+
+Les lignes sont lues par blocs (``QuerySet.iterator``) sous forme de
+tuples et écrites au fur et à mesure : la mémoire reste constante quelle
+que soit la taille du scan, et le client reçoit les premières lignes sans
+attendre la fin de la lecture.
+
+La source est un QuerySet de lignes ou un objet fournissant
+``iter_rows(fields)`` (historique incluant les archives, voir
+gsm_coverage.partitions).
+"""
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from gsm_coverage.ingest import CSV_COLUMNS
+import csv
+import itertools
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    Pseudo-fichier retournant ce qui lui est écrit (pour csv.writer).
+    """
+    def write(self, value):
+        return value
+
+
+def _rows(source, fields):
+    if not isinstance(source, QuerySet):
+        return source.iter_rows(fields)
+    return source.order_by('time', 'pk').values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+async def _arows(queryset, fields):
+    """
+    Lignes de _rows(), lues bloc par bloc dans le thread de l'ORM.
+    QuerySet.aiterator() exécute la requête d'un values_list() dans la
+    boucle d'événements (Django 5.2) : l'itérateur synchrone, paresseux,
+    est repris ici à chaque bloc.
+    """
+    rows = _rows(queryset, fields)
+    next_chunk = sync_to_async(lambda: list(itertools.islice(rows, EXPORT_CHUNK_SIZE)))
+    while chunk := await next_chunk():
+        for row in chunk:
+            yield row
+
+
+def _batched(rows, encode):
+    buffer = []
+    for row in rows:
+        buffer.append(encode(row))
+        if len(buffer) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+async def _abatched(rows, encode):
+    buffer = []
+    async for row in rows:
+        buffer.append(encode(row))
+        if len(buffer) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+NDJSON_FIELDS = ['pk'] + CSV_COLUMNS
+
+
+def _ndjson_encoder():
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+    def encode(row):
+        return encoder.encode(dict(zip(NDJSON_FIELDS, row))) + '\n'
+
+    return encode
+
+
+def _csv_writer():
+    writer = csv.writer(Echo())
+
+    def encode(row):
+        return writer.writerow(
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in row
+        )
+
+    return writer, encode
+
+
+def iter_ndjson(source):
+    """
+    Un objet JSON par ligne, avec les champs de CSVLineSerializer.
+    """
+    return _batched(_rows(source, NDJSON_FIELDS), _ndjson_encoder())
+
+
+def iter_csv(source):
+    """
+    CSV au format d'import (mêmes colonnes, dans le même ordre) : un
+    export peut être réimporté tel quel.
+    """
+    writer, encode = _csv_writer()
+    yield writer.writerow(CSV_COLUMNS)
+    yield from _batched(_rows(source, CSV_COLUMNS), encode)
+
+
+async def aiter_ndjson(queryset):
+    """
+    iter_ndjson() en itérateur asynchrone (ORM asynchrone, QuerySet seulement).
+    """
+    async for chunk in _abatched(_arows(queryset, NDJSON_FIELDS), _ndjson_encoder()):
+        yield chunk
+
+
+async def aiter_csv(queryset):
+    """
+    iter_csv() en itérateur asynchrone (ORM asynchrone, QuerySet seulement).
+    """
+    writer, encode = _csv_writer()
+    yield writer.writerow(CSV_COLUMNS)
+    async for chunk in _abatched(_arows(queryset, CSV_COLUMNS), encode):
+        yield chunk
+
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', iter_ndjson),
+    'csv': ('text/csv', iter_csv),
+}
+
+# Mêmes formats pour les vues asynchrones (gsm_coverage.asyncviews)
+ASYNC_EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', aiter_ndjson),
+    'csv': ('text/csv', aiter_csv),
+}
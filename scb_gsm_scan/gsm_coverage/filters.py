@@ -0,0 +1,65 @@
+from django_filters import rest_framework as filters
+from rest_framework import serializers
+from gsm_coverage.models import CSVLine, GSMScan
+
+
+def parse_bbox(value):
+    """
+    Boîte englobante "min_lon,min_lat,max_lon,max_lat" en degrés.
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(','))
+    except ValueError:
+        raise serializers.ValidationError(
+            {'bbox': "Format attendu : min_lon,min_lat,max_lon,max_lat."}
+        )
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise serializers.ValidationError({'bbox': "Boîte englobante invalide."})
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def parse_near(value):
+    """
+    Disque "lat,lon,rayon_m" (degrés, mètres).
+    """
+    try:
+        lat, lon, radius_m = (float(part) for part in value.split(','))
+    except ValueError:
+        raise serializers.ValidationError({'near': "Format attendu : lat,lon,rayon_m."})
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180 and radius_m > 0):
+        raise serializers.ValidationError({'near': "Point ou rayon invalide."})
+    return lat, lon, radius_m
+
+
+class CSVLineFilter(filters.FilterSet):
+    """
+    Filtres des mesures : scan, opérateur, réseau, période, boîte englobante
+    et rayon autour d'un point.
+    """
+    scan = filters.NumberFilter(field_name='scan')
+    operator = filters.NumberFilter(field_name='scan__gsmdata__operator')
+    time_after = filters.IsoDateTimeFilter(field_name='time', lookup_expr='gte')
+    time_before = filters.IsoDateTimeFilter(field_name='time', lookup_expr='lt')
+    bbox = filters.CharFilter(method='filter_bbox', label="min_lon,min_lat,max_lon,max_lat")
+    near = filters.CharFilter(method='filter_near', label="lat,lon,rayon_m")
+
+    class Meta:
+        model = CSVLine
+        fields = ['scan', 'operator', 'rat', 'mccmnc', 'band', 'cell_id', 'time_after', 'time_before', 'bbox', 'near']
+
+    def filter_bbox(self, queryset, name, value):
+        return queryset.in_bbox(*parse_bbox(value))
+
+    def filter_near(self, queryset, name, value):
+        return queryset.within_radius(*parse_near(value))
+
+
+class GSMScanFilter(filters.FilterSet):
+    """
+    Filtre des scans par opérateur (identifiant du groupe).
+    """
+    operator = filters.NumberFilter(field_name='gsmdata__operator')
+
+    class Meta:
+        model = GSMScan
+        fields = ['operator']
@@ -0,0 +1,504 @@
+"""
+Moteur de nettoyage et d'insertion en masse des lignes CSV.
+
+Les instances CSVLine sont construites directement à partir des colonnes
+du DataFrame nettoyé (sans passer par ``iterrows``) puis écrites par lots
+avec ``bulk_create``, déjà rattachées à leur scan (clé étrangère
+``CSVLine.scan``). Sous PostgreSQL, les mêmes valeurs sont envoyées en CSV
+par ``COPY FROM STDIN`` (une seule commande, sans requête par lot).
+
+Les gros fichiers sont traités en mode streaming : lecture par blocs de
+taille bornée, nettoyage bloc par bloc (avec suivi des doublons d'un bloc
+à l'autre) et écriture en base au fil de l'eau.
+
+La lecture suit un schéma déclaré (CSV_DTYPES) : catégories pour les
+chaînes peu variées, entiers et flottants compacts pour les mesures radio,
+horodatages déjà convertis. Le moteur pyarrow est utilisé par défaut s'il
+est installé (voir ``settings.GSM_CSV_ENGINE``).
+"""
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+from gsm_coverage.models import CSVLine
+from gsm_coverage.spatial import geokeys, last_points, thin_points
+import importlib.util
+import io
+import numpy as np
+import pandas as pd
+
+
+CSV_COLUMNS = [
+    'time', 'lat', 'lon', 'alt', 'gps_fix',
+    'rat', 'mccmnc', 'cell_id',
+    'pci',
+    'band', 'earfcn',
+    'rsrp_dbm', 'rsrq_db', 'sinr_db'
+]
+
+# Schéma de lecture des colonnes (hors 'time', converti en datetime UTC)
+CSV_DTYPES = {
+    'lat': 'float64',
+    'lon': 'float64',
+    'alt': 'float32',
+    'gps_fix': 'UInt8',
+    'rat': 'category',
+    'mccmnc': 'category',
+    'cell_id': 'Int64',
+    'pci': 'UInt16',
+    'band': 'category',
+    'earfcn': 'UInt32',
+    'rsrp_dbm': 'Int16',
+    'rsrq_db': 'float32',
+    'sinr_db': 'float32',
+}
+CSV_DATE_COLUMNS = ['time']
+
+# Décimales conservées lors de la conversion float32 -> float Python,
+# pour ne pas stocker les artefacts d'arrondi (-107.8 et non -107.80000305)
+FLOAT32_DECIMALS = 4
+
+DEFAULT_BATCH_SIZE = 2000
+# Lignes converties en CSV à la fois pour COPY
+COPY_CHUNK_SIZE = 20_000
+COPY_NULL = '\\N'
+# Champs de CSVLine écrits par COPY, dans l'ordre des colonnes envoyées
+COPY_FIELDS = CSV_COLUMNS + ['geokey', 'scan', 'created_at', 'updated_at']
+# Colonnes entières : un flottant y est tronqué, comme par IntegerField.get_prep_value
+INTEGER_COLUMNS = [
+    column for column in CSV_COLUMNS if isinstance(CSVLine._meta.get_field(column), models.IntegerField)
+]
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_STREAMING_THRESHOLD = 50 * 1024 * 1024  # 50 Mo
+DEFAULT_THINNING_DISTANCE_M = 5.0
+DEFAULT_THINNING_WINDOW_S = 3600
+
+
+class IngestError(ValueError):
+    """
+    Fichier CSV inexploitable (colonnes manquantes, aucune ligne valide...).
+    """
+
+
+def get_batch_size(batch_size=None):
+    """
+    Taille de lot effective : paramètre explicite, sinon
+    ``settings.GSM_INGEST_BATCH_SIZE``, sinon ``DEFAULT_BATCH_SIZE``.
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, 'GSM_INGEST_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    batch_size = int(batch_size)
+    if batch_size < 1:
+        raise ValueError("La taille de lot doit être strictement positive.")
+    return batch_size
+
+
+def get_chunk_size(chunk_size=None):
+    """
+    Nombre de lignes lues par bloc en mode streaming.
+    """
+    if chunk_size is None:
+        chunk_size = getattr(settings, 'GSM_INGEST_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    chunk_size = int(chunk_size)
+    if chunk_size < 1:
+        raise ValueError("La taille de bloc doit être strictement positive.")
+    return chunk_size
+
+
+def use_streaming(file):
+    """
+    Le mode streaming est utilisé dès que le fichier dépasse
+    ``settings.GSM_INGEST_STREAMING_THRESHOLD`` octets.
+    """
+    threshold = getattr(settings, 'GSM_INGEST_STREAMING_THRESHOLD', DEFAULT_STREAMING_THRESHOLD)
+    size = getattr(file, 'size', None)
+    return threshold is not None and size is not None and size > threshold
+
+
+def missing_columns(columns):
+    """
+    Colonnes attendues absentes de l'en-tête.
+    """
+    return [col for col in CSV_COLUMNS if col not in columns]
+
+
+def get_thinning_distance(distance_m=None):
+    """
+    Distance minimale (m) entre deux points conservés d'une même cellule :
+    ``settings.GSM_THINNING_DISTANCE_M``. 0 ne supprime que les doublons exacts.
+    """
+    if distance_m is None:
+        distance_m = getattr(settings, 'GSM_THINNING_DISTANCE_M', DEFAULT_THINNING_DISTANCE_M)
+    return max(0.0, float(distance_m))
+
+
+def get_thinning_window(window_s=None):
+    """
+    Fenêtre de temps (s) des cases de grille et des doublons :
+    ``settings.GSM_THINNING_WINDOW_S``. 0 : une seule fenêtre pour tout le
+    fichier (mémoire non bornée).
+    """
+    if window_s is None:
+        window_s = getattr(settings, 'GSM_THINNING_WINDOW_S', DEFAULT_THINNING_WINDOW_S)
+    return max(0.0, float(window_s))
+
+
+class CSVCleaner:
+    """
+    Nettoyage géographique, cell_id et éclaircissement spatial d'un
+    DataFrame de scan.
+
+    Peut être appliqué bloc par bloc : les cases de grille déjà occupées
+    (empreintes 64 bits triées, par fenêtre de temps) et le dernier point
+    conservé de chaque cellule sont gardés d'un appel à l'autre, afin que
+    le résultat soit identique à un nettoyage du fichier complet.
+
+    Les cases sont comptées par fenêtre de ``window_s`` secondes : les
+    lignes arrivant dans l'ordre du temps, les fenêtres antérieures au bloc
+    en cours sont oubliées. La mémoire est ainsi bornée par le nombre de
+    lignes conservées d'une fenêtre, et non du fichier.
+
+    ``removed`` détaille le nombre de lignes supprimées par étape.
+    """
+
+    def __init__(self, distance_m=None, window_s=None):
+        self.distance_m = get_thinning_distance(distance_m)
+        self.window_s = get_thinning_window(window_s)
+        self.rows_read = 0
+        self.rows_kept = 0
+        self.removed = {'gps': 0, 'coordinates': 0, 'cell_id': 0, 'thinning': 0}
+        self._seen = {}  # {fenêtre: empreintes triées}
+        self._bucket = None  # fenêtre de la dernière ligne datée
+        self._anchors = None
+
+    @property
+    def rows_rejected(self):
+        return self.rows_read - self.rows_kept
+
+    @property
+    def seen_count(self):
+        """
+        Nombre d'empreintes gardées d'un bloc à l'autre.
+        """
+        return sum(len(keys) for keys in self._seen.values())
+
+    def _filter(self, df, mask, step):
+        self.removed[step] += int((~mask).sum())
+        return df[mask]
+
+    def clean(self, df):
+        self.rows_read += len(df)
+
+        # --- Nettoyage géographique ---
+        df = self._filter(df, (df['gps_fix'] >= 1).fillna(False).to_numpy(dtype=bool), 'gps')  # GPS valide
+        df = self._filter(
+            df,
+            (df['lat'].between(-90, 90) & df['lon'].between(-180, 180)
+             & ~((df['lat'] == 0) & (df['lon'] == 0))).to_numpy(dtype=bool),  # point (0,0)
+            'coordinates'
+        )
+
+        # --- Cell_id valide ---
+        df = self._filter(df, (df['cell_id'].notnull() & (df['cell_id'] > 0)).fillna(False).to_numpy(dtype=bool), 'cell_id')
+
+        # --- Suppression des points trop proches ---
+        buckets = self._buckets(df)
+        if self.distance_m > 0:
+            df, removed = thin_points(
+                df, self.distance_m, anchors=self._anchors, seen=self._check_seen, buckets=buckets,
+            )
+            self._anchors = pd.concat([self._anchors, last_points(df)]).drop_duplicates('cell_id', keep='last')
+        else:
+            before = len(df)
+            frame = df[['lat', 'lon', 'cell_id']].astype('float64').assign(bucket=buckets)
+            keys = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+            first = ~pd.Series(keys).duplicated().to_numpy()
+            df, keys, buckets = df[first], keys[first], buckets[first]
+            df = df[~self._check_seen(keys, buckets)]
+            removed = before - len(df)
+        self.removed['thinning'] += removed
+
+        self.rows_kept += len(df)
+        return df
+
+    def _buckets(self, df):
+        """
+        Fenêtre de temps de chaque ligne ; une ligne sans date prend celle
+        de la ligne datée qui la précède.
+        """
+        if not self.window_s or 'time' not in df.columns or df.empty:
+            return np.zeros(len(df), dtype='int64')
+        seconds = (pd.to_datetime(df['time'], utc=True) - pd.Timestamp(0, tz='UTC')).dt.total_seconds()
+        buckets = np.floor(seconds / self.window_s).ffill()
+        if self._bucket is not None:
+            buckets = buckets.fillna(self._bucket)
+        buckets = buckets.bfill().fillna(0).astype('int64')
+        self._bucket = int(buckets.iloc[-1])
+        return buckets.to_numpy()
+
+    def _check_seen(self, keys, buckets):
+        """
+        Masque des clés déjà rencontrées, dans leur fenêtre de temps, lors
+        d'un bloc précédent ; les nouvelles clés sont mémorisées et les
+        fenêtres antérieures au bloc oubliées.
+        """
+        seen = np.zeros(len(keys), dtype=bool)
+        if not len(keys):
+            return seen
+        start = buckets.min()
+        for bucket in [bucket for bucket in self._seen if bucket < start]:
+            del self._seen[bucket]
+        for bucket in np.unique(buckets).tolist():
+            mask = buckets == bucket
+            block = keys[mask]
+            known = self._seen.get(bucket, np.empty(0, dtype=np.uint64))
+            if len(known):
+                position = np.searchsorted(known, block).clip(max=len(known) - 1)
+                seen[mask] = known[position] == block
+            self._seen[bucket] = np.sort(np.concatenate([known, block[~seen[mask]]]))
+        return seen
+
+
+def _column_values(df, column):
+    """
+    Valeurs Python d'une colonne, les valeurs manquantes (NaN/NaT) devenant None.
+    """
+    if column not in df.columns:
+        return [None] * len(df)
+    series = df[column]
+    if series.dtype == np.float32:
+        series = series.astype('float64').round(FLOAT32_DECIMALS)
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def build_csv_lines(df, scan=None):
+    """
+    Construit les instances CSVLine (non sauvegardées) colonne par colonne,
+    rattachées au scan s'il est donné.
+    """
+    names = CSV_COLUMNS + ['geokey', 'scan_id']
+    columns = [_column_values(df, column) for column in CSV_COLUMNS]
+    columns.append(geokeys(df['lat'], df['lon']).tolist())
+    columns.append([scan.pk if scan is not None else None] * len(df))
+    return [CSVLine(**dict(zip(names, values))) for values in zip(*columns)]
+
+
+def use_copy():
+    """
+    Écriture par COPY FROM STDIN : base PostgreSQL et GSM_INGEST_COPY actif.
+    """
+    return getattr(settings, 'GSM_INGEST_COPY', True) and connection.vendor == 'postgresql'
+
+
+def copy_chunks(df, scan=None, chunk_size=COPY_CHUNK_SIZE):
+    """
+    Lignes du DataFrame au format CSV de COPY (colonnes COPY_FIELDS, valeur
+    manquante COPY_NULL), par blocs de ``chunk_size`` lignes. Les valeurs
+    sont celles de build_csv_lines.
+    """
+    now = timezone.now()
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        floats = [column for column in INTEGER_COLUMNS if column in chunk and chunk[column].dtype.kind == 'f']
+        if floats:
+            chunk = chunk.assign(**{column: np.trunc(chunk[column]).astype('Int64') for column in floats})
+        frame = pd.DataFrame({column: _column_values(chunk, column) for column in CSV_COLUMNS}, dtype=object)
+        frame['geokey'] = geokeys(chunk['lat'], chunk['lon']).tolist()
+        frame['scan_id'] = scan.pk if scan is not None else None
+        frame['created_at'] = frame['updated_at'] = now
+        yield frame.to_csv(header=False, index=False, na_rep=COPY_NULL, lineterminator='\n')
+
+
+def copy_lines(scan, df):
+    """
+    Écrit les lignes par COPY FROM STDIN (psycopg 3, ou psycopg2).
+    Retourne le nombre de lignes écrites.
+    """
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(CSVLine._meta.get_field(name).column) for name in COPY_FIELDS)
+    sql = (
+        f"COPY {quote(CSVLine._meta.db_table)} ({columns}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    )
+    chunks = copy_chunks(df, scan)
+    with connection.cursor() as cursor, connection.wrap_database_errors:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy'):
+            with raw.copy(sql) as copy:
+                for chunk in chunks:
+                    copy.write(chunk)
+        else:
+            for chunk in chunks:
+                raw.copy_expert(sql, io.StringIO(chunk))
+    return len(df)
+
+
+def write_lines(scan, df, batch_size=None, copy=None):
+    """
+    Écrit les lignes du DataFrame, rattachées au scan : par COPY si
+    ``copy`` (par défaut : use_copy()), sinon par lots d'INSERT de
+    ``batch_size`` lignes. Retourne le nombre de lignes écrites.
+    """
+    if copy is None:
+        copy = use_copy()
+    if copy:
+        return copy_lines(scan, df)
+
+    batch_size = get_batch_size(batch_size)
+    inserted = 0
+    for start in range(0, len(df), batch_size):
+        lines = CSVLine.objects.bulk_create(
+            build_csv_lines(df.iloc[start:start + batch_size], scan),
+            batch_size=batch_size,
+        )
+        inserted += len(lines)
+    return inserted
+
+
+def bulk_insert_lines(scan, df, batch_size=None, stats=None):
+    """
+    Insère les lignes du DataFrame et les rattache au scan (write_lines).
+    Retourne le nombre de lignes insérées. ``stats`` (ScanStatistics) est
+    mis à jour avec les lignes insérées, de même que les agrégats par
+    cellule.
+
+    Doit être appelé dans une transaction : les lots ne sont pas atomiques
+    entre eux.
+    """
+    from gsm_coverage import aggregates
+
+    if stats is not None:
+        stats.update(df)
+    aggregates.add_frame(df)
+    return write_lines(scan, df, batch_size)
+
+
+def _rewind(file):
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+
+def get_engine(engine=None):
+    """
+    Moteur de lecture pandas : ``settings.GSM_CSV_ENGINE``, par défaut
+    'pyarrow' s'il est installé, 'c' sinon. 'pyarrow' demandé sans le
+    paquet retombe aussi sur 'c'.
+    """
+    if engine is None:
+        engine = getattr(settings, 'GSM_CSV_ENGINE', None) or 'pyarrow'
+    if engine == 'pyarrow' and importlib.util.find_spec('pyarrow') is None:
+        return 'c'
+    return engine
+
+
+def _is_nullable_int(dtype):
+    return dtype[0] in 'UI'
+
+
+def csv_options(engine=None):
+    """
+    Options de pd.read_csv : seules les colonnes attendues sont lues, avec
+    leur type déclaré.
+
+    Avec le moteur C, les entiers nullables et les dates sont nettement plus
+    lents à convertir pendant la lecture : ils sont lus en float64 / texte
+    puis convertis en une passe vectorisée par apply_schema().
+    """
+    engine = get_engine(engine)
+    if engine == 'pyarrow':
+        return {
+            'usecols': CSV_COLUMNS,
+            'dtype': CSV_DTYPES,
+            'parse_dates': CSV_DATE_COLUMNS,
+            'engine': engine,
+        }
+    return {
+        'usecols': CSV_COLUMNS,
+        'dtype': {
+            column: 'float64' if _is_nullable_int(dtype) else dtype
+            for column, dtype in CSV_DTYPES.items()
+        },
+        'engine': engine,
+    }
+
+
+def apply_schema(df):
+    """
+    Convertit les colonnes qui n'ont pas encore leur type déclaré.
+    Lève ValueError si une valeur ne peut pas être convertie.
+    """
+    conversions = {
+        column: dtype for column, dtype in CSV_DTYPES.items()
+        if column in df.columns and df[column].dtype != dtype
+    }
+    if conversions:
+        df = df.astype(conversions)
+    for column in CSV_DATE_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.DatetimeTZDtype):
+            df[column] = pd.to_datetime(df[column], utc=True, format='ISO8601')
+    return df
+
+
+def read_csv(file, engine=None):
+    """
+    Lecture complète d'un fichier CSV uploadé selon le schéma déclaré.
+    Lève ValueError (dont pd.errors.ParserError) si le fichier est mal formé
+    ou si une valeur ne respecte pas le type de sa colonne.
+    """
+    _rewind(file)
+    return apply_schema(pd.read_csv(file, **csv_options(engine)))
+
+
+def read_header(file):
+    """
+    Colonnes du fichier, sans lire les données.
+    """
+    _rewind(file)
+    columns = list(pd.read_csv(file, nrows=0).columns)
+    _rewind(file)
+    return columns
+
+
+def iter_csv_chunks(file, chunk_size=None):
+    """
+    Itère sur le fichier par blocs de ``chunk_size`` lignes.
+    Le moteur pyarrow ne sait pas lire par blocs : le moteur C est utilisé.
+    """
+    _rewind(file)
+    options = csv_options(engine='c')
+    with pd.read_csv(file, chunksize=get_chunk_size(chunk_size), **options) as reader:
+        for chunk in reader:
+            yield apply_schema(chunk)
+
+
+def stream_insert_lines(scan, file, chunk_size=None, batch_size=None, cleaner=None, stats=None, on_chunk=None):
+    """
+    Lit, nettoie et insère le fichier bloc par bloc : la mémoire utilisée
+    dépend de la taille de bloc, pas de la taille du fichier.
+    Retourne le nettoyeur (compteurs de lignes lues / conservées).
+
+    Chaque bloc est écrit dans sa propre transaction : hors transaction
+    englobante, il est validé aussitôt et le verrou d'écriture est relâché
+    entre deux blocs. ``on_chunk`` est appelé (sans argument) après chaque
+    bloc écrit.
+
+    Lève IngestError si le nettoyage n'a conservé aucune ligne ; l'appelant
+    doit alors annuler la transaction, ou supprimer le scan.
+    """
+    cleaner = cleaner or CSVCleaner()
+    missing = missing_columns(read_header(file))
+    if missing:
+        raise IngestError(
+            f"Les colonnes suivantes sont manquantes dans le fichier CSV : {', '.join(missing)}"
+        )
+    try:
+        for chunk in iter_csv_chunks(file, chunk_size):
+            with transaction.atomic():
+                bulk_insert_lines(scan, cleaner.clean(chunk), batch_size, stats=stats)
+            if on_chunk is not None:
+                on_chunk()
+    except ValueError as e:
+        raise IngestError(f"Le fichier CSV est corrompu ou mal formé : {e}")
+
+    if cleaner.rows_kept == 0:
+        raise IngestError("Le nettoyage a supprimé toutes les lignes : vérifiez vos seuils et vos données CSV.")
+    return cleaner
@@ -0,0 +1,206 @@
+"""
+Import asynchrone des fichiers CSV.
+
+Le fichier uploadé est stocké sur un IngestJob ; un pool de threads local
+traite ensuite les jobs en attente, puis les tuiles de couverture à
+reconstruire (PendingTile). Les tables IngestJob et PendingTile servent de
+file d'attente : aucun broker externe n'est nécessaire, et la commande
+``manage.py run_ingest_jobs`` permet de faire tourner un worker séparé.
+
+Au démarrage du processus web (wsgi/asgi), wake() reprend la file laissée
+par le processus précédent. Chaque passage remet d'abord en attente les
+jobs RUNNING sans signe de vie (heartbeat_at : réclamation, puis chaque
+bloc validé d'un import en streaming) depuis GSM_INGEST_JOB_TIMEOUT : le
+worker a été arrêté en cours d'import. Avant de relancer un tel job, le
+scan partiel qu'il avait commencé est supprimé.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+from gsm_coverage.models import GSMScan, IngestJob
+import logging
+import os
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_JOB_TIMEOUT = 3600
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Pool de threads partagé par le processus, créé à la première utilisation.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'GSM_INGEST_WORKERS', DEFAULT_WORKERS),
+                thread_name_prefix='gsm-ingest',
+            )
+        return _executor
+
+
+def wake():
+    """
+    Confie au pool le traitement de la file (jobs et tuiles en attente).
+    """
+    get_executor().submit(process_pending)
+
+
+def enqueue(job):
+    """
+    Réveille un worker une fois le job enregistré en base.
+    """
+    transaction.on_commit(wake)
+    return job
+
+
+def requeue_stale_jobs(timeout=None):
+    """
+    Remet en attente les jobs RUNNING sans signe de vie depuis plus de
+    ``timeout`` secondes (par défaut GSM_INGEST_JOB_TIMEOUT). Retourne leur
+    nombre.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'GSM_INGEST_JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    stale = IngestJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        state=IngestJob.RUNNING,
+    )
+    requeued = stale.update(state=IngestJob.PENDING, started_at=None, updated_at=timezone.now())
+    if requeued:
+        logger.warning("%s job(s) d'import interrompu(s) remis en attente", requeued)
+    return requeued
+
+
+def claim_next_job():
+    """
+    Réclame le plus ancien job en attente. La mise à jour conditionnelle
+    garantit qu'un job n'est pris que par un seul worker.
+    """
+    pending = IngestJob.objects.filter(state=IngestJob.PENDING).order_by('created_at', 'pk')
+    for pk in pending.values_list('pk', flat=True)[:10]:
+        now = timezone.now()
+        claimed = IngestJob.objects.filter(pk=pk, state=IngestJob.PENDING).update(
+            state=IngestJob.RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+            updated_at=now,
+        )
+        if claimed:
+            return IngestJob.objects.get(pk=pk)
+    return None
+
+
+def _error_message(detail):
+    if isinstance(detail, dict):
+        return " ".join(_error_message(value) for value in detail.values())
+    if isinstance(detail, list):
+        return " ".join(_error_message(value) for value in detail)
+    return str(detail)
+
+
+def discard_partial_scan(job):
+    """
+    Supprime le scan laissé par une exécution interrompue du job (import
+    validé bloc par bloc), avec ses lignes et leurs contributions aux
+    agrégats, archives et tuiles (signal pre_delete de GSMScan).
+    """
+    if job.scan_id is None:
+        return
+    scan = GSMScan.objects.filter(pk=job.scan_id).first()
+    if scan is not None:
+        logger.warning("Job d'import %s repris : scan partiel %s supprimé", job.pk, scan.pk)
+        scan.file.delete(save=False)
+        scan.delete()
+    job.scan = None
+
+
+def run_job(job):
+    """
+    Exécute l'import d'un job déjà réclamé (état RUNNING) avec les mêmes
+    règles de validation que GSMScanSerializer.
+    """
+    from gsm_coverage.serializers import GSMScanSerializer
+
+    if job.started_at is None:
+        job.started_at = timezone.now()
+    job.state = IngestJob.RUNNING
+    serializer = None
+
+    try:
+        discard_partial_scan(job)
+        with job.file.open('rb') as f:
+            upload = File(f, name=os.path.basename(job.file.name))
+            upload.size = job.file.size
+            serializer = GSMScanSerializer(
+                data={'file': upload, 'operator': job.operator}, context={'ingest_job': job},
+            )
+            serializer.is_valid(raise_exception=True)
+            scan = serializer.save()
+    except serializers.ValidationError as e:
+        job.state = IngestJob.FAILED
+        job.error = _error_message(e.detail)
+        # Scan partiel déjà supprimé par le serializer
+        job.scan = None
+    except Exception as e:
+        logger.exception("Échec du job d'import %s", job.pk)
+        job.state = IngestJob.FAILED
+        job.error = str(e)
+        job.scan = None
+    else:
+        job.state = IngestJob.SUCCEEDED
+        job.scan = scan
+        job.error = ''
+        # Le fichier est désormais stocké sur le GSMScan
+        job.file.delete(save=False)
+
+    cleaner = getattr(serializer, '_cleaner', None)
+    if cleaner is not None:
+        job.rows_processed = cleaner.rows_read
+        job.rows_rejected = cleaner.rows_rejected
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def process_pending():
+    """
+    Remet en attente les jobs interrompus (requeue_stale_jobs), traite les
+    jobs en attente jusqu'à épuisement de la file, puis reconstruit les
+    tuiles de couverture en attente (gsm_coverage.tiles). Retourne le
+    nombre de jobs traités.
+    """
+    from gsm_coverage import tiles
+
+    processed = 0
+    # Connexions propres aux threads workers ; celle du thread principal
+    # (requête, test) reste gérée par Django
+    worker = threading.current_thread() is not threading.main_thread()
+    if worker:
+        close_old_connections()
+    try:
+        requeue_stale_jobs()
+        while True:
+            job = claim_next_job()
+            if job is None:
+                break
+            run_job(job)
+            processed += 1
+        tiles.process_pending()
+        return processed
+    finally:
+        if worker:
+            connection.close()
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from gsm_coverage import partitions
+import importlib.util
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive en Parquet les mois de mesures antérieurs à GSM_ARCHIVE_AFTER_MONTHS "
+        "(ou à --before) et les retire de la table des mesures."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help="Archive les mois antérieurs à ce mois (AAAA-MM).")
+        parser.add_argument('--dry-run', action='store_true', help="Liste les mois sans les archiver.")
+
+    def handle(self, *args, **options):
+        if importlib.util.find_spec('pyarrow') is None:
+            raise CommandError("pyarrow est requis pour archiver les mesures (extra « archive »).")
+        try:
+            before = partitions.parse_month(options['before']) if options['before'] else partitions.archive_cutoff()
+        except ValueError:
+            raise CommandError("--before : format attendu AAAA-MM.")
+
+        months = {month: count for month, count in partitions.hot_months().items() if month < before}
+        if not months:
+            self.stdout.write(f"Aucun mois à archiver avant {before:%Y-%m}.")
+            return
+        for month, count in months.items():
+            if options['dry_run']:
+                self.stdout.write(f"{month:%Y-%m} : {count} lignes")
+                continue
+            archive = partitions.archive_month(month)
+            self.stdout.write(
+                f"{month:%Y-%m} : {count} lignes archivées "
+                f"({archive.line_count} dans l'archive, {archive.size / 1024:.0f} Ko)"
+            )
@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import reverse
+from gsm_coverage.benchmarks import make_frame, rolled_back, timed
+from gsm_coverage.ingest import bulk_insert_lines
+from gsm_coverage.models import GSMScan
+from gsm_coverage.renderers import binary_renderers
+from rest_framework.test import APIClient
+import json
+import numpy as np
+
+
+def _decoders():
+    decoders = {'application/json': json.loads}
+    for renderer in binary_renderers():
+        if renderer.format == 'msgpack':
+            import msgpack
+            decoders[renderer.media_type] = msgpack.unpackb
+        elif renderer.format == 'arrow':
+            import pyarrow as pa
+            decoders[renderer.media_type] = lambda content: pa.ipc.open_stream(content).read_all()
+    return decoders
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les formats de la liste des mesures (JSON, MessagePack, Arrow IPC) : "
+        "taille de la réponse, temps de rendu serveur et temps de décodage client."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help="Mesures du scan (une seule page).")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        decoders = _decoders()
+        missing = {'msgpack', 'arrow'} - {renderer.format for renderer in binary_renderers()}
+        if missing:
+            self.stdout.write(f"Formats non mesurés (paquet absent) : {', '.join(sorted(missing))}")
+
+        with rolled_back(), override_settings(ALLOWED_HOSTS=['*'], GSM_MEASUREMENT_MAX_PAGE_SIZE=rows):
+            user = get_user_model().objects.create(email='bench_formats@example.com')
+            scan = GSMScan.objects.create(file='bench.csv')
+            bulk_insert_lines(scan, make_frame(rows))
+            client = APIClient()
+            client.force_authenticate(user)
+            url = reverse('measurement-list')
+
+            baseline = None
+            for media_type, decode in decoders.items():
+                responses = [
+                    timed(client.get, url, {'scan': scan.pk, 'page_size': rows}, HTTP_ACCEPT=media_type)
+                    for _ in range(repeat)
+                ]
+                content = responses[-1][0].content
+                decoded = [timed(decode, content)[1] for _ in range(repeat)]
+                baseline = baseline or len(content)
+                self.stdout.write(
+                    f"{media_type:<38} {len(content) / 1024:>8.0f} Ko ({len(content) / baseline:>4.0%}), "
+                    f"réponse {np.median([seconds for _, seconds in responses]) * 1000:>6.0f} ms, "
+                    f"décodage {np.median(decoded) * 1000:>7.2f} ms"
+                )
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from gsm_coverage.benchmarks import make_frame, rate, rolled_back, timed
+from gsm_coverage.ingest import bulk_insert_lines, get_batch_size, use_copy, write_lines
+from gsm_coverage.models import CSVLine, GSMScan
+
+
+def legacy_insert_lines(scan, df):
+    """
+    Ancien chemin d'insertion (une requête par ligne), conservé comme référence.
+    """
+    count = 0
+    for _, row in df.iterrows():
+        CSVLine.objects.create(scan=scan, **row.to_dict())
+        count += 1
+    return count
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit d'insertion (lignes/s) : ancien chemin ligne à ligne, écriture des lignes "
+        "par lots d'INSERT ou par COPY (PostgreSQL), et import complet (avec les agrégats). "
+        "Lancer avec DB_ENGINE=postgresql pour mesurer PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--skip-legacy', action='store_true',
+                            help="N'exécute que le chemin par lots.")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        batch_size = get_batch_size(options['batch_size'])
+        df = make_frame(rows)
+
+        self.stdout.write(f"Base : {connection.vendor}")
+        runs = []
+        if not options['skip_legacy']:
+            runs.append(('legacy', lambda scan: legacy_insert_lines(scan, df)))
+        runs.append((f'insert (batch={batch_size})', lambda scan: write_lines(scan, df, batch_size, copy=False)))
+        if use_copy():
+            runs.append(('copy', lambda scan: write_lines(scan, df, copy=True)))
+        runs.append((f'bulk (batch={batch_size})', lambda scan: bulk_insert_lines(scan, df, batch_size)))
+
+        for name, insert in runs:
+            with rolled_back():
+                scan = GSMScan.objects.create(file='bench.csv')
+                inserted, seconds = timed(insert, scan)
+            self.stdout.write(
+                f"{name:<24} {inserted} lignes en {seconds:.2f}s -> {rate(inserted, seconds):,.0f} lignes/s"
+            )
@@ -0,0 +1,179 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import reverse
+from gsm_coverage.benchmarks import make_frame
+from gsm_coverage.ingest import bulk_insert_lines
+from gsm_coverage.models import GSMData, GSMScan
+from rest_framework_simplejwt.tokens import RefreshToken
+from urllib.parse import urlencode
+import asyncio
+import io
+import numpy as np
+import sys
+import time
+
+
+def _wsgi_get(app, path, query, cookie):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie,
+        'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+    }
+    statuses = []
+    start = time.perf_counter()
+    result = app(environ, lambda status, headers, exc_info=None: statuses.append(int(status.split()[0])))
+    try:
+        for _ in result:
+            pass
+    finally:
+        result.close()
+    return statuses[0], time.perf_counter() - start
+
+
+async def _asgi_get(app, path, query, cookie):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    statuses = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # Le client ne se déconnecte pas
+        await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    return statuses[0], time.perf_counter() - start
+
+
+def wsgi_load(requests, threads):
+    """
+    Requêtes servies par un worker WSGI de ``threads`` threads.
+    """
+    app = get_wsgi_application()
+    with ThreadPoolExecutor(threads) as pool:
+        return list(pool.map(lambda request: _wsgi_get(app, *request), requests))
+
+
+def asgi_load(requests, concurrency):
+    """
+    Requêtes servies par un worker ASGI (une boucle), ``concurrency``
+    clients simultanés.
+    """
+    app = get_asgi_application()
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(request):
+            async with semaphore:
+                return await _asgi_get(app, *request)
+
+        return await asyncio.gather(*(one(request) for request in requests))
+
+    # Boucle lancée directement, comme un serveur ASGI : sous async_to_sync,
+    # le code synchrone (ORM) serait renvoyé dans le thread appelant
+    return asyncio.run(run())
+
+
+def _delay(seconds):
+    """
+    Receveur connection_created : ajoute ``seconds`` à chaque requête SQL
+    (latence d'une base distante).
+    """
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def receiver(sender, connection, **kwargs):
+        # Même objet de connexion à chaque reconnexion
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    return receiver
+
+
+class Command(BaseCommand):
+    help = (
+        "Charge comparée des lectures : routes DRF servies par un worker WSGI (pool de threads), "
+        "puis par un worker ASGI, et routes asynchrones (gsm_coverage.asyncviews) servies par "
+        "un worker ASGI. Les applications sont appelées dans le processus, sans réseau. "
+        "Les données du benchmark sont validées en base puis supprimées."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000, help="Mesures du scan lu.")
+        parser.add_argument('--requests', type=int, default=400, help="Requêtes par mesure.")
+        parser.add_argument('--threads', type=int, default=4, help="Threads du worker WSGI.")
+        parser.add_argument('--concurrency', type=int, default=32, help="Clients simultanés en ASGI.")
+        parser.add_argument('--page-size', type=int, default=200)
+        parser.add_argument('--db-latency', type=float, default=0.0,
+                            help="Latence ajoutée à chaque requête SQL (ms), pour simuler une base distante.")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        user = get_user_model().objects.create(email='bench_load@example.com')
+        gsm_data = GSMData.get(operator='bench_load')
+        scan = GSMScan.objects.create(file='bench_load.csv')
+        receiver = _delay(options['db_latency'] / 1000) if options['db_latency'] else None
+        try:
+            bulk_insert_lines(scan, make_frame(options['rows']))
+            gsm_data.gsm_scan.add(scan)
+            cookie = f'access={RefreshToken.for_user(user).access_token}'
+            times = np.sort(np.array(scan.csv_lines.values_list('time', flat=True)))
+
+            def measurements():
+                after = times[rng.integers(0, len(times))].isoformat()
+                return urlencode({'scan': scan.pk, 'page_size': options['page_size'], 'time_after': after})
+
+            endpoints = [
+                ('measurements', 'measurement-list', 'async_measurement-list', (), measurements),
+                ('gsm_scan (summary)', 'gsm_scan-detail', 'async_gsm_scan-detail', (scan.pk,),
+                 lambda: 'summary=true'),
+            ]
+            if receiver is not None:
+                connection_created.connect(receiver, weak=False)
+            with override_settings(ALLOWED_HOSTS=['*']):
+                for label, name, async_name, url_args, params in endpoints:
+                    queries = [params() for _ in range(options['requests'])]
+                    sync_requests = [(reverse(name, args=url_args), query, cookie) for query in queries]
+                    async_requests = [(reverse(async_name, args=url_args), query, cookie) for query in queries]
+                    self.stdout.write(label)
+                    self.report(f"WSGI  DRF   ({options['threads']} threads)", wsgi_load, sync_requests, options['threads'])
+                    self.report(f"ASGI  DRF   ({options['concurrency']} clients)", asgi_load, sync_requests, options['concurrency'])
+                    self.report(f"ASGI  async ({options['concurrency']} clients)", asgi_load, async_requests, options['concurrency'])
+        finally:
+            if receiver is not None:
+                connection_created.disconnect(receiver)
+            scan.delete()
+            Group.objects.filter(pk=gsm_data.operator_id).delete()
+            gsm_data.delete()
+            user.delete()
+
+    def report(self, label, load, requests, workers):
+        start = time.perf_counter()
+        results = load(requests, workers)
+        seconds = time.perf_counter() - start
+        latencies = np.array([duration for _, duration in results]) * 1000
+        errors = sum(status != 200 for status, _ in results)
+        self.stdout.write(
+            f"  {label:<26} {len(results)} requêtes en {seconds:6.2f}s -> {len(results) / seconds:7.1f} req/s, "
+            f"p50 {np.percentile(latencies, 50):6.1f} ms, p95 {np.percentile(latencies, 95):6.1f} ms"
+            + (f", {errors} erreurs" if errors else "")
+        )
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from gsm_coverage.benchmarks import make_frame, timed
+from gsm_coverage.ingest import get_engine, read_csv
+import os
+import pandas as pd
+import tempfile
+
+
+class Command(BaseCommand):
+    help = "Compare le temps de lecture et la mémoire du DataFrame : lecture sans types, schéma déclaré (moteur C) et pyarrow."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500_000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.csv')
+            make_frame(rows).to_csv(path, index=False)
+            size = os.path.getsize(path) / 1024 ** 2
+            self.stdout.write(f"{rows} lignes, fichier de {size:.1f} Mo")
+
+            runs = [
+                ('sans types (avant)*', lambda: pd.read_csv(path)),
+                ('schéma déclaré (c)', lambda: read_csv(path, engine='c')),
+            ]
+            if get_engine('pyarrow') == 'pyarrow':
+                runs.append(('schéma déclaré (pyarrow)', lambda: read_csv(path, engine='pyarrow')))
+            else:
+                self.stdout.write("pyarrow n'est pas installé : moteur ignoré.")
+
+            for name, read in runs:
+                best = None
+                for _ in range(options['repeat']):
+                    df, seconds = timed(read)
+                    best = seconds if best is None else min(best, seconds)
+                memory = df.memory_usage(deep=True).sum() / 1024 ** 2
+                self.stdout.write(f"{name:<26} {best:.3f}s  {memory:8.1f} Mo en mémoire")
+            self.stdout.write("* 'time' reste du texte, analysé ensuite ligne à ligne à l'insertion.")
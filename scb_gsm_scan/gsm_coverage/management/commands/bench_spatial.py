@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from gsm_coverage import rtree
+from gsm_coverage.benchmarks import make_frame, rate, rolled_back, timed
+from gsm_coverage.ingest import bulk_insert_lines
+from gsm_coverage.models import CSVLine, GSMScan
+import numpy as np
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les recherches par boîte englobante : balayage lat/lon, "
+        "clé spatiale (geokey) et index R-tree SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200_000)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--size', type=float, default=0.01,
+                            help="Côté des boîtes englobantes, en degrés.")
+
+    def handle(self, *args, **options):
+        rows, size = options['rows'], options['size']
+        rng = np.random.default_rng(0)
+        df = make_frame(rows)
+        df['lat'] = rng.uniform(52.3, 52.7, rows)
+        df['lon'] = rng.uniform(13.1, 13.7, rows)
+        corners = np.column_stack([
+            rng.uniform(13.1, 13.7 - size, options['queries']),
+            rng.uniform(52.3, 52.7 - size, options['queries']),
+        ])
+        bboxes = [(lon, lat, lon + size, lat + size) for lon, lat in corners]
+
+        def scan(min_lon, min_lat, max_lon, max_lat):
+            return CSVLine.objects.filter(
+                lat__gte=min_lat, lat__lte=max_lat, lon__gte=min_lon, lon__lte=max_lon,
+            )
+
+        runs = [('lat/lon (balayage)', scan, {})]
+        runs.append(('geokey', CSVLine.objects.in_bbox, {'GSM_SPATIAL_RTREE': False}))
+        if rtree.is_enabled():
+            runs.append(('r-tree', CSVLine.objects.in_bbox, {}))
+        else:
+            self.stdout.write("Index R-tree désactivé (GSM_SPATIAL_RTREE) : non mesuré.")
+
+        with rolled_back():
+            scan_obj = GSMScan.objects.create(file='bench.csv')
+            inserted, seconds = timed(bulk_insert_lines, scan_obj, df)
+            self.stdout.write(
+                f"insertion                {inserted} lignes en {seconds:.2f}s -> {rate(inserted, seconds):,.0f} lignes/s"
+            )
+
+            for name, query, overrides in runs:
+                with override_settings(**overrides):
+                    durations, found = [], 0
+                    for bbox in bboxes:
+                        ids, duration = timed(lambda: list(query(*bbox).values_list('pk', flat=True)))
+                        durations.append(duration)
+                        found += len(ids)
+                self.stdout.write(
+                    f"{name:<24} médiane {np.median(durations) * 1000:.2f} ms, "
+                    f"p95 {np.percentile(durations, 95) * 1000:.2f} ms ({found} lignes)"
+                )
@@ -0,0 +1,233 @@
+from datetime import datetime, timezone
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from gsm_coverage import aggregates
+from gsm_coverage.benchmarks import rate, rolled_back, timed
+from gsm_coverage.export import iter_ndjson
+from gsm_coverage.ingest import CSVCleaner, bulk_insert_lines, get_engine, read_csv
+from gsm_coverage.models import GSMScan
+from gsm_coverage.stats import ScanStatistics
+from gsm_coverage.synthetic import write_csv
+from rest_framework.test import APIClient
+import django
+import json
+import numpy as np
+import os
+import pandas as pd
+import platform
+import subprocess
+import tempfile
+
+
+STAGES = ['parse', 'clean', 'insert', 'list', 'export', 'aggregate']
+
+
+def _revision():
+    """
+    Révision git du dépôt, None hors dépôt.
+    """
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def environment():
+    """
+    Contexte des mesures, enregistré avec les résultats.
+    """
+    return {
+        'revision': _revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'database': connection.vendor,
+        'csv_engine': get_engine(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def list_pages(client, scan, page_size, pages):
+    """
+    Parcourt au plus ``pages`` pages de measurements/ ; retourne le nombre
+    de lignes lues.
+    """
+    url, params, rows = reverse('measurement-list'), {'scan': scan.pk, 'page_size': page_size}, 0
+    for _ in range(pages):
+        response = client.get(url, params)
+        if response.status_code != 200:
+            raise CommandError(f"measurements/ : statut {response.status_code}")
+        data = response.json()
+        rows += len(data['results'])
+        if not data['next']:
+            break
+        url, params = data['next'], None
+    return rows
+
+
+def export_lines(scan):
+    """
+    Consomme l'export NDJSON du scan ; retourne le nombre de lignes.
+    """
+    return sum(chunk.count('\n') for chunk in iter_ndjson(scan.csv_lines.all()))
+
+
+def aggregate_scan(scan):
+    """
+    Statistiques du scan et agrégats par cellule recalculés depuis la base ;
+    retourne le nombre de lignes lues.
+    """
+    scan.refresh_statistics()
+    aggregates.aggregate_frame(aggregates.lines_frame(scan.csv_lines.all()))
+    return scan.line_count
+
+
+class Command(BaseCommand):
+    help = (
+        "Suite de benchmarks de non-régression : pour chaque taille, un scan synthétique "
+        "(gsm_coverage.synthetic) est lu, nettoyé, inséré, listé (measurements/), exporté (NDJSON) "
+        "et agrégé. Les durées sont écrites en JSON (--output) et comparées à un résultat "
+        "précédent (--baseline). Aucune donnée n'est conservée en base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help="Tailles de scan (lignes), séparées par des virgules.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Fichier JSON des résultats.")
+        parser.add_argument('--label', default='', help="Étiquette du résultat (version, branche...).")
+        parser.add_argument('--baseline', help="Résultat JSON précédent, comparé étape par étape.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Ralentissement toléré avant de signaler une régression (0.2 = 20 %%).")
+        parser.add_argument('--min-delta', type=float, default=0.05,
+                            help="Écart minimal (s) pour signaler une régression : les étapes très courtes sont bruitées.")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Termine en erreur si une régression est signalée.")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Passages par taille ; la meilleure durée de chaque étape est retenue.")
+        parser.add_argument('--page-size', type=int, default=1000)
+        parser.add_argument('--list-pages', type=int, default=20, help="Pages de measurements/ lues au plus.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError("--sizes : entiers séparés par des virgules.")
+        if not sizes or min(sizes) < 1:
+            raise CommandError("--sizes : tailles positives attendues.")
+        baseline = self.load_baseline(options['baseline']) if options['baseline'] else {}
+
+        report = {
+            'label': options['label'],
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'seed': options['seed'],
+            'environment': environment(),
+            'results': [],
+        }
+        self.stdout.write(
+            f"Base : {connection.vendor}, révision {report['environment']['revision'] or 'inconnue'}"
+        )
+        regressions = []
+        for size in sizes:
+            result = self.run_size(size, options)
+            report['results'].append(result)
+            regressions += self.report(result, baseline.get(size), options['tolerance'], options['min_delta'])
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Résultats écrits dans {options['output']}")
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"Régressions : {', '.join(regressions)}")
+
+    def load_baseline(self, path):
+        """
+        {taille: {étape: secondes}} d'un résultat précédent.
+        """
+        try:
+            with open(path) as source:
+                data = json.load(source)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Résultat de référence illisible ({path}) : {e}")
+        return {
+            result['rows']: {name: stage['seconds'] for name, stage in result['stages'].items()}
+            for result in data.get('results', [])
+        }
+
+    def run_size(self, size, options):
+        """
+        Génère le scan puis mesure les étapes ``--repeat`` fois ; la
+        meilleure durée de chaque étape est retenue.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench_suite.csv')
+            _, generated = timed(write_csv, path, size, seed=options['seed'])
+            file_size = os.path.getsize(path)
+            runs = [self.run_stages(path, options) for _ in range(options['repeat'])]
+
+        stages = {}
+        for name in STAGES:
+            rows, seconds = min((run[name] for run in runs), key=lambda stage: stage[1])
+            stages[name] = {
+                'rows': rows, 'seconds': round(seconds, 6), 'rows_per_second': round(rate(rows, seconds), 1),
+            }
+        return {'rows': size, 'file_bytes': file_size, 'generate_seconds': round(generated, 6), 'stages': stages}
+
+    def run_stages(self, path, options):
+        """
+        {étape: (lignes, secondes)} d'un passage sur le fichier.
+        """
+        df, seconds = timed(read_csv, path)
+        stages = {'parse': (len(df), seconds)}
+        cleaned, seconds = timed(CSVCleaner().clean, df)
+        stages['clean'] = (len(df), seconds)
+
+        page_size = options['page_size']
+        with rolled_back(), override_settings(ALLOWED_HOSTS=['*'], GSM_MEASUREMENT_MAX_PAGE_SIZE=page_size):
+            user = get_user_model().objects.create(email='bench_suite@example.com')
+            scan = GSMScan.objects.create(file='bench_suite.csv')
+            client = APIClient()
+            client.force_authenticate(user)
+
+            stats = ScanStatistics()
+            rows, seconds = timed(bulk_insert_lines, scan, cleaned, stats=stats)
+            stats.save(scan)
+            stages['insert'] = (rows, seconds)
+            stages['list'] = timed(list_pages, client, scan, page_size, options['list_pages'])
+            stages['export'] = timed(export_lines, scan)
+            stages['aggregate'] = timed(aggregate_scan, scan)
+        return stages
+
+    def report(self, result, baseline, tolerance, min_delta):
+        """
+        Affiche les étapes d'une taille ; retourne les régressions par
+        rapport à ``baseline`` ({étape: secondes}) : plus lentes de
+        ``tolerance`` (relatif) et de ``min_delta`` secondes.
+        """
+        self.stdout.write(f"{result['rows']} lignes ({result['file_bytes'] / 1024 ** 2:.1f} Mo)")
+        regressions = []
+        for name in STAGES:
+            stage = result['stages'][name]
+            line = (
+                f"  {name:<10} {stage['rows']:>9} lignes en {stage['seconds']:8.3f}s "
+                f"-> {stage['rows_per_second']:>12,.0f} lignes/s"
+            )
+            previous = (baseline or {}).get(name)
+            if previous:
+                change = stage['seconds'] / previous - 1
+                line += f"  {change:+.0%} / référence"
+                if change > tolerance and stage['seconds'] - previous > min_delta:
+                    line += "  RÉGRESSION"
+                    regressions.append(f"{name} ({result['rows']} lignes)")
+            self.stdout.write(line)
+        return regressions
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from gsm_coverage.synthetic import DEFAULT_EXTENT_M, DEFAULT_OPERATORS, GENERATE_CHUNK_SIZE, write_csv
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un scan de drive-test synthétique au format d'import (14 colonnes) : trajet routier, "
+        "cellules servantes, technologies et mesures radio réalistes (gsm_coverage.synthetic)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Fichier CSV produit.")
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--operators', default=','.join(DEFAULT_OPERATORS),
+                            help="MCC-MNC séparés par des virgules, interrogés tour à tour.")
+        parser.add_argument('--extent', type=float, default=DEFAULT_EXTENT_M, help="Côté de la zone (m).")
+        parser.add_argument('--interval', type=float, default=1.0, help="Secondes entre deux lignes.")
+        parser.add_argument('--chunk-size', type=int, default=GENERATE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError("--rows doit être positif.")
+        operators = [operator.strip() for operator in options['operators'].split(',') if operator.strip()]
+        if not operators:
+            raise CommandError("--operators ne contient aucun opérateur.")
+
+        start = time.perf_counter()
+        rows = write_csv(
+            options['output'], options['rows'], seed=options['seed'], chunk_size=options['chunk_size'],
+            operators=operators, extent_m=options['extent'], interval=options['interval'],
+        )
+        seconds = time.perf_counter() - start
+        size = os.path.getsize(options['output']) / 1024 ** 2
+        self.stdout.write(f"{options['output']} : {rows} lignes, {size:.1f} Mo en {seconds:.1f}s")
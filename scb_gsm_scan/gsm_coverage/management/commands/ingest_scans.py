@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from gsm_coverage.batch import expand_paths, ingest_batch
+import os
+import tempfile
+import time
+import zipfile
+
+
+class Command(BaseCommand):
+    help = "Importe un lot de fichiers CSV (ou d'archives zip) pour un opérateur, en parallèle."
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Fichiers .csv ou .zip")
+        parser.add_argument('--operator', required=True)
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Nombre de processus (par défaut : GSM_BATCH_WORKERS ou nombre de cœurs).")
+        parser.add_argument('--link', action='store_true',
+                            help="Rattache à l'opérateur les scans identiques déjà importés pour un autre opérateur.")
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            if not os.path.isfile(path):
+                raise CommandError(f"Fichier introuvable : {path}")
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                files = expand_paths(options['paths'], directory)
+            except zipfile.BadZipFile as e:
+                raise CommandError(str(e))
+
+            start = time.perf_counter()
+            results = ingest_batch(options['operator'], files, workers=options['workers'], link=options['link'])
+            elapsed = time.perf_counter() - start
+
+        for result in results:
+            if result.error:
+                self.stderr.write(f"{result.name}: {result.error}")
+            elif result.duplicate:
+                self.stdout.write(f"{result.name}: déjà importé (scan {result.scan})")
+            else:
+                self.stdout.write(
+                    f"{result.name}: scan {result.scan} "
+                    f"({result.rows_processed - result.rows_rejected}/{result.rows_processed} lignes)"
+                )
+        rows = sum(result.rows_processed for result in results)
+        self.stdout.write(f"{len(results)} fichier(s), {rows} lignes lues en {elapsed:.2f}s")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from gsm_coverage import aggregates
+from gsm_coverage.models import CellAggregate
+
+
+class Command(BaseCommand):
+    help = "Recalcule entièrement les agrégats par cellule depuis les lignes CSV, archives mensuelles comprises."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            aggregates.rebuild()
+        self.stdout.write(f"{CellAggregate.objects.count()} cellules")
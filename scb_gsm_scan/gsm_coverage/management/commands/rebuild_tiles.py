@@ -0,0 +1,24 @@
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from gsm_coverage import tiles
+from gsm_coverage.models import GSMData
+
+
+class Command(BaseCommand):
+    help = "Reconstruit entièrement la pyramide de tuiles de couverture (tous les opérateurs ou un seul)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operator', help="Nom du groupe opérateur.")
+
+    def handle(self, *args, **options):
+        operators = GSMData.objects.exclude(operator=None)
+        if options['operator']:
+            try:
+                operators = operators.filter(operator=Group.objects.get(name=options['operator']))
+            except Group.DoesNotExist:
+                raise CommandError(f"Opérateur inconnu : {options['operator']}")
+
+        for gsm_data in operators.select_related('operator'):
+            tiles.rebuild_all(gsm_data.operator_id)
+            count = gsm_data.operator.coveragetile_set.count()
+            self.stdout.write(f"{gsm_data.operator.name} : {count} tuiles")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from gsm_coverage.jobs import process_pending
+from gsm_coverage.models import IngestJob
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker d'import : traite les IngestJob puis les tuiles de couverture en attente (file d'attente en base). "
+        "Les jobs 'running' sans signe de vie depuis GSM_INGEST_JOB_TIMEOUT sont remis en attente à chaque passage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Traite les jobs en attente puis s'arrête.")
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help="Délai (s) entre deux scrutations de la file.")
+        parser.add_argument('--requeue-running', action='store_true',
+                            help="Remet immédiatement en attente tous les jobs 'running', sans attendre "
+                                 "GSM_INGEST_JOB_TIMEOUT (aucun autre worker ne doit tourner).")
+
+    def handle(self, *args, **options):
+        if options['requeue_running']:
+            count = IngestJob.objects.filter(state=IngestJob.RUNNING).update(
+                state=IngestJob.PENDING, started_at=None
+            )
+            self.stdout.write(f"{count} job(s) remis en attente.")
+
+        while True:
+            processed = process_pending()
+            if processed:
+                self.stdout.write(f"{processed} job(s) traité(s).")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
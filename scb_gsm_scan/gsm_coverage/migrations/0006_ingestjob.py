@@ -0,0 +1,52 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gsm_coverage', '0005_rename_cvs_line_gsmscan_csv_lines'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='csvline',
+            options={'verbose_name': 'Ligne CSV', 'verbose_name_plural': 'Lignes CSV'},
+        ),
+        migrations.AlterModelOptions(
+            name='gsmdata',
+            options={'ordering': ['-created_at'], 'verbose_name': 'Donnée GSM', 'verbose_name_plural': 'Données GSM'},
+        ),
+        migrations.AlterModelOptions(
+            name='gsmscan',
+            options={'verbose_name': 'Scan GSM', 'verbose_name_plural': 'Scans GSM'},
+        ),
+        migrations.CreateModel(
+            name='IngestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('file', models.FileField(blank=True, null=True, upload_to='gsm_coverage/jobs/')),
+                ('operator', models.CharField(max_length=150)),
+                ('state', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('succeeded', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=10)),
+                ('rows_processed', models.PositiveIntegerField(default=0)),
+                ('rows_rejected', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('scan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='gsm_coverage.gsmscan')),
+            ],
+            options={
+                'verbose_name': "Job d'import",
+                'verbose_name_plural': "Jobs d'import",
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['state', 'created_at'], name='gsm_coverag_state_a6d44d_idx')],
+            },
+        ),
+    ]
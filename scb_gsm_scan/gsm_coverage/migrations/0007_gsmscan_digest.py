@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gsm_coverage', '0006_ingestjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gsmscan',
+            name='digest',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:22
+
+from django.db import migrations, models
+from gsm_coverage.spatial import geokeys
+
+
+def backfill_geokey(apps, schema_editor):
+    """
+    Calcule la clé spatiale des lignes existantes, par lots.
+    """
+    CSVLine = apps.get_model('gsm_coverage', 'CSVLine')
+    lines = CSVLine.objects.filter(geokey__isnull=True, lat__isnull=False, lon__isnull=False)
+    last_pk = 0
+    while True:
+        batch = list(lines.filter(pk__gt=last_pk).order_by('pk')[:5000])
+        if not batch:
+            break
+        keys = geokeys([line.lat for line in batch], [line.lon for line in batch])
+        for line, key in zip(batch, keys):
+            line.geokey = key
+        CSVLine.objects.bulk_update(batch, ['geokey'], batch_size=1000)
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gsm_coverage', '0007_gsmscan_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvline',
+            name='geokey',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='csvline',
+            index=models.Index(fields=['geokey', 'rat'], name='gsm_coverag_geokey_1f5cf7_idx'),
+        ),
+        migrations.RunPython(backfill_geokey, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('gsm_coverage', '0008_csvline_geokey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoverageTile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('rat', models.CharField(max_length=10)),
+                ('band', models.CharField(max_length=30)),
+                ('z', models.PositiveSmallIntegerField()),
+                ('x', models.PositiveIntegerField()),
+                ('y', models.PositiveIntegerField()),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('cells', models.JSONField(default=dict)),
+                ('operator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth.group')),
+            ],
+            options={
+                'verbose_name': 'Tuile de couverture',
+                'verbose_name_plural': 'Tuiles de couverture',
+                'indexes': [models.Index(fields=['z', 'x', 'y'], name='gsm_coverag_z_ee75f0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('operator', 'rat', 'band', 'z', 'x', 'y'), name='unique_coverage_tile')],
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:38
+
+from django.db import migrations, models
+from gsm_coverage.stats import STATISTICS_COLUMNS, STATISTICS_FIELDS, statistics_from_rows
+
+
+def backfill_statistics(apps, schema_editor):
+    """
+    Calcule les statistiques des scans existants depuis leurs lignes.
+    """
+    GSMScan = apps.get_model('gsm_coverage', 'GSMScan')
+    for scan in GSMScan.objects.iterator():
+        rows = scan.csv_lines.values_list(*STATISTICS_COLUMNS).iterator(chunk_size=5000)
+        statistics_from_rows(rows).apply(scan)
+        scan.save(update_fields=STATISTICS_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gsm_coverage', '0009_coveragetile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gsmscan',
+            name='cell_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='gsmscan',
+            name='line_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='gsmscan',
+            name='max_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='gsmscan',
+            name='max_lon',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='gsmscan',
+            name='min_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='gsmscan',
+            name='min_lon',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='gsmscan',
+            name='rsrp_mean',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='gsmscan',
+            name='rsrp_p10',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='gsmscan',
+            name='rsrp_p50',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='gsmscan',
+            name='rsrp_p90',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='gsmscan',
+            name='time_end',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='gsmscan',
+            name='time_start',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:40
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Q, Sum
+
+
+def backfill_cell_aggregates(apps, schema_editor):
+    """
+    Agrège les lignes existantes par cellule.
+    """
+    CSVLine = apps.get_model('gsm_coverage', 'CSVLine')
+    CellAggregate = apps.get_model('gsm_coverage', 'CellAggregate')
+    located = Q(lat__isnull=False, lon__isnull=False)
+    expressions = {
+        'count': Count('pk'),
+        'first_seen': Min('time'),
+        'last_seen': Max('time'),
+        'coord_count': Count('pk', filter=located),
+        'lat_sum': Sum('lat', filter=located, default=0),
+        'lon_sum': Sum('lon', filter=located, default=0),
+    }
+    for signal, column in (('rsrp', 'rsrp_dbm'), ('rsrq', 'rsrq_db'), ('sinr', 'sinr_db')):
+        expressions[f'{signal}_count'] = Count(column)
+        expressions[f'{signal}_sum'] = Sum(column, default=0)
+        expressions[f'{signal}_sum_sq'] = Sum(F(column) * F(column), default=0)
+        expressions[f'{signal}_min'] = Min(column)
+        expressions[f'{signal}_max'] = Max(column)
+    rows = (
+        CSVLine.objects.filter(cell_id__isnull=False)
+        .values('mccmnc', 'rat', 'cell_id', 'band', 'earfcn')
+        .annotate(**expressions).order_by()
+    )
+    CellAggregate.objects.bulk_create([CellAggregate(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gsm_coverage', '0010_gsmscan_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CellAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('mccmnc', models.CharField(max_length=10)),
+                ('rat', models.CharField(max_length=10)),
+                ('cell_id', models.BigIntegerField()),
+                ('band', models.CharField(max_length=30)),
+                ('earfcn', models.PositiveIntegerField(blank=True, null=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('first_seen', models.DateTimeField(blank=True, null=True)),
+                ('last_seen', models.DateTimeField(blank=True, null=True)),
+                ('coord_count', models.PositiveIntegerField(default=0)),
+                ('lat_sum', models.FloatField(default=0)),
+                ('lon_sum', models.FloatField(default=0)),
+                ('rsrp_count', models.PositiveIntegerField(default=0)),
+                ('rsrp_sum', models.FloatField(default=0)),
+                ('rsrp_sum_sq', models.FloatField(default=0)),
+                ('rsrp_min', models.FloatField(blank=True, null=True)),
+                ('rsrp_max', models.FloatField(blank=True, null=True)),
+                ('rsrq_count', models.PositiveIntegerField(default=0)),
+                ('rsrq_sum', models.FloatField(default=0)),
+                ('rsrq_sum_sq', models.FloatField(default=0)),
+                ('rsrq_min', models.FloatField(blank=True, null=True)),
+                ('rsrq_max', models.FloatField(blank=True, null=True)),
+                ('sinr_count', models.PositiveIntegerField(default=0)),
+                ('sinr_sum', models.FloatField(default=0)),
+                ('sinr_sum_sq', models.FloatField(default=0)),
+                ('sinr_min', models.FloatField(blank=True, null=True)),
+                ('sinr_max', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Agrégat de cellule',
+                'verbose_name_plural': 'Agrégats de cellules',
+                'ordering': ['-count'],
+                'indexes': [models.Index(fields=['cell_id'], name='gsm_coverag_cell_id_eb86d9_idx')],
+                'constraints': [models.UniqueConstraint(fields=('mccmnc', 'rat', 'cell_id', 'band', 'earfcn'), name='unique_cell_aggregate')],
+            },
+        ),
+        migrations.RunPython(backfill_cell_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gsm_coverage', '0011_cellaggregate'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='csvline',
+            name='gsm_coverag_time_9d7a60_idx',
+        ),
+        migrations.AddIndex(
+            model_name='csvline',
+            index=models.Index(fields=['time', 'id'], name='gsm_coverag_time_17a261_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+import sys
+
+
+def copy_scan_links(apps, schema_editor):
+    """
+    Reporte le rattachement des lignes (table GSMScan.csv_lines) sur la clé
+    étrangère CSVLine.scan, en une requête UPDATE. Une ligne rattachée à
+    plusieurs scans garde le plus ancien.
+
+    Une ligne sans scan reste à NULL et n'est pas supprimée : elle compte
+    dans les agrégats par cellule. Leur nombre est signalé ; elles se
+    retrouvent dans l'admin des lignes (filtre « scan » vide).
+    """
+    CSVLine = apps.get_model('gsm_coverage', 'CSVLine')
+    Through = apps.get_model('gsm_coverage', 'GSMScan_csv_lines')
+    first_scan = Through.objects.filter(csvline_id=OuterRef('pk')).order_by('gsmscan_id').values('gsmscan_id')[:1]
+    CSVLine.objects.update(scan_id=Subquery(first_scan))
+    orphans = CSVLine.objects.filter(scan_id=None).count()
+    if orphans:
+        sys.stdout.write(f"\n  {orphans} ligne(s) CSV sans scan laissée(s) avec scan=NULL.")
+
+
+def restore_scan_links(apps, schema_editor):
+    """
+    Retour arrière : recrée les lignes de la table intermédiaire.
+    """
+    CSVLine = apps.get_model('gsm_coverage', 'CSVLine')
+    Through = apps.get_model('gsm_coverage', 'GSMScan_csv_lines')
+    links = CSVLine.objects.exclude(scan_id=None).values_list('pk', 'scan_id').iterator(chunk_size=5000)
+    batch = []
+    for line_id, scan_id in links:
+        batch.append(Through(csvline_id=line_id, gsmscan_id=scan_id))
+        if len(batch) >= 5000:
+            Through.objects.bulk_create(batch)
+            batch = []
+    Through.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gsm_coverage', '0012_csvline_time_id_index'),
+    ]
+
+    operations = [
+        # related_name '+' tant que GSMScan.csv_lines (ManyToMany) existe
+        migrations.AddField(
+            model_name='csvline',
+            name='scan',
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='gsm_coverage.gsmscan',
+            ),
+        ),
+        migrations.RunPython(copy_scan_links, restore_scan_links),
+        migrations.RemoveField(
+            model_name='gsmscan',
+            name='csv_lines',
+        ),
+        migrations.AlterField(
+            model_name='csvline',
+            name='scan',
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.CASCADE,
+                related_name='csv_lines', to='gsm_coverage.gsmscan',
+            ),
+        ),
+    ]
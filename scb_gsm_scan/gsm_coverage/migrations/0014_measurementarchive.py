@@ -0,0 +1,32 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gsm_coverage', '0013_csvline_scan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasurementArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('month', models.DateField(unique=True)),
+                ('file', models.FileField(upload_to='gsm_coverage/archives/')),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('first_time', models.DateTimeField(blank=True, null=True)),
+                ('last_time', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Archive mensuelle de mesures',
+                'verbose_name_plural': 'Archives mensuelles de mesures',
+                'ordering': ['month'],
+            },
+        ),
+    ]
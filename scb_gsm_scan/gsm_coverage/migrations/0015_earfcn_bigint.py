@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gsm_coverage', '0014_measurementarchive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cellaggregate',
+            name='earfcn',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='csvline',
+            name='earfcn',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
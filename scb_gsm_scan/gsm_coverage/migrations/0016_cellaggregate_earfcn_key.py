@@ -0,0 +1,22 @@
+# Generated by Django 5.2.11 on 2026-10-18 17:03
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gsm_coverage', '0015_earfcn_bigint'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='cellaggregate',
+            name='unique_cell_aggregate',
+        ),
+        migrations.AddConstraint(
+            model_name='cellaggregate',
+            constraint=models.UniqueConstraint(models.F('mccmnc'), models.F('rat'), models.F('cell_id'), models.F('band'), django.db.models.functions.comparison.Coalesce('earfcn', models.Value(-1), output_field=models.BigIntegerField()), name='unique_cell_aggregate'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.11 on 2026-10-18 17:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('gsm_coverage', '0016_cellaggregate_earfcn_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingTile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('x', models.PositiveIntegerField()),
+                ('y', models.PositiveIntegerField()),
+                ('operator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth.group')),
+            ],
+            options={
+                'verbose_name': 'Tuile à reconstruire',
+                'verbose_name_plural': 'Tuiles à reconstruire',
+                'constraints': [models.UniqueConstraint(fields=('operator', 'x', 'y'), name='unique_pending_tile')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+def index_archive_scans(apps, schema_editor):
+    """
+    Renseigne les scans des archives existantes depuis la colonne scan_id
+    de leurs fichiers Parquet (lue seule, groupe de lignes par groupe).
+    """
+    MeasurementArchive = apps.get_model('gsm_coverage', 'MeasurementArchive')
+    GSMScan = apps.get_model('gsm_coverage', 'GSMScan')
+    archives = MeasurementArchive.objects.all()
+    if not archives.exists():
+        return
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    for archive in archives:
+        scan_ids = set()
+        with archive.file.storage.open(archive.file.name, 'rb') as source:
+            for batch in pq.ParquetFile(source).iter_batches(columns=['scan_id']):
+                scan_ids.update(pc.unique(batch.column('scan_id').drop_null()).to_pylist())
+        archive.scans.set(GSMScan.objects.filter(pk__in=scan_ids))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gsm_coverage', '0018_ingestjob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurementarchive',
+            name='scans',
+            field=models.ManyToManyField(blank=True, related_name='archives', to='gsm_coverage.gsmscan'),
+        ),
+        migrations.RunPython(index_archive_scans, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,67 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import ASin, Coalesce, Cos, Least, Power, Radians, Sin, Sqrt
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
 from rest_framework import serializers
 from django.contrib.auth.models import Group
 from scb_gsm_scan.models import TimeStamp
+from gsm_coverage import rtree
+from gsm_coverage.stats import STATISTICS_COLUMNS, statistics_from_rows
+from gsm_coverage.spatial import EARTH_RADIUS_M, bbox_key_ranges, geokey, radius_bbox
+import math
+
+
+def distance_expression(lat, lon):
+    """
+    Expression SQL de la distance orthodromique (m) entre chaque ligne et
+    le point donné (formule de haversine).
+    """
+    phi1, phi2 = Radians(Value(float(lat))), Radians(F('lat'))
+    dphi = Radians(F('lat') - Value(float(lat)))
+    dlambda = Radians(F('lon') - Value(float(lon)))
+    a = Power(Sin(dphi / 2), 2) + Cos(phi1) * Cos(phi2) * Power(Sin(dlambda / 2), 2)
+    return 2 * EARTH_RADIUS_M * ASin(Least(Value(1.0), Sqrt(a)))
+
+
+class CSVLineQuerySet(models.QuerySet):
+
+    def in_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """
+        Lignes situées dans la boîte englobante. L'index R-tree (s'il est
+        activé) ou à défaut les intervalles de clés spatiales (index geokey)
+        restreignent la recherche, puis le filtre exact sur lat/lon est
+        appliqué.
+        """
+        if rtree.is_enabled(self.db):
+            sql, params = rtree.bbox_ids_sql(min_lon, min_lat, max_lon, max_lat)
+            candidates = Q(pk__in=RawSQL(sql, params))
+        else:
+            candidates = Q()
+            for start, end in bbox_key_ranges(min_lon, min_lat, max_lon, max_lat):
+                candidates |= Q(geokey__range=(start, end))
+        return self.filter(
+            candidates,
+            lat__gte=min_lat, lat__lte=max_lat,
+            lon__gte=min_lon, lon__lte=max_lon,
+        )
+
+    def within_radius(self, lat, lon, radius_m):
+        """
+        Lignes à moins de ``radius_m`` mètres du point, annotées de leur
+        distance (``distance_m``). Recherche par boîte englobante puis
+        filtre exact sur la distance orthodromique.
+        """
+        return self.in_bbox(*radius_bbox(lat, lon, radius_m)).annotate(
+            distance_m=distance_expression(lat, lon),
+        ).filter(distance_m__lte=radius_m)
 
 
 class CSVLine(TimeStamp):
+    scan = models.ForeignKey(
+        'GSMScan', on_delete=models.CASCADE, related_name='csv_lines', null=True, blank=True,
+    )
     time = models.DateTimeField(null=True, blank=True)
     lat = models.FloatField(null=True, blank=True)
     lon = models.FloatField(null=True, blank=True)
@@ -18,31 +75,102 @@ class CSVLine(TimeStamp):
     pci = models.PositiveSmallIntegerField(null=True, blank=True)
 
     band = models.CharField(max_length=30)
-    earfcn = models.PositiveIntegerField(null=True, blank=True)
+    earfcn = models.PositiveBigIntegerField(null=True, blank=True)
 
     rsrp_dbm = models.IntegerField(null=True, blank=True)
     rsrq_db = models.FloatField(null=True, blank=True)
     sinr_db = models.FloatField(null=True, blank=True)
+
+    # Code z-order de la tuile web mercator (zoom GEOKEY_ZOOM) du point
+    geokey = models.BigIntegerField(null=True, blank=True, editable=False)
+
+    objects = CSVLineQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Ligne CSV"
         verbose_name_plural = "Lignes CSV"
         indexes = [
-            models.Index(fields=["time"]),
+            models.Index(fields=["time", "id"]),
             models.Index(fields=["cell_id"]),
             models.Index(fields=["mccmnc"]),
             models.Index(fields=["rat"]),
+            models.Index(fields=["geokey", "rat"]),
         ]
 
     def __str__(self):
         return f"{self.lat} | Cell {self.lon} | {self.alt}"
 
+    def save(self, *args, **kwargs):
+        self.geokey = geokey(self.lat, self.lon)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'lat', 'lon'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geokey'}
+        return super().save(*args, **kwargs)
+
+class GSMDataQuerySet(models.QuerySet):
+
+    def with_summary(self):
+        """
+        Annote chaque opérateur du nombre de scans et du résumé de leurs
+        lignes, agrégé depuis les statistiques stockées sur les scans.
+        """
+        return self.annotate(
+            scan_count=Count('gsm_scan'),
+            line_count=Coalesce(Sum('gsm_scan__line_count'), 0),
+            min_lat=Min('gsm_scan__min_lat'),
+            max_lat=Max('gsm_scan__max_lat'),
+            min_lon=Min('gsm_scan__min_lon'),
+            max_lon=Max('gsm_scan__max_lon'),
+            time_start=Min('gsm_scan__time_start'),
+            time_end=Max('gsm_scan__time_end'),
+        )
+
+
 class GSMScan(TimeStamp):
     file = models.FileField(upload_to='gsm_coverage/csv/')
-    csv_lines = models.ManyToManyField(CSVLine)
+    digest = models.CharField(max_length=64, blank=True, db_index=True)  # SHA-256 du fichier
+
+    # Statistiques calculées à l'import (voir gsm_coverage.stats)
+    line_count = models.PositiveIntegerField(default=0, editable=False)
+    cell_count = models.PositiveIntegerField(default=0, editable=False)
+    min_lat = models.FloatField(null=True, blank=True, editable=False)
+    max_lat = models.FloatField(null=True, blank=True, editable=False)
+    min_lon = models.FloatField(null=True, blank=True, editable=False)
+    max_lon = models.FloatField(null=True, blank=True, editable=False)
+    time_start = models.DateTimeField(null=True, blank=True, editable=False)
+    time_end = models.DateTimeField(null=True, blank=True, editable=False)
+    rsrp_mean = models.FloatField(null=True, blank=True, editable=False)
+    rsrp_p10 = models.IntegerField(null=True, blank=True, editable=False)
+    rsrp_p50 = models.IntegerField(null=True, blank=True, editable=False)
+    rsrp_p90 = models.IntegerField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return self.file.name
+
+    def refresh_statistics(self):
+        """
+        Recalcule les statistiques depuis les lignes du scan, archivées
+        comprises (après une modification de lignes hors import).
+        """
+        from gsm_coverage.partitions import MeasurementHistory
+
+        rows = MeasurementHistory(self.csv_lines.all(), {'scan': self.pk}).iter_rows(STATISTICS_COLUMNS)
+        stats = statistics_from_rows(rows)
+        return stats.save(self)
+
+    @classmethod
+    def find_duplicate(cls, digest, operator=None, link=False):
+        """
+        Scan déjà importé avec le même contenu pour l'opérateur (nom du groupe).
+        Avec ``link``, un scan identique d'un autre opérateur est aussi retourné.
+        """
+        if not digest:
+            return None
+        scans = cls.objects.filter(digest=digest).order_by('pk')
+        duplicate = scans.filter(gsmdata__operator__name=operator).first()
+        if duplicate is None and link:
+            duplicate = scans.first()
+        return duplicate
     
     class Meta:
         verbose_name = "Scan GSM"
@@ -52,6 +180,8 @@ class GSMScan(TimeStamp):
 class GSMData(TimeStamp):
     operator = models.OneToOneField(Group, on_delete=models.SET_NULL, null=True, blank=True)
     gsm_scan = models.ManyToManyField(GSMScan)
+
+    objects = GSMDataQuerySet.as_manager()
     
     def __str__(self):
         return self.operator.name
@@ -80,5 +210,228 @@ class GSMData(TimeStamp):
             models.Index(fields=["operator"]),
         ]
         ordering = ["-created_at"]
-    
 
+
+class IngestJob(TimeStamp):
+    """
+    Traitement asynchrone d'un fichier CSV uploadé.
+    La file d'attente est la table elle-même : les workers réclament les
+    jobs en attente par une mise à jour conditionnelle de ``state``.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATES = [
+        (PENDING, 'En attente'),
+        (RUNNING, 'En cours'),
+        (SUCCEEDED, 'Terminé'),
+        (FAILED, 'Échec'),
+    ]
+
+    file = models.FileField(upload_to='gsm_coverage/jobs/', null=True, blank=True)
+    operator = models.CharField(max_length=150)
+    state = models.CharField(max_length=10, choices=STATES, default=PENDING)
+    scan = models.ForeignKey(GSMScan, on_delete=models.SET_NULL, null=True, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_rejected = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Dernier signe de vie du worker (réclamation, bloc validé)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Job {self.pk} ({self.state})"
+
+    def beat(self, **fields):
+        """
+        Signe de vie du job en cours (heartbeat_at), enregistré aussitôt
+        avec les champs ``fields`` sans sauvegarder le reste de l'instance.
+        """
+        fields['heartbeat_at'] = timezone.now()
+        IngestJob.objects.filter(pk=self.pk).update(updated_at=fields['heartbeat_at'], **fields)
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @property
+    def duration(self):
+        if self.started_at is None:
+            return None
+        end = self.finished_at or timezone.now()
+        return (end - self.started_at).total_seconds()
+
+    class Meta:
+        verbose_name = "Job d'import"
+        verbose_name_plural = "Jobs d'import"
+        indexes = [
+            models.Index(fields=["state", "created_at"]),
+        ]
+        ordering = ["-created_at"]
+
+
+
+class CoverageTile(TimeStamp):
+    """
+    Tuile web mercator (z/x/y) précalculée de la pyramide de couverture,
+    pour un opérateur, une technologie et une bande.
+
+    ``cells`` contient, par colonne, les cases non vides de la grille
+    TILE_BINS × TILE_BINS de la tuile : indices (i, j), nombre de points et
+    sommes / effectifs des mesures RSRP, RSRQ et SINR. Les sommes
+    permettent d'agréger plusieurs tuiles (toutes bandes, tuile parente)
+    sans revenir aux lignes.
+    """
+    operator = models.ForeignKey(Group, on_delete=models.CASCADE)
+    rat = models.CharField(max_length=10)
+    band = models.CharField(max_length=30)
+    z = models.PositiveSmallIntegerField()
+    x = models.PositiveIntegerField()
+    y = models.PositiveIntegerField()
+    line_count = models.PositiveIntegerField(default=0)
+    cells = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"{self.operator_id} {self.rat} {self.band} {self.z}/{self.x}/{self.y}"
+
+    class Meta:
+        verbose_name = "Tuile de couverture"
+        verbose_name_plural = "Tuiles de couverture"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["operator", "rat", "band", "z", "x", "y"], name="unique_coverage_tile"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["z", "x", "y"]),
+        ]
+
+
+class PendingTile(TimeStamp):
+    """
+    Tuile du zoom maximal à reconstruire pour un opérateur, avec ses
+    ancêtres. Enregistrée dans la transaction de l'import (ou de la
+    suppression) qui la touche, traitée ensuite par le worker des jobs
+    (voir gsm_coverage.tiles.process_pending).
+    """
+    operator = models.ForeignKey(Group, on_delete=models.CASCADE)
+    x = models.PositiveIntegerField()
+    y = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.operator_id} {self.x}/{self.y}"
+
+    class Meta:
+        verbose_name = "Tuile à reconstruire"
+        verbose_name_plural = "Tuiles à reconstruire"
+        constraints = [
+            models.UniqueConstraint(fields=["operator", "x", "y"], name="unique_pending_tile"),
+        ]
+
+
+class CellAggregate(TimeStamp):
+    """
+    Agrégat des mesures d'une cellule radio (mccmnc, rat, cell_id, band,
+    earfcn), tenu à jour de façon incrémentale à chaque import (voir
+    gsm_coverage.aggregates) : effectifs, sommes et sommes des carrés des
+    mesures, extrêmes, première / dernière observation et centroïde.
+    """
+    mccmnc = models.CharField(max_length=10)
+    rat = models.CharField(max_length=10)
+    cell_id = models.BigIntegerField()
+    band = models.CharField(max_length=30)
+    earfcn = models.PositiveBigIntegerField(null=True, blank=True)
+
+    count = models.PositiveIntegerField(default=0)
+    first_seen = models.DateTimeField(null=True, blank=True)
+    last_seen = models.DateTimeField(null=True, blank=True)
+
+    coord_count = models.PositiveIntegerField(default=0)
+    lat_sum = models.FloatField(default=0)
+    lon_sum = models.FloatField(default=0)
+
+    rsrp_count = models.PositiveIntegerField(default=0)
+    rsrp_sum = models.FloatField(default=0)
+    rsrp_sum_sq = models.FloatField(default=0)
+    rsrp_min = models.FloatField(null=True, blank=True)
+    rsrp_max = models.FloatField(null=True, blank=True)
+
+    rsrq_count = models.PositiveIntegerField(default=0)
+    rsrq_sum = models.FloatField(default=0)
+    rsrq_sum_sq = models.FloatField(default=0)
+    rsrq_min = models.FloatField(null=True, blank=True)
+    rsrq_max = models.FloatField(null=True, blank=True)
+
+    sinr_count = models.PositiveIntegerField(default=0)
+    sinr_sum = models.FloatField(default=0)
+    sinr_sum_sq = models.FloatField(default=0)
+    sinr_min = models.FloatField(null=True, blank=True)
+    sinr_max = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.mccmnc} {self.rat} {self.cell_id} {self.band}"
+
+    @property
+    def centroid(self):
+        if not self.coord_count:
+            return None
+        return self.lat_sum / self.coord_count, self.lon_sum / self.coord_count
+
+    def mean(self, signal):
+        count = getattr(self, f'{signal}_count')
+        return getattr(self, f'{signal}_sum') / count if count else None
+
+    def std(self, signal):
+        """
+        Écart-type (population) de la mesure ``signal`` (rsrp, rsrq ou sinr).
+        """
+        count = getattr(self, f'{signal}_count')
+        if not count:
+            return None
+        mean = getattr(self, f'{signal}_sum') / count
+        return math.sqrt(max(0.0, getattr(self, f'{signal}_sum_sq') / count - mean ** 2))
+
+    class Meta:
+        verbose_name = "Agrégat de cellule"
+        verbose_name_plural = "Agrégats de cellules"
+        constraints = [
+            # earfcn manquant compté comme une valeur (-1) : les NULL étant
+            # distincts, une contrainte sur le champ seul laisserait passer
+            # des doublons et l'ON CONFLICT des agrégats ne s'appliquerait pas
+            models.UniqueConstraint(
+                "mccmnc", "rat", "cell_id", "band",
+                Coalesce("earfcn", Value(-1), output_field=models.BigIntegerField()),
+                name="unique_cell_aggregate",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["cell_id"]),
+        ]
+        ordering = ["-count"]
+
+
+class MeasurementArchive(TimeStamp):
+    """
+    Mois de mesures archivé : ses lignes ont quitté la table CSVLine pour
+    un fichier Parquet (colonnes compressées), lu à la demande (voir
+    gsm_coverage.partitions). ``scans`` : scans dont l'archive contient des
+    lignes.
+    """
+    month = models.DateField(unique=True)  # premier jour du mois (UTC)
+    file = models.FileField(upload_to='gsm_coverage/archives/')
+    scans = models.ManyToManyField(GSMScan, related_name='archives', blank=True)
+    line_count = models.PositiveIntegerField(default=0)
+    size = models.PositiveBigIntegerField(default=0)  # octets
+    first_time = models.DateTimeField(null=True, blank=True)
+    last_time = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.month.strftime('%Y-%m')
+
+    class Meta:
+        verbose_name = "Archive mensuelle de mesures"
+        verbose_name_plural = "Archives mensuelles de mesures"
+        ordering = ["month"]
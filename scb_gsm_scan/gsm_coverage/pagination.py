@@ -0,0 +1,211 @@
+"""
+Pagination par curseur (keyset) des mesures, sur l'ordre (time, id).
+
+Le curseur encode la clé (time, id) de la dernière ligne servie : la page
+suivante est lue par une recherche dans l'index (time, id) à partir de
+cette clé, sans OFFSET. Une page profonde coûte donc autant que la
+première. Les lignes sans date sont servies après les autres, par id.
+
+Le nombre total de lignes (COUNT, proportionnel à la taille de la table)
+n'est calculé que sur demande (``count=true``).
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+import binascii
+import json
+
+
+def query_flag(request, name, default=False):
+    """
+    Paramètre booléen de la requête (``1``, ``true`` ou ``yes``) ; ``default``
+    s'il est absent.
+    """
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes')
+
+
+class MeasurementCursorPagination(BasePagination):
+    """
+    Pages de mesures ordonnées par (time, id), dates manquantes en dernier.
+
+    Paramètres : ``cursor`` (lien next / previous de la page précédente),
+    ``page_size`` (borné par GSM_MEASUREMENT_MAX_PAGE_SIZE) et ``count``.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    invalid_cursor_message = "Curseur invalide."
+
+    def get_page_size(self, request):
+        page_size = settings.GSM_MEASUREMENT_PAGE_SIZE
+        value = request.query_params.get(self.page_size_query_param)
+        if value:
+            try:
+                page_size = int(value)
+            except ValueError:
+                pass
+        return max(1, min(page_size, settings.GSM_MEASUREMENT_MAX_PAGE_SIZE))
+
+    # --- Curseur ---
+
+    def encode_cursor(self, line, reverse):
+        payload = {'t': line.time.isoformat() if line.time else None, 'id': line.pk}
+        if reverse:
+            payload['r'] = 1
+        token = urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(urlsafe_b64decode(token.encode()))
+            time = parse_datetime(payload['t']) if payload['t'] is not None else None
+            if payload['t'] is not None and time is None:
+                raise ValueError(payload['t'])
+            return time, int(payload['id']), bool(payload.get('r'))
+        except (binascii.Error, KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    # --- Lecture ---
+
+    def _sections(self, queryset, position, reverse):
+        """
+        Requêtes à lire dans l'ordre de parcours, après (ou avant si
+        ``reverse``) la position (time, id). Les lignes datées et non
+        datées sont lues séparément pour que chaque requête reste une
+        recherche dans l'index.
+        """
+        time, pk = position if position else (None, None)
+        in_undated = position is not None and time is None
+        dated = queryset.filter(time__isnull=False)
+        undated = queryset.filter(time__isnull=True)
+        if reverse:
+            dated = dated.order_by('-time', '-pk')
+            undated = undated.order_by('-pk')
+            if position is not None and not in_undated:
+                dated = dated.filter(time__lte=time).exclude(time=time, pk__gte=pk)
+            if in_undated:
+                undated = undated.filter(pk__lt=pk)
+            return [undated, dated] if in_undated or position is None else [dated]
+
+        dated = dated.order_by('time', 'pk')
+        undated = undated.order_by('pk')
+        if position is not None and not in_undated:
+            dated = dated.filter(time__gte=time).exclude(time=time, pk__lte=pk)
+        if in_undated:
+            undated = undated.filter(pk__gt=pk)
+        return [undated] if in_undated else [dated, undated]
+
+    def _fetch(self, queryset, position, reverse, limit):
+        """
+        ``limit`` lignes à partir de la position, dans l'ordre de parcours.
+        """
+        rows = []
+        for section in self._sections(queryset, position, reverse):
+            rows += list(section[:limit - len(rows)])
+            if len(rows) >= limit:
+                break
+        return rows
+
+    async def _afetch(self, queryset, position, reverse, limit):
+        rows = []
+        for section in self._sections(queryset, position, reverse):
+            rows += [row async for row in section[:limit - len(rows)]]
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def _start(self, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        return (cursor[:2], cursor[2]) if cursor else (None, False)
+
+    def _page(self, rows, position, reverse):
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, more
+        else:
+            self.has_next, self.has_previous = more, position is not None
+        self.page = rows
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        position, reverse = self._start(request)
+        rows = self._page(self._fetch(queryset, position, reverse, self.page_size + 1), position, reverse)
+        self.count = queryset.count() if query_flag(request, self.count_query_param) else None
+        return rows
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        paginate_queryset() par l'ORM asynchrone.
+        """
+        position, reverse = self._start(request)
+        rows = self._page(await self._afetch(queryset, position, reverse, self.page_size + 1), position, reverse)
+        self.count = await queryset.acount() if query_flag(request, self.count_query_param) else None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_data(self, data):
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return payload
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer', 'description': "Présent avec count=true."},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param, 'required': False, 'in': 'query',
+                'description': "Curseur de page (liens next / previous).",
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param, 'required': False, 'in': 'query',
+                'description': f"Nombre de mesures par page (max {settings.GSM_MEASUREMENT_MAX_PAGE_SIZE}).",
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.count_query_param, 'required': False, 'in': 'query',
+                'description': "Ajoute le nombre total de mesures (requête COUNT).",
+                'schema': {'type': 'boolean'},
+            },
+        ]
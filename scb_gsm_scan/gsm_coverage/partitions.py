@@ -0,0 +1,467 @@
+"""
+Partitionnement mensuel des mesures et archives Parquet.
+
+La table CSVLine ne garde que les mois récents (table « chaude »). Un mois
+clos, plus ancien que GSM_ARCHIVE_AFTER_MONTHS, est archivé
+(``manage.py archive_measurements``) : ses lignes sont écrites, triées par
+(time, id), dans un fichier Parquet compressé (zstd) enregistré dans
+MeasurementArchive, puis retirées de la table. Les agrégats par cellule,
+les tuiles de couverture et les statistiques des scans décrivent toutes
+les mesures, archivées comprises : ils ne changent pas à l'archivage et
+sont recalculés en lisant aussi les archives (archived_frames).
+
+Seules les lignes écrites dans l'archive sont retirées : des lignes
+importées pendant l'archivage, ou plus tard dans un mois archivé, sont
+fusionnées avec l'archive au prochain passage, en relisant l'ancien
+fichier lot par lot. Chaque archive est indexée par les scans dont elle
+contient des lignes (MeasurementArchive.scans) : les lignes archivées d'un
+scan supprimé, ou dont le fichier est remplacé, sont retirées des seules
+archives qui en contiennent (purge_scan).
+
+Les lectures sur une période (MeasurementHistory) sont routées d'après les
+filtres time_after / time_before : seules les archives des mois recoupés
+sont ouvertes, et seuls leurs groupes de lignes dont la période recoupe
+les filtres sont décodés, lot par lot ; le reste est lu dans la table.
+Les deux flux sont fusionnés dans l'ordre (time, id), dates manquantes en
+dernier.
+
+Archiver et lire les archives requiert pyarrow (extra ``archive``).
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, DateField, F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from gsm_coverage import aggregates
+from gsm_coverage.filters import parse_bbox, parse_near
+from gsm_coverage.ingest import CSV_COLUMNS
+from gsm_coverage.models import CSVLine, GSMScan, MeasurementArchive
+from gsm_coverage.renderers import measurement_types
+from gsm_coverage.spatial import haversine_m, radius_bbox
+import contextlib
+import heapq
+import itertools
+import numpy as np
+import pandas as pd
+import tempfile
+
+
+ARCHIVE_CHUNK_SIZE = 50_000
+ARCHIVE_COLUMNS = ['pk', 'scan_id'] + CSV_COLUMNS
+# Colonnes lues pour appliquer les filtres aux archives (_expression)
+FILTER_COLUMNS = ['scan_id', 'rat', 'mccmnc', 'band', 'cell_id', 'time', 'lat', 'lon']
+# Nombre d'id par requête de suppression des lignes archivées
+DELETE_CHUNK_SIZE = 10_000
+
+
+# --- Mois ---
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """
+    Intervalle [début, fin) du mois, en UTC.
+    """
+    start = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    end = add_months(month, 1)
+    return start, datetime(end.year, end.month, 1, tzinfo=dt_timezone.utc)
+
+
+def parse_month(value):
+    """
+    Mois au format AAAA-MM.
+    """
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+def archive_cutoff(now=None):
+    """
+    Premier mois gardé dans la table chaude.
+    """
+    return add_months(month_start(now or timezone.now()), -settings.GSM_ARCHIVE_AFTER_MONTHS)
+
+
+def hot_months():
+    """
+    {mois: nombre de lignes} des lignes datées de la table chaude.
+    """
+    rows = (
+        CSVLine.objects.filter(time__isnull=False)
+        .annotate(month=TruncMonth('time', output_field=DateField()))
+        .values('month').annotate(count=Count('pk')).order_by('month')
+    )
+    return {row['month']: row['count'] for row in rows}
+
+
+# --- Écriture ---
+
+def archive_schema():
+    import pyarrow as pa
+
+    types = dict(measurement_types(), scan_id=pa.int64())
+    return pa.schema([(column, types[column]) for column in ARCHIVE_COLUMNS])
+
+
+def _batches(lines, schema, pks):
+    """
+    Lots Arrow des lignes, triées par (time, id). Les id des lignes lues
+    sont ajoutés à ``pks`` (tableaux numpy).
+    """
+    import pyarrow as pa
+
+    rows = lines.order_by('time', 'pk').values_list(*ARCHIVE_COLUMNS).iterator(chunk_size=ARCHIVE_CHUNK_SIZE)
+    while chunk := list(itertools.islice(rows, ARCHIVE_CHUNK_SIZE)):
+        columns = zip(*chunk)
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema,
+        )
+        pks.append(batch.column('pk').to_numpy())
+        yield batch
+
+
+def _delete_archived(pks):
+    """
+    Retire de la table les lignes d'id ``pks``, par paquets. Agrégats et
+    tuiles ne changent pas : ils comptent aussi les lignes archivées.
+    Retourne les scans concernés.
+    """
+    scan_ids = set()
+    for start in range(0, len(pks), DELETE_CHUNK_SIZE):
+        lines = CSVLine.objects.filter(pk__in=pks[start:start + DELETE_CHUNK_SIZE].tolist())
+        scan_ids.update(lines.exclude(scan=None).values_list('scan_id', flat=True).distinct())
+        lines.delete()
+    return scan_ids
+
+
+def _merge(streams, schema):
+    """
+    Fusionne des suites de lots triés par (time, id), datés, en une suite
+    triée. Seules les lignes lues au-delà de la plus petite des dernières
+    clés lues restent en mémoire : au plus un lot par suite.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    order = [('time', 'ascending'), ('pk', 'ascending')]
+    streams = [iter(stream) for stream in streams]
+    last, pending = {}, []
+
+    def read(index):
+        for batch in streams[index]:
+            if batch.num_rows:
+                pending.append(batch)
+                last[index] = (batch.column('time')[-1].as_py(), batch.column('pk')[-1].as_py())
+                return
+        last.pop(index, None)
+
+    for index in range(len(streams)):
+        read(index)
+    while last:
+        time, pk = min(last.values())
+        table = pa.Table.from_batches(pending, schema)
+        time = pa.scalar(time, type=schema.field('time').type)
+        ready = pc.or_(
+            pc.less(table['time'], time),
+            pc.and_(pc.equal(table['time'], time), pc.less_equal(table['pk'], pk)),
+        )
+        yield from table.filter(ready).sort_by(order).to_batches(ARCHIVE_CHUNK_SIZE)
+        pending = table.filter(pc.invert(ready)).to_batches()
+        read(min(last, key=last.get))
+    yield from pa.Table.from_batches(pending, schema).sort_by(order).to_batches(ARCHIVE_CHUNK_SIZE)
+
+
+def _write(writer, batches, archive):
+    """
+    Écrit les lots (triés par time, id) et renseigne l'effectif et la
+    période de l'archive. Retourne les scans des lignes écrites.
+    """
+    import pyarrow.compute as pc
+
+    archive.line_count, archive.first_time = 0, None
+    scan_ids = set()
+    for batch in batches:
+        if not batch.num_rows:
+            continue
+        writer.write_batch(batch)
+        times = batch.column('time')
+        archive.line_count += batch.num_rows
+        archive.first_time = archive.first_time or times[0].as_py()
+        archive.last_time = times[-1].as_py()
+        scan_ids.update(pc.unique(batch.column('scan_id').drop_null()).to_pylist())
+    return scan_ids
+
+
+def _save(archive, batches, schema):
+    """
+    Écrit les lots dans un nouveau fichier Parquet de l'archive (non
+    enregistrée). Retourne les scans des lignes écrites.
+    """
+    import pyarrow.parquet as pq
+
+    with tempfile.TemporaryFile() as tmp:
+        with pq.ParquetWriter(tmp, schema, compression='zstd') as writer:
+            scan_ids = _write(writer, batches, archive)
+        archive.size = tmp.tell()
+        tmp.seek(0)
+        archive.file.save(f'measurements_{archive.month:%Y_%m}.parquet', File(tmp), save=False)
+    return scan_ids
+
+
+def archive_month(month):
+    """
+    Archive les lignes du mois présentes dans la table chaude (fusionnées
+    avec l'archive existante du mois) et les retire de la table. Retourne
+    la MeasurementArchive, ou None si le mois n'a aucune ligne chaude.
+
+    Seules les lignes écrites dans le fichier sont supprimées (par id) :
+    une ligne validée entre la lecture et la suppression reste dans la
+    table jusqu'au prochain archivage.
+    """
+    import pyarrow.parquet as pq
+
+    start, end = month_bounds(month)
+    lines = CSVLine.objects.filter(time__gte=start, time__lt=end)
+    schema = archive_schema()
+
+    with transaction.atomic():
+        if not lines.exists():
+            return None
+        archive = MeasurementArchive.objects.select_for_update().filter(month=month).first()
+        previous = archive.file.name if archive is not None else None
+        archive = archive or MeasurementArchive(month=month)
+
+        pks = []
+        batches = _batches(lines, schema, pks)
+        with contextlib.ExitStack() as stack:
+            if previous:
+                # Mois déjà archivé : l'ancienne archive, relue lot par lot,
+                # est fusionnée dans l'ordre avec les nouvelles lignes
+                source = stack.enter_context(archive.file.storage.open(previous, 'rb'))
+                archived = (batch.cast(schema) for batch in pq.ParquetFile(source).iter_batches(ARCHIVE_CHUNK_SIZE))
+                batches = _merge([archived, batches], schema)
+            archived_scans = _save(archive, batches, schema)
+        try:
+            archive.save()
+            archive.scans.set(archived_scans)
+            scan_ids = _delete_archived(np.concatenate(pks) if pks else np.empty(0, dtype='int64'))
+            # Change la version des réponses en cache des scans (gsm_coverage.caching)
+            GSMScan.objects.filter(pk__in=scan_ids).update(updated_at=timezone.now())
+        except BaseException:
+            archive.file.delete(save=False)
+            raise
+
+    if previous and previous != archive.file.name:
+        archive.file.storage.delete(previous)
+    return archive
+
+
+def purge_scan(scan_id):
+    """
+    Retire des archives les lignes du scan (scan supprimé, ou fichier
+    remplacé : ses anciennes lignes ne doivent plus être lues), ainsi que
+    leurs contributions aux agrégats par cellule. Seules les archives
+    indexées pour le scan sont ouvertes ; elles sont réécrites, celles qui
+    se vident supprimées. Les anciens fichiers sont supprimés après la
+    validation de la transaction.
+
+    Les tuiles touchées sont à relever avant (tiles.scan_tiles).
+    """
+    with transaction.atomic():
+        archives = list(MeasurementArchive.objects.select_for_update().filter(scans=scan_id).order_by('month'))
+        if not archives:
+            return
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        schema = archive_schema()
+        keep = pc.field('scan_id').is_null() | (pc.field('scan_id') != scan_id)
+        removed = []
+
+        def kept(parquet):
+            for batch in parquet.iter_batches(ARCHIVE_CHUNK_SIZE):
+                removed.append(batch.filter(~keep).select(aggregates.LINE_COLUMNS).to_pandas())
+                yield batch.filter(keep).cast(schema)
+
+        for archive in archives:
+            storage, previous = archive.file.storage, archive.file.name
+            with storage.open(previous, 'rb') as source:
+                scan_ids = _save(archive, kept(pq.ParquetFile(source)), schema)
+            if archive.line_count:
+                archive.save()
+                archive.scans.set(scan_ids)
+            else:
+                archive.file.delete(save=False)
+                archive.delete()
+            transaction.on_commit(lambda storage=storage, name=previous: storage.delete(name))
+        aggregates.remove_frame(pd.concat(removed, ignore_index=True))
+
+
+# --- Lecture ---
+
+def _expression(filters):
+    """
+    Filtre pyarrow équivalent aux filtres (cleaned_data de CSVLineFilter).
+    """
+    import pyarrow.compute as pc
+
+    expression = pc.scalar(True)
+    if filters.get('scan') is not None:
+        expression &= pc.field('scan_id') == int(filters['scan'])
+    if filters.get('operator') is not None:
+        scan_ids = GSMScan.objects.filter(gsmdata__operator=filters['operator']).values_list('pk', flat=True)
+        expression &= pc.field('scan_id').isin(list(scan_ids))
+    for name in ('rat', 'mccmnc', 'band'):
+        if filters.get(name):
+            expression &= pc.field(name) == filters[name]
+    if filters.get('cell_id') is not None:
+        expression &= pc.field('cell_id') == int(filters['cell_id'])
+    if filters.get('time_after') is not None:
+        expression &= pc.field('time') >= filters['time_after']
+    if filters.get('time_before') is not None:
+        expression &= pc.field('time') < filters['time_before']
+
+    boxes = []
+    if filters.get('bbox'):
+        boxes.append(parse_bbox(filters['bbox']))
+    if filters.get('near'):
+        boxes.append(radius_bbox(*parse_near(filters['near'])))
+    for min_lon, min_lat, max_lon, max_lat in boxes:
+        expression &= (
+            (pc.field('lat') >= min_lat) & (pc.field('lat') <= max_lat)
+            & (pc.field('lon') >= min_lon) & (pc.field('lon') <= max_lon)
+        )
+    return expression
+
+
+def archived_frames(columns, bbox=None, **values):
+    """
+    DataFrames des colonnes ``columns`` des lignes archivées, archive par
+    archive et lot par lot. ``bbox`` : (min_lon, min_lat, max_lon, max_lat)
+    des coordonnées gardées ; ``values`` : {colonne: valeurs admises}. Avec
+    ``scan_id``, seules les archives indexées pour ces scans sont ouvertes.
+    """
+    archives = MeasurementArchive.objects.order_by('month')
+    if 'scan_id' in values:
+        archives = archives.filter(scans__in=values['scan_id']).distinct()
+    read = list(dict.fromkeys([*columns, *values, *(['lat', 'lon'] if bbox else [])]))
+    for archive in archives:
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        expression = pc.scalar(True)
+        for column, admitted in values.items():
+            expression &= pc.field(column).isin(list(admitted))
+        if bbox:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            expression &= (
+                (pc.field('lat') >= min_lat) & (pc.field('lat') <= max_lat)
+                & (pc.field('lon') >= min_lon) & (pc.field('lon') <= max_lon)
+            )
+        with archive.file.storage.open(archive.file.name, 'rb') as source:
+            for batch in pq.ParquetFile(source).iter_batches(ARCHIVE_CHUNK_SIZE, columns=read):
+                batch = batch.filter(expression)
+                if batch.num_rows:
+                    yield batch.select(columns).to_pandas()
+
+
+def _sort_key(time, pk):
+    return (time is None, time, pk)
+
+
+class MeasurementHistory:
+    """
+    Mesures filtrées, table chaude et archives confondues, dans l'ordre
+    (time, id). ``queryset`` : lignes chaudes déjà filtrées ; ``filters`` :
+    valeurs validées des mêmes filtres, appliquées aux archives.
+    """
+
+    def __init__(self, queryset, filters):
+        self.queryset = queryset
+        self.filters = filters
+
+    def archives(self):
+        """
+        Archives des mois recoupant la période demandée ; avec les filtres
+        scan / operator, celles indexées pour ces scans.
+        """
+        archives = MeasurementArchive.objects.order_by('month')
+        if self.filters.get('scan') is not None:
+            archives = archives.filter(scans=self.filters['scan'])
+        if self.filters.get('operator') is not None:
+            archives = archives.filter(scans__gsmdata__operator=self.filters['operator']).distinct()
+        time_after, time_before = self.filters.get('time_after'), self.filters.get('time_before')
+        if time_after is not None:
+            archives = archives.filter(month__gte=month_start(time_after.astimezone(dt_timezone.utc)))
+        if time_before is not None:
+            last = (time_before - timedelta(microseconds=1)).astimezone(dt_timezone.utc)
+            archives = archives.filter(month__lte=last.date())
+        return archives
+
+    def row_groups(self, metadata):
+        """
+        Groupes de lignes du fichier dont la période (statistiques de la
+        colonne time) recoupe time_after / time_before.
+        """
+        time_after, time_before = self.filters.get('time_after'), self.filters.get('time_before')
+        column = metadata.schema.to_arrow_schema().get_field_index('time')
+        groups = []
+        for index in range(metadata.num_row_groups):
+            statistics = metadata.row_group(index).column(column).statistics
+            if statistics is not None and statistics.has_min_max:
+                if time_after is not None and statistics.max < time_after:
+                    continue
+                if time_before is not None and statistics.min >= time_before:
+                    continue
+            groups.append(index)
+        return groups
+
+    def _archived_rows(self, archive, fields):
+        import pyarrow.parquet as pq
+
+        columns = list(dict.fromkeys([*fields, 'time', 'pk', 'lat', 'lon']))
+        near = parse_near(self.filters['near']) if self.filters.get('near') else None
+        expression = _expression(self.filters)
+        with archive.file.storage.open(archive.file.name, 'rb') as source:
+            parquet = pq.ParquetFile(source)
+            batches = parquet.iter_batches(
+                ARCHIVE_CHUNK_SIZE, row_groups=self.row_groups(parquet.metadata),
+                columns=list(dict.fromkeys(columns + FILTER_COLUMNS)),
+            )
+            # Lot par lot : l'archive d'un mois n'est jamais chargée en entier
+            for batch in batches:
+                yield from self._rows(batch.filter(expression), columns, fields, near)
+
+    def _rows(self, batch, columns, fields, near):
+        data = batch.to_pydict()
+        for values in zip(*(data[column] for column in columns)):
+            row = dict(zip(columns, values))
+            if near is not None and haversine_m(near[0], near[1], row['lat'], row['lon']) > near[2]:
+                continue
+            yield _sort_key(row['time'], row['pk']), tuple(row[field] for field in fields)
+
+    def _hot_rows(self, fields):
+        rows = (
+            self.queryset.order_by(F('time').asc(nulls_last=True), 'pk')
+            .values_list(*fields, 'time', 'pk').iterator(chunk_size=ARCHIVE_CHUNK_SIZE)
+        )
+        for row in rows:
+            yield _sort_key(row[-2], row[-1]), row[:-2]
+
+    def iter_rows(self, fields):
+        """
+        Tuples des champs ``fields`` (noms de colonnes de CSVLine).
+        """
+        archived = itertools.chain.from_iterable(
+            self._archived_rows(archive, fields) for archive in self.archives()
+        )
+        for _, row in heapq.merge(archived, self._hot_rows(fields), key=lambda item: item[0]):
+            yield row
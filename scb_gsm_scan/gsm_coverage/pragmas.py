@@ -0,0 +1,55 @@
+"""
+Profil des connexions SQLite.
+
+Chaque connexion SQLite ouverte reçoit les PRAGMA de
+settings.GSM_SQLITE_PRAGMAS (signal connection_created) :
+
+- ``journal_mode`` WAL : un import en cours ne bloque plus les lectures,
+  qui voient l'état de la dernière transaction validée ;
+- ``synchronous`` NORMAL : en WAL, fsync aux seuls checkpoints et non à
+  chaque validation. Une coupure de courant peut perdre les dernières
+  transactions validées, sans corrompre la base ;
+- ``cache_size`` (négatif : en Kio) et ``mmap_size`` (octets) : cache de
+  pages de la connexion et lecture du fichier par mmap ;
+- ``temp_store`` MEMORY : tris et index temporaires en mémoire ;
+- ``busy_timeout`` (ms) : attente d'un verrou avant « database is locked ».
+
+Les transactions sont ouvertes en BEGIN IMMEDIATE (option
+``transaction_mode`` de DATABASES) : un écrivain prend le verrou
+d'écriture dès le début de la transaction et attend donc busy_timeout si
+un autre écrit déjà, au lieu d'échouer lors du passage de la lecture à
+l'écriture, que SQLite ne fait pas attendre.
+"""
+from django.conf import settings
+
+
+PRAGMAS = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout')
+
+
+def configure(connection):
+    """
+    Applique les PRAGMA configurés à une connexion SQLite.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'GSM_SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name in PRAGMAS:
+            value = pragmas.get(name)
+            if value is None or value == '':
+                continue
+            if not str(value).lstrip('-').isalnum():
+                raise ValueError(f"Valeur invalide pour PRAGMA {name} : {value!r}")
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def current(connection):
+    """
+    {pragma: valeur} en vigueur sur la connexion.
+    """
+    with connection.cursor() as cursor:
+        values = {}
+        for name in PRAGMAS:
+            cursor.execute(f'PRAGMA {name}')
+            values[name] = cursor.fetchone()[0]
+    return values
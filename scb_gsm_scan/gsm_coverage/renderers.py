@@ -0,0 +1,120 @@
+"""
+Formats binaires des collections de mesures, choisis par l'en-tête Accept
+(avec la version : ``Accept: application/vnd.apache.arrow.stream; version=v1``)
+ou le paramètre ``format``.
+
+- MessagePack (``application/msgpack``) : même structure que le JSON
+  (une table clé/valeur par ligne), nombres en binaire.
+- Arrow IPC (``application/vnd.apache.arrow.stream``) : une colonne typée
+  par champ, chaînes répétées (rat, mccmnc, band) encodées en
+  dictionnaire. Les champs de pagination (next, previous, count) sont
+  dans les métadonnées du schéma ; une réponse qui n'est pas une liste de
+  lignes (erreur) est transmise en JSON dans la métadonnée ``json``.
+
+Les deux formats reposent sur des paquets optionnels (msgpack, pyarrow) :
+seuls les formats dont le paquet est installé sont proposés.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+import importlib.util
+import json
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    requires = 'msgpack'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        import msgpack
+
+        if data is None:
+            return b''
+        return msgpack.packb(data, use_bin_type=True, default=DjangoJSONEncoder().default)
+
+
+def measurement_types():
+    """
+    Types Arrow des champs de CSVLineSerializer, couvrant les bornes des
+    champs du modèle (PositiveIntegerField : jusqu'à 2**32 - 1).
+    """
+    import pyarrow as pa
+
+    return {
+        'pk': pa.int64(),
+        'time': pa.timestamp('us', tz='UTC'),
+        'lat': pa.float64(),
+        'lon': pa.float64(),
+        'alt': pa.float64(),
+        'gps_fix': pa.int32(),
+        'rat': pa.string(),
+        'mccmnc': pa.string(),
+        'cell_id': pa.int64(),
+        'pci': pa.int32(),
+        'band': pa.string(),
+        'earfcn': pa.int64(),
+        'rsrp_dbm': pa.int32(),
+        'rsrq_db': pa.float64(),
+        'sinr_db': pa.float64(),
+    }
+
+
+# Colonnes de chaînes répétées, encodées en dictionnaire
+DICTIONARY_COLUMNS = ('rat', 'mccmnc', 'band')
+
+
+class ArrowRenderer(BaseRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+    requires = 'pyarrow'
+
+    def _table(self, rows, metadata):
+        import pyarrow as pa
+
+        types = measurement_types()
+        columns = list(rows[0]) if rows else list(types)
+        arrays = []
+        for column in columns:
+            values = [row.get(column) for row in rows]
+            arrow_type = types.get(column)
+            if arrow_type is not None and pa.types.is_timestamp(arrow_type):
+                array = pa.array(values, type=pa.string()).cast(arrow_type)
+            else:
+                array = pa.array(values, type=arrow_type)
+            if column in DICTIONARY_COLUMNS:
+                array = array.dictionary_encode()
+            arrays.append(array)
+        return pa.Table.from_arrays(arrays, names=columns, metadata=metadata)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        import pyarrow as pa
+
+        if data is None:
+            return b''
+        if isinstance(data, dict) and isinstance(data.get('results'), list):
+            rows = data['results']
+            metadata = {key: json.dumps(value, cls=DjangoJSONEncoder) for key, value in data.items() if key != 'results'}
+        elif isinstance(data, list):
+            rows, metadata = data, {}
+        else:
+            rows, metadata = None, {'json': json.dumps(data, cls=DjangoJSONEncoder)}
+
+        table = self._table(rows, metadata) if rows is not None else pa.table({}).replace_schema_metadata(metadata)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+BINARY_RENDERERS = [MessagePackRenderer, ArrowRenderer]
+
+
+def binary_renderers():
+    """
+    Renderers binaires dont le paquet est installé.
+    """
+    return [renderer for renderer in BINARY_RENDERERS if importlib.util.find_spec(renderer.requires) is not None]
@@ -0,0 +1,104 @@
+"""
+Index spatial R-tree SQLite des points de mesure.
+
+Une table virtuelle ``rtree`` reprend les coordonnées de chaque CSVLine
+(un rectangle dégénéré lat/lon par point). Elle est tenue à jour par des
+triggers SQLite : les insertions par lots (bulk_create), suppressions et
+modifications de lat/lon s'y répercutent sans code applicatif.
+
+L'index est optionnel (``settings.GSM_SPATIAL_RTREE``) et n'existe qu'avec
+le moteur sqlite3 ; il est créé (ou supprimé) après chaque ``migrate``.
+Les coordonnées R-tree étant stockées en float32 arrondis vers l'extérieur,
+les recherches retournent un sur-ensemble : un filtrage exact sur lat/lon
+doit suivre.
+"""
+from django.conf import settings
+from django.db import connections
+
+
+def rtree_table():
+    from gsm_coverage.models import CSVLine
+    return f'{CSVLine._meta.db_table}_rtree'
+
+
+def is_enabled(using='default'):
+    """
+    Vrai si l'index R-tree doit être utilisé sur cette base.
+    """
+    return (
+        getattr(settings, 'GSM_SPATIAL_RTREE', False)
+        and connections[using].vendor == 'sqlite'
+    )
+
+
+def _statements():
+    from gsm_coverage.models import CSVLine
+    table = CSVLine._meta.db_table
+    rtree = rtree_table()
+    insert = (
+        f'INSERT INTO {rtree} (id, min_lat, max_lat, min_lon, max_lon) '
+        f'SELECT new.id, new.lat, new.lat, new.lon, new.lon '
+        f'WHERE new.lat IS NOT NULL AND new.lon IS NOT NULL;'
+    )
+    return [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {rtree} USING rtree(id, min_lat, max_lat, min_lon, max_lon)',
+        f'CREATE TRIGGER IF NOT EXISTS {rtree}_insert AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {rtree}_delete AFTER DELETE ON {table} '
+        f'BEGIN DELETE FROM {rtree} WHERE id = old.id; END',
+        f'CREATE TRIGGER IF NOT EXISTS {rtree}_update AFTER UPDATE OF lat, lon ON {table} '
+        f'BEGIN DELETE FROM {rtree} WHERE id = old.id; {insert} END',
+    ]
+
+
+def install(using='default'):
+    """
+    Crée la table R-tree et ses triggers s'ils n'existent pas, puis indexe
+    les lignes absentes de l'index. Idempotent.
+    """
+    from gsm_coverage.models import CSVLine
+    table = CSVLine._meta.db_table
+    rtree = rtree_table()
+    with connections[using].cursor() as cursor:
+        for statement in _statements():
+            cursor.execute(statement)
+        cursor.execute(
+            f'INSERT INTO {rtree} (id, min_lat, max_lat, min_lon, max_lon) '
+            f'SELECT id, lat, lat, lon, lon FROM {table} '
+            f'WHERE lat IS NOT NULL AND lon IS NOT NULL '
+            f'AND id NOT IN (SELECT id FROM {rtree})'
+        )
+
+
+def drop(using='default'):
+    """
+    Supprime la table R-tree et ses triggers.
+    """
+    rtree = rtree_table()
+    with connections[using].cursor() as cursor:
+        for suffix in ('insert', 'delete', 'update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {rtree}_{suffix}')
+        cursor.execute(f'DROP TABLE IF EXISTS {rtree}')
+
+
+def sync(using='default'):
+    """
+    Aligne la base sur ``settings.GSM_SPATIAL_RTREE`` (appelé après migrate).
+    """
+    if connections[using].vendor != 'sqlite':
+        return
+    if is_enabled(using):
+        install(using)
+    else:
+        drop(using)
+
+
+def bbox_ids_sql(min_lon, min_lat, max_lon, max_lat):
+    """
+    Sous-requête (sql, params) des identifiants dont le rectangle R-tree
+    intersecte la boîte englobante.
+    """
+    return (
+        f'SELECT id FROM {rtree_table()} '
+        f'WHERE max_lat >= %s AND min_lat <= %s AND max_lon >= %s AND min_lon <= %s',
+        (min_lat, max_lat, min_lon, max_lon),
+    )
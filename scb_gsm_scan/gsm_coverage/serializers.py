@@ -1,10 +1,25 @@
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+from django.conf import settings
 from django.db import transaction
-from gsm_coverage.models import CSVLine, GSMScan, GSMData
+from gsm_coverage.models import CSVLine, GSMScan, GSMData, IngestJob, CellAggregate, MeasurementArchive
+from gsm_coverage.uploadhandler import file_digest
+from gsm_coverage import aggregates, partitions, tiles
+from gsm_coverage.stats import STATISTICS_FIELDS, ScanStatistics
+from gsm_coverage.ingest import (
+    CSVCleaner, IngestError, bulk_insert_lines, missing_columns, read_csv,
+    read_header, stream_insert_lines, use_streaming
+)
+from scb_gsm_scan.timing import TimedSerializerMixin, span
+import logging
 import pandas as pd
 
 
-class CSVLineSerializer(serializers.ModelSerializer):
+logger = logging.getLogger(__name__)
+
+
+class CSVLineSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer pour les lignes individuelles du CSV.
     Permet de valider et de sérialiser chaque entrée avant insertion en base.
@@ -21,23 +36,122 @@ class CSVLineSerializer(serializers.ModelSerializer):
         ]
 
 
-class GSMScanSerializer(serializers.ModelSerializer):
+def _datetime_converter(field):
+    """
+    Équivalent de ``DateTimeField.to_representation`` pour le format
+    ISO 8601, avec le fuseau résolu une seule fois (et non à chaque valeur).
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or tz is None:
+        return field.to_representation
+
+    def convert(value):
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+class CSVLineValuesSerializer:
+    """
+    Sérialisation en lecture seule des mesures à partir des tuples d'un
+    ``values_list(..., named=True)`` : même représentation que
+    CSVLineSerializer, sans instance de modèle ni appel de champ DRF par
+    valeur.
+
+    ``fields`` : liste ``pk,time,...`` (paramètre ``?fields=``), par défaut
+    tous les champs de CSVLineSerializer.
+    """
+    # Champs dont la valeur lue en base est déjà la représentation
+    PLAIN_FIELDS = (serializers.IntegerField, serializers.FloatField, serializers.CharField)
+
+    def __init__(self, fields=None):
+        available = CSVLineSerializer.Meta.fields
+        self.fields = [name.strip() for name in fields.split(',') if name.strip()] if fields else list(available)
+        unknown = [name for name in self.fields if name not in available]
+        if unknown or not self.fields:
+            raise serializers.ValidationError(
+                {'fields': f"Champs inconnus : {', '.join(unknown)}. Champs disponibles : {', '.join(available)}."}
+            )
+        declared = CSVLineSerializer().fields
+        self.converters = {}
+        for name in self.fields:
+            field = declared[name]
+            if isinstance(field, serializers.DateTimeField):
+                self.converters[name] = _datetime_converter(field)
+            elif not isinstance(field, self.PLAIN_FIELDS):
+                self.converters[name] = field.to_representation
+
+    def columns(self, *required):
+        """
+        Colonnes à lire : champs demandés puis colonnes ``required`` (clé de
+        pagination), sans doublon.
+        """
+        return list(dict.fromkeys(self.fields + list(required)))
+
+    def to_representation(self, rows):
+        names = self.fields
+        converters = [(index, self.converters[name]) for index, name in enumerate(names) if name in self.converters]
+        data = []
+        with span('serialize'):
+            for row in rows:
+                item = dict(zip(names, row))
+                for index, convert in converters:
+                    value = row[index]
+                    if value is not None:
+                        item[names[index]] = convert(value)
+                data.append(item)
+        return data
+
+
+@extend_schema_field(CSVLineSerializer(many=True))
+class ScanLinesField(serializers.Field):
+    """
+    Lignes du scan, mois archivés compris. Sans archive (``archives``
+    préchargées), les lignes préchargées sont sérialisées ; sinon les
+    lignes sont lues par MeasurementHistory, dans l'ordre (time, id).
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return instance
+
+    def to_representation(self, scan):
+        if not scan.archives.all():
+            return CSVLineSerializer(scan.csv_lines.all(), many=True, context=self.context).data
+        values = CSVLineValuesSerializer()
+        history = partitions.MeasurementHistory(scan.csv_lines.all(), {'scan': scan.pk})
+        return values.to_representation(history.iter_rows(values.fields))
+
+
+class GSMScanSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer principal pour GSMScan.
     Vérifie que le fichier uploadé est un CSV valide et que toutes les colonnes attendues sont présentes.
     Crée ensuite des instances CSVLine pour chaque ligne du fichier.
     """
     
-    csv_lines = CSVLineSerializer(many=True, read_only=True, required=False)
+    csv_lines = ScanLinesField(required=False)
     operator = serializers.CharField(write_only=True)
+    link = serializers.BooleanField(
+        write_only=True, required=False, default=False,
+        help_text="Si un scan identique existe pour un autre opérateur, le rattacher à cet opérateur au lieu de réimporter le fichier."
+    )
     class Meta:
         model = GSMScan
         fields = [
             'pk',
             'file',
+            'digest',
+            *STATISTICS_FIELDS,
             'csv_lines',
             'operator',
+            'link',
         ]
+        read_only_fields = ['digest', *STATISTICS_FIELDS]
         extra_kwargs = {
             'file': {'required': True}
         }
@@ -46,68 +160,117 @@ class GSMScanSerializer(serializers.ModelSerializer):
         """
         Validation du fichier uploadé:
         - Vérifie l'extension CSV
+        - Récupère l'empreinte SHA-256 calculée pendant l'upload
+
+        Le contenu n'est lu que dans validate(), une fois vérifié que le
+        fichier n'a pas déjà été importé.
+        """
+        if not value.name.endswith('.csv'):
+            raise serializers.ValidationError("Le fichier doit avoir l'extension .csv.")
+
+        self._digest = file_digest(value)
+        return value
+
+    def validate(self, attrs):
+        """
+        Un fichier identique déjà importé pour l'opérateur est réutilisé
+        sans être relu ni réinséré ; avec ``link``, un scan identique d'un
+        autre opérateur est rattaché à celui-ci.
+        """
+        link = attrs.pop('link', False)
+        self.duplicate_of = None
+        file = attrs.get('file')
+        if file is None:
+            return attrs
+
+        attrs['digest'] = self._digest
+        if self.instance is None:
+            self.duplicate_of = GSMScan.find_duplicate(self._digest, attrs.get('operator'), link=link)
+            if self.duplicate_of is not None:
+                return attrs
+
+        try:
+            with span('ingest.validate'):
+                self._validate_content(file)
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError({'file': e.detail})
+        return attrs
+
+    def _validate_content(self, value):
+        """
+        Validation du contenu:
         - Vérifie que le fichier est lisible
         - Vérifie que toutes les colonnes attendues sont présentes
         - Nettoyage géographique, radio, cell_id et doublons
+
+        Au-delà de GSM_INGEST_STREAMING_THRESHOLD octets, seul l'en-tête est
+        vérifié ici : le nettoyage est fait bloc par bloc lors de l'insertion.
         """
-        if not value.name.endswith('.csv'):
-            raise serializers.ValidationError("Le fichier doit avoir l'extension .csv.")
+        self._csv_df = None
+        self._cleaner = CSVCleaner()
+        self._streaming = use_streaming(value)
 
         try:
-            df = pd.read_csv(value)
-        except pd.errors.ParserError:
+            columns = read_header(value)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError):
             raise serializers.ValidationError("Le fichier CSV est corrompu ou mal formé.")
 
-        expected_columns = [
-            'time', 'lat', 'lon', 'alt', 'gps_fix',
-            'rat', 'mccmnc', 'cell_id',
-            'pci',
-            'band', 'earfcn',
-            'rsrp_dbm', 'rsrq_db', 'sinr_db'
-        ]
-
-        missing_columns = [col for col in expected_columns if col not in df.columns]
-        if missing_columns:
+        missing = missing_columns(columns)
+        if missing:
             raise serializers.ValidationError(
-                f"Les colonnes suivantes sont manquantes dans le fichier CSV : {', '.join(missing_columns)}"
+                f"Les colonnes suivantes sont manquantes dans le fichier CSV : {', '.join(missing)}"
             )
 
-        # --- Nettoyage géographique ---
-        initial_count = len(df)
-        df = df[
-            df['gps_fix'] >= 1  # GPS valide
-        ]
-        df = df[
-            df['lat'].between(-90, 90) & df['lon'].between(-180, 180)
-        ]
-        df = df[~((df['lat'] == 0) & (df['lon'] == 0))]  # point (0,0)
-
-        # --- Nettoyage radio ---
-        # df = df[
-        #     df['rsrp_dbm'].between(-200, -44)
-        #     # df['rsrq_db'].between(-20, -3) &
-        #     # df['sinr_db'].between(-10, 30)
-        # ]
-
-        # --- Cell_id valide ---
-        df = df[df['cell_id'].notnull() & (df['cell_id'] > 0)]
-
-        # --- Suppression des points trop proches (5 m approx) ---
-        df = df.assign(
-            lat = df['lat'].round(5),
-            lon = df['lon'].round(5)
-        )
-        df = df.drop_duplicates(subset=['lat', 'lon', 'cell_id'])
-        final_count = len(df)
+        if self._streaming:
+            return value
+
+        try:
+            with span('ingest.read'):
+                df = read_csv(value)
+        except ValueError:
+            raise serializers.ValidationError("Le fichier CSV est corrompu ou mal formé.")
+
+        with span('ingest.clean'):
+            df = self._cleaner.clean(df)
 
-        if final_count == 0:
+        if len(df) == 0:
             raise serializers.ValidationError("Le nettoyage a supprimé toutes les lignes : vérifiez vos seuils et vos données CSV.")
 
         # Stockage du dataframe nettoyé pour create/update
         self._csv_df = df
         return value
 
-    
+    def _insert_lines(self, scan, file):
+        """
+        Insère les lignes du fichier : depuis le DataFrame validé, ou bloc
+        par bloc en mode streaming. Les statistiques du scan sont calculées
+        au passage et reportées sur l'instance.
+        """
+        df = getattr(self, '_csv_df', None)
+        stats = ScanStatistics()
+        try:
+            with span('ingest.insert'):
+                if df is not None:
+                    bulk_insert_lines(scan, df, stats=stats)
+                elif getattr(self, '_streaming', False):
+                    self._cleaner = CSVCleaner()
+                    job = self.context.get('ingest_job')
+                    stream_insert_lines(
+                        scan, file, cleaner=self._cleaner, stats=stats, on_chunk=job.beat if job else None,
+                    )
+                else:
+                    self._cleaner = CSVCleaner()
+                    bulk_insert_lines(scan, self._cleaner.clean(read_csv(file)), stats=stats)
+        except IngestError as e:
+            raise serializers.ValidationError({'file': [str(e)]})
+        stats.apply(scan)
+
+        cleaner = self._cleaner
+        logger.info(
+            "Scan %s : %d lignes lues, %d conservées, lignes supprimées par étape : %s",
+            scan.pk, cleaner.rows_read, cleaner.rows_kept, cleaner.removed
+        )
+
     def create(self, validated_data):
         """
         Création d'un GSMScan et des lignes CSV associées.
@@ -115,27 +278,52 @@ class GSMScanSerializer(serializers.ModelSerializer):
         """
         operator = validated_data.pop('operator')
         gsm_data = GSMData.get(operator=operator)
+
+        if self.duplicate_of is not None:
+            # Fichier déjà importé : rien n'est relu ni inséré
+            gsm_data.gsm_scan.add(self.duplicate_of)
+            return self.duplicate_of
+
+        file = validated_data.get('file')
+        if file is None:
+            raise serializers.ValidationError("Le fichier CSV est requis pour créer un GSMScan.")
+        with span('ingest.create'):
+            if getattr(self, '_streaming', False) and settings.GSM_INGEST_COMMIT_CHUNKS:
+                return self._create_in_chunks(validated_data, gsm_data, file)
+
+            with transaction.atomic():
+                # Enregistre le GSMScan puis insère les lignes par lots
+                scan_instance = super().create(validated_data)
+                self._insert_lines(scan_instance, file)
+                scan_instance.save(update_fields=STATISTICS_FIELDS)
+                gsm_data.gsm_scan.add(scan_instance)
+                return scan_instance
+
+    def _create_in_chunks(self, validated_data, gsm_data, file):
+        """
+        Import en streaming validé bloc par bloc (GSM_INGEST_COMMIT_CHUNKS) :
+        aucune transaction ne dure tout l'import, les autres écrivains
+        n'attendent qu'un bloc. Le scan n'est rattaché à l'opérateur qu'une
+        fois toutes ses lignes écrites ; en cas d'échec il est supprimé
+        avec ses lignes et leurs contributions aux agrégats. Le job d'import
+        éventuel (contexte ``ingest_job``) référence le scan dès sa création,
+        pour que sa reprise après un arrêt du worker supprime le scan partiel.
+        """
         with transaction.atomic():
-            file = validated_data.get('file')
-            if file is None:
-                raise serializers.ValidationError("Le fichier CSV est requis pour créer un GSMScan.")
-
-            # Lecture du dataframe (déjà validé)
-            df = getattr(self, '_csv_df', None)
-            if df is None:
-                df = pd.read_csv(file)
-
-            # Création des lignes CSV
-            csv_lines = []
-            for _, row in df.iterrows():
-                line = CSVLine.objects.create(**row.to_dict())
-                csv_lines.append(line)
-
-            # Enregistre le GSMScan avec la relation vers les lignes créées
             scan_instance = super().create(validated_data)
-            scan_instance.csv_lines.set(csv_lines)
-            gsm_data.gsm_scan.add(scan_instance)
-            return scan_instance
+        job = self.context.get('ingest_job')
+        if job is not None:
+            job.beat(scan=scan_instance)
+        try:
+            self._insert_lines(scan_instance, file)
+            with transaction.atomic():
+                scan_instance.save(update_fields=STATISTICS_FIELDS)
+                gsm_data.gsm_scan.add(scan_instance)
+        except BaseException:
+            scan_instance.file.delete(save=False)
+            scan_instance.delete()
+            raise
+        return scan_instance
 
     def update(self, instance, validated_data):
         """
@@ -145,26 +333,49 @@ class GSMScanSerializer(serializers.ModelSerializer):
         with transaction.atomic():
             file = validated_data.get('file', None)
             if file:
-                # Supprime les anciennes lignes pour éviter les doublons
-                instance.cvs_line.all().delete()
+                # Tuiles de couverture des anciennes lignes, à reconstruire aussi
+                affected = tiles.scan_tiles(instance)
 
-                # Lecture du dataframe
-                df = getattr(self, '_csv_df', None)
-                if df is None:
-                    df = pd.read_csv(file)
+                # Supprime les anciennes lignes (et leurs contributions aux
+                # agrégats par cellule), y compris archivées, pour éviter les
+                # doublons
+                aggregates.delete_lines(instance.csv_lines.all())
+                partitions.purge_scan(instance.pk)
 
-                # Création des nouvelles lignes CSV
-                csv_lines = []
-                for _, row in df.iterrows():
-                    line = CSVLine.objects.create(**row.to_dict())
-                    csv_lines.append(line)
+                # Création des nouvelles lignes CSV par lots
+                self._insert_lines(instance, file)
 
-                instance.cvs_line.set(csv_lines)
+                affected |= tiles.scan_tiles(instance)
+                tiles.schedule_rebuild(instance.gsmdata_set.values_list('operator', flat=True), affected)
 
             return super().update(instance, validated_data)
 
 
-class GSMDataSerializer(serializers.ModelSerializer):
+class GSMScanBatchSerializer(serializers.Serializer):
+    """
+    Import groupé : plusieurs fichiers CSV et/ou une archive zip pour un opérateur.
+    """
+    files = serializers.ListField(child=serializers.FileField(), allow_empty=False)
+    operator = serializers.CharField()
+    link = serializers.BooleanField(required=False, default=False)
+
+    def validate_files(self, value):
+        for file in value:
+            if not file.name.lower().endswith(('.csv', '.zip')):
+                raise serializers.ValidationError("Les fichiers doivent avoir l'extension .csv ou .zip.")
+        return value
+
+
+class GSMScanBatchResultSerializer(TimedSerializerMixin, serializers.Serializer):
+    name = serializers.CharField()
+    scan = serializers.IntegerField(allow_null=True)
+    rows_processed = serializers.IntegerField()
+    rows_rejected = serializers.IntegerField()
+    duplicate = serializers.BooleanField()
+    error = serializers.CharField(allow_blank=True)
+
+
+class GSMDataSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer pour GSMData.
     Les champs read_only assurent que seuls certains champs sont modifiables via l'API.
@@ -178,3 +389,156 @@ class GSMDataSerializer(serializers.ModelSerializer):
             'operator': {'required': True, 'read_only': True},
             'gsm_data': {'required': False, 'read_only': True},
         }
+
+
+class SummaryFieldsMixin(serializers.Serializer):
+    """
+    Champs de résumé (statistiques du scan, ou agrégats de
+    ``GSMData.objects.with_summary()``) : nombre de lignes, boîte
+    englobante [min_lon, min_lat, max_lon, max_lat] et période.
+    """
+    line_count = serializers.IntegerField(read_only=True)
+    bbox = serializers.SerializerMethodField()
+    time_start = serializers.DateTimeField(read_only=True)
+    time_end = serializers.DateTimeField(read_only=True)
+
+    def get_bbox(self, obj) -> list[float] | None:
+        bbox = [obj.min_lon, obj.min_lat, obj.max_lon, obj.max_lat]
+        return None if None in bbox else bbox
+
+
+class GSMScanSummarySerializer(TimedSerializerMixin, SummaryFieldsMixin, serializers.ModelSerializer):
+    """
+    Représentation résumée d'un scan, sans ses lignes.
+    """
+    class Meta:
+        model = GSMScan
+        fields = [
+            'pk', 'file', 'digest', 'created_at', 'line_count', 'cell_count', 'bbox',
+            'time_start', 'time_end', 'rsrp_mean', 'rsrp_p10', 'rsrp_p50', 'rsrp_p90',
+        ]
+        read_only_fields = fields
+
+
+class GSMDataSummarySerializer(TimedSerializerMixin, SummaryFieldsMixin, serializers.ModelSerializer):
+    """
+    Représentation résumée d'un opérateur : nombre de scans et résumé de
+    l'ensemble de leurs lignes.
+    """
+    scan_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = GSMData
+        fields = ['operator', 'scan_count', 'line_count', 'bbox', 'time_start', 'time_end']
+        read_only_fields = fields
+
+
+class IngestJobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer pour les jobs d'import asynchrone.
+    À la création, seuls l'extension et l'en-tête du fichier sont vérifiés :
+    le nettoyage et l'insertion sont faits par le worker.
+    """
+
+    duration = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = IngestJob
+        fields = [
+            'pk',
+            'file',
+            'operator',
+            'state',
+            'scan',
+            'rows_processed',
+            'rows_rejected',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+            'duration',
+        ]
+        read_only_fields = [
+            'state', 'scan', 'rows_processed', 'rows_rejected', 'error',
+            'created_at', 'started_at', 'finished_at',
+        ]
+        extra_kwargs = {
+            'file': {'required': True, 'write_only': True}
+        }
+
+    def validate_file(self, value):
+        if not value.name.endswith('.csv'):
+            raise serializers.ValidationError("Le fichier doit avoir l'extension .csv.")
+        try:
+            columns = read_header(value)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError):
+            raise serializers.ValidationError("Le fichier CSV est corrompu ou mal formé.")
+        missing = missing_columns(columns)
+        if missing:
+            raise serializers.ValidationError(
+                f"Les colonnes suivantes sont manquantes dans le fichier CSV : {', '.join(missing)}"
+            )
+        return value
+
+
+class CellAggregateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Agrégat d'une cellule : effectifs, moyennes, écarts-types et extrêmes
+    des mesures, période d'observation et centroïde [lat, lon].
+    """
+    centroid = serializers.SerializerMethodField()
+    rsrp_mean = serializers.SerializerMethodField()
+    rsrp_std = serializers.SerializerMethodField()
+    rsrq_mean = serializers.SerializerMethodField()
+    rsrq_std = serializers.SerializerMethodField()
+    sinr_mean = serializers.SerializerMethodField()
+    sinr_std = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CellAggregate
+        fields = [
+            'pk',
+            'mccmnc', 'rat', 'cell_id', 'band', 'earfcn',
+            'count', 'first_seen', 'last_seen', 'centroid',
+            'rsrp_count', 'rsrp_mean', 'rsrp_std', 'rsrp_min', 'rsrp_max',
+            'rsrq_count', 'rsrq_mean', 'rsrq_std', 'rsrq_min', 'rsrq_max',
+            'sinr_count', 'sinr_mean', 'sinr_std', 'sinr_min', 'sinr_max',
+        ]
+        read_only_fields = fields
+
+    def get_centroid(self, obj) -> list[float] | None:
+        centroid = obj.centroid
+        return None if centroid is None else [round(value, 7) for value in centroid]
+
+    def _round(self, value):
+        return None if value is None else round(value, 2)
+
+    def get_rsrp_mean(self, obj) -> float | None:
+        return self._round(obj.mean('rsrp'))
+
+    def get_rsrp_std(self, obj) -> float | None:
+        return self._round(obj.std('rsrp'))
+
+    def get_rsrq_mean(self, obj) -> float | None:
+        return self._round(obj.mean('rsrq'))
+
+    def get_rsrq_std(self, obj) -> float | None:
+        return self._round(obj.std('rsrq'))
+
+    def get_sinr_mean(self, obj) -> float | None:
+        return self._round(obj.mean('sinr'))
+
+    def get_sinr_std(self, obj) -> float | None:
+        return self._round(obj.std('sinr'))
+
+
+class MeasurementArchiveSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Mois archivé : nombre de lignes, taille du fichier Parquet et période.
+    """
+    month = serializers.DateField(format='%Y-%m')
+
+    class Meta:
+        model = MeasurementArchive
+        fields = ['pk', 'month', 'line_count', 'size', 'first_time', 'last_time', 'updated_at']
+        read_only_fields = fields
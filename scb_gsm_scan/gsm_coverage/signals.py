@@ -1,2 +1,83 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_migrate, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from gsm_coverage import aggregates, partitions, pragmas, rtree, tiles
+from gsm_coverage.models import GSMData, GSMScan
+from scb_gsm_scan import timing
 
-    
\ No newline at end of file
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    """
+    Applique le profil SQLite (WAL, cache, busy_timeout...) aux nouvelles connexions.
+    """
+    pragmas.configure(connection)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """
+    Mesure du SQL des requêtes HTTP échantillonnées (scb_gsm_scan.timing).
+    """
+    if settings.GSM_SERVER_TIMING and settings.GSM_SERVER_TIMING_SQL:
+        timing.instrument(connection)
+
+
+@receiver(post_migrate)
+def sync_spatial_index(sender, using, **kwargs):
+    """
+    Crée ou supprime l'index R-tree des mesures selon la configuration.
+    """
+    if sender.name == 'gsm_coverage':
+        rtree.sync(using)
+
+
+@receiver(m2m_changed, sender=GSMData.gsm_scan.through)
+def rebuild_coverage_tiles(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Reconstruit les tuiles de couverture touchées lorsqu'un scan est
+    rattaché à un opérateur (ou détaché).
+    """
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    if reverse:
+        scans = [instance]
+        operators = GSMData.objects.filter(pk__in=pk_set).values_list('operator', flat=True)
+    else:
+        scans = GSMScan.objects.filter(pk__in=pk_set)
+        operators = [instance.operator_id]
+    affected = set()
+    for scan in scans:
+        affected |= tiles.scan_tiles(scan)
+    tiles.schedule_rebuild(operators, affected)
+
+
+@receiver(m2m_changed, sender=GSMData.gsm_scan.through)
+def touch_gsm_data(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Date de modification des GSMData dont les scans changent : elle entre
+    dans la version des réponses mises en cache (gsm_coverage.caching).
+    """
+    if action in ('post_add', 'post_remove') and pk_set:
+        data = GSMData.objects.filter(pk__in=pk_set) if reverse else GSMData.objects.filter(pk=instance.pk)
+    elif action == 'post_clear' and not reverse:
+        data = GSMData.objects.filter(pk=instance.pk)
+    else:
+        return
+    data.update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=GSMScan)
+def remove_scan_lines(sender, instance, **kwargs):
+    """
+    Suppression d'un scan : ses lignes (supprimées avec lui) sont retirées
+    des agrégats par cellule, des tuiles de couverture et des archives
+    mensuelles.
+    """
+    affected = tiles.scan_tiles(instance)
+    operators = list(instance.gsmdata_set.values_list('operator', flat=True))
+    aggregates.delete_lines(instance.csv_lines.all())
+    partitions.purge_scan(instance.pk)
+    tiles.schedule_rebuild(operators, affected)
@@ -0,0 +1,273 @@
+"""
+Outils spatiaux sur les points de mesure.
+
+Éclaircissement (thinning) : pour chaque cell_id, dans l'ordre du temps,
+un point est supprimé s'il est à moins de ``distance_m`` mètres du dernier
+point conservé. Le calcul est linéaire :
+
+1. les coordonnées sont projetées en mètres (projection équirectangulaire
+   locale, suffisante à l'échelle de quelques mètres) ;
+2. une grille de pas ``distance_m / √2`` regroupe les points (deux points
+   d'une même case sont donc à moins de ``distance_m``) : seul le premier
+   point (dans le temps) de chaque case est conservé, en O(n). Les cases
+   peuvent être comptées par fenêtre de temps : un lieu revisité après la
+   fenêtre garde un nouveau point ;
+3. une seule passe gloutonne sur les points restants compare chacun au
+   dernier point conservé de la même cellule.
+"""
+import math
+import numpy as np
+import pandas as pd
+
+
+EARTH_METERS_PER_DEGREE = 111_320.0
+
+
+def project_meters(lat, lon):
+    """
+    Coordonnées locales (x, y) en mètres.
+    """
+    lat = np.asarray(lat, dtype='float64')
+    lon = np.asarray(lon, dtype='float64')
+    y = lat * EARTH_METERS_PER_DEGREE
+    x = lon * EARTH_METERS_PER_DEGREE * np.cos(np.radians(lat))
+    return x, y
+
+
+def grid_keys(df, distance_m, buckets=None):
+    """
+    Empreinte 64 bits de la case de grille (cell_id, gx, gy) de chaque
+    point, et de sa fenêtre de temps ``buckets`` si elle est donnée.
+    """
+    x, y = project_meters(df['lat'], df['lon'])
+    step = distance_m / np.sqrt(2)
+    cells = pd.DataFrame({
+        'cell_id': df['cell_id'].astype('float64').to_numpy(),
+        'gx': np.floor(x / step),
+        'gy': np.floor(y / step),
+    })
+    if buckets is not None:
+        cells['bucket'] = buckets
+    return pd.util.hash_pandas_object(cells, index=False).to_numpy()
+
+
+def thin_points(df, distance_m, anchors=None, seen=None, buckets=None):
+    """
+    Éclaircit les points par cell_id, dans l'ordre du temps.
+
+    ``anchors`` : derniers points conservés par cellule lors d'un appel
+    précédent (colonnes cell_id, lat, lon), pris en compte comme
+    prédécesseurs sans jamais être retournés.
+    ``seen`` : fonction recevant les empreintes de cases de grille et leurs
+    fenêtres de temps, et retournant le masque de celles déjà occupées lors
+    d'un appel précédent.
+    ``buckets`` : fenêtre de temps (entier) de chaque point ; une case de
+    grille n'élimine que les points de la même fenêtre.
+
+    Retourne (DataFrame conservé dans l'ordre d'origine, nombre de lignes supprimées).
+    """
+    if df.empty or not distance_m or distance_m <= 0:
+        return df, 0
+
+    order = ['cell_id', 'time'] if 'time' in df.columns else ['cell_id']
+    points = df[['cell_id', 'lat', 'lon']].assign(
+        _row=np.arange(len(df)), _anchor=False,
+        _bucket=np.zeros(len(df), dtype='int64') if buckets is None else buckets,
+    )
+    if 'time' in df.columns:
+        points['time'] = df['time']
+    points = points.sort_values(order, kind='stable')
+
+    # --- Grille : premier point de chaque case (par fenêtre de temps) ---
+    keys = grid_keys(points, distance_m, None if buckets is None else points['_bucket'].to_numpy())
+    first = ~pd.Series(keys).duplicated().to_numpy()
+    points, keys = points[first], keys[first]
+    if seen is not None:
+        fresh = ~seen(keys, points['_bucket'].to_numpy())
+        points = points[fresh]
+    points = points.drop(columns='_bucket')
+
+    if anchors is not None and not anchors.empty:
+        anchor_points = anchors[['cell_id', 'lat', 'lon']].assign(_row=-1, _anchor=True)
+        points = pd.concat([anchor_points, points.drop(columns='time', errors='ignore')], ignore_index=True)
+        points = points.sort_values(['cell_id', '_anchor'], ascending=[True, False], kind='stable')
+
+    # --- Distance au prédécesseur conservé ---
+    cell = points['cell_id'].astype('float64').to_numpy()
+    x, y = project_meters(points['lat'], points['lon'])
+    anchor = points['_anchor'].to_numpy()
+    keep = np.zeros(len(points), dtype=bool)
+
+    # Cellule inconnue (NaN) : jamais égale à la précédente, le point est conservé
+    limit = distance_m * distance_m
+    last_cell, last_x, last_y = None, 0.0, 0.0
+    for i, (c, px, py, a) in enumerate(zip(cell.tolist(), x.tolist(), y.tolist(), anchor.tolist())):
+        if a or c != last_cell or (px - last_x) ** 2 + (py - last_y) ** 2 >= limit:
+            keep[i] = True
+            last_cell, last_x, last_y = c, px, py
+
+    rows = np.sort(points['_row'].to_numpy()[keep & ~anchor])
+    return df.iloc[rows], len(df) - len(rows)
+
+
+def last_points(df):
+    """
+    Dernier point (dans le temps) de chaque cellule, pour servir d'ancre au
+    bloc suivant.
+    """
+    if df.empty:
+        return df[['cell_id', 'lat', 'lon']]
+    order = ['cell_id', 'time'] if 'time' in df.columns else ['cell_id']
+    return df.sort_values(order, kind='stable').drop_duplicates('cell_id', keep='last')[['cell_id', 'lat', 'lon']]
+
+
+# --- Clé spatiale (z-order des tuiles web mercator) ---
+
+GEOKEY_ZOOM = 20  # tuiles d'environ 38 m à l'équateur ; clé sur 40 bits
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def tile_xy(lat, lon, zoom=GEOKEY_ZOOM):
+    """
+    Indices (x, y) des tuiles web mercator contenant les points au zoom donné.
+    """
+    lat = np.clip(np.asarray(lat, dtype='float64'), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT)
+    lon = np.asarray(lon, dtype='float64')
+    n = 2 ** zoom
+    x = np.floor((lon + 180.0) / 360.0 * n)
+    lat_rad = np.radians(lat)
+    y = np.floor((1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.uint64), np.clip(y, 0, n - 1).astype(np.uint64)
+
+
+def tiles_bbox(tiles, zoom):
+    """
+    Boîte (min_lon, min_lat, max_lon, max_lat) couvrant les tuiles (x, y)
+    du zoom donné.
+    """
+    xs, ys = zip(*tiles)
+    n = 2 ** zoom
+
+    def lon(x):
+        return x / n * 360.0 - 180.0
+
+    def lat(y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+    return lon(min(xs)), lat(max(ys) + 1), lon(max(xs) + 1), lat(min(ys))
+
+
+def _spread_bits(v):
+    """
+    Intercale un bit nul entre chaque bit de v (entiers < 2**32).
+    """
+    v = v & np.uint64(0x00000000FFFFFFFF)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+def morton(x, y):
+    """
+    Code z-order de tuiles (x, y).
+    """
+    x = np.asarray(x, dtype=np.uint64)
+    y = np.asarray(y, dtype=np.uint64)
+    return _spread_bits(x) | (_spread_bits(y) << np.uint64(1))
+
+
+def geokeys(lat, lon):
+    """
+    Clé spatiale de chaque point : code z-order de sa tuile au zoom
+    GEOKEY_ZOOM. Les points sans coordonnées ont une clé None (dans une
+    Series d'objets).
+    """
+    lat = pd.Series(lat, dtype='float64').reset_index(drop=True)
+    lon = pd.Series(lon, dtype='float64').reset_index(drop=True)
+    valid = (lat.notna() & lon.notna()).to_numpy()
+    keys = pd.Series([None] * len(lat), dtype=object)
+    if valid.any():
+        x, y = tile_xy(lat[valid], lon[valid])
+        keys[valid] = morton(x, y).astype(np.int64).tolist()
+    return keys
+
+
+def geokey(lat, lon):
+    """
+    Clé spatiale d'un point isolé (None sans coordonnées).
+    """
+    if lat is None or lon is None:
+        return None
+    return geokeys([lat], [lon])[0]
+
+
+def bbox_key_ranges(min_lon, min_lat, max_lon, max_lat, max_ranges=64):
+    """
+    Intervalles de clés spatiales couvrant la boîte englobante.
+
+    La boîte est couverte par des tuiles d'un niveau assez grossier pour
+    que le nombre d'intervalles (après fusion des tuiles contiguës en
+    z-order) ne dépasse pas ``max_ranges``. Les intervalles sont un
+    sur-ensemble : un filtrage exact sur lat/lon doit suivre.
+    """
+    # y croît vers le sud : la latitude max donne le plus petit y
+    (x0, x1), (y0, y1) = tile_xy([max_lat, min_lat], [min_lon, max_lon])
+    x0, x1, y0, y1 = int(x0), int(x1), int(y0), int(y1)
+
+    for shift in range(GEOKEY_ZOOM + 1):
+        tx = np.arange(x0 >> shift, (x1 >> shift) + 1, dtype=np.uint64)
+        ty = np.arange(y0 >> shift, (y1 >> shift) + 1, dtype=np.uint64)
+        if len(tx) * len(ty) > 4 * max_ranges:
+            continue
+        codes = np.sort(morton(*np.meshgrid(tx, ty)).ravel())
+        # Fusion des tuiles contiguës en z-order
+        breaks = np.flatnonzero(np.diff(codes) != 1) + 1
+        starts = codes[np.concatenate([[0], breaks])]
+        ends = codes[np.concatenate([breaks - 1, [len(codes) - 1]])]
+        if len(starts) > max_ranges:
+            continue
+        width = 2 * shift
+        return [
+            (int(start) << width, ((int(end) + 1) << width) - 1)
+            for start, end in zip(starts, ends)
+        ]
+    return [(0, (1 << (2 * GEOKEY_ZOOM)) - 1)]
+
+
+# --- Distances ---
+
+EARTH_RADIUS_M = 6_371_008.8
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """
+    Distance orthodromique en mètres entre deux points (None si une
+    coordonnée manque).
+    """
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(lat, lon, radius_m):
+    """
+    Boîte englobante (min_lon, min_lat, max_lon, max_lat) contenant le
+    disque de rayon ``radius_m`` autour du point.
+    """
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-9 or abs(lat) + dlat >= 90:
+        dlon = 180.0
+    else:
+        dlon = min(180.0, math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat)))
+    return (
+        max(-180.0, lon - dlon), max(-90.0, lat - dlat),
+        min(180.0, lon + dlon), min(90.0, lat + dlat),
+    )
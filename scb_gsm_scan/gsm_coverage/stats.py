@@ -0,0 +1,150 @@
+"""
+Statistiques d'un scan, calculées pendant l'import à partir des
+DataFrames nettoyés (en une passe, bloc par bloc en mode streaming) puis
+stockées sur le GSMScan.
+
+Les percentiles RSRP sont exacts : les valeurs étant des dBm entiers,
+elles sont comptées dans un histogramme de RSRP_MIN à RSRP_MAX.
+"""
+import numpy as np
+import pandas as pd
+
+
+RSRP_MIN = -200
+RSRP_MAX = 0
+RSRP_PERCENTILES = (10, 50, 90)
+
+STATISTICS_FIELDS = [
+    'line_count', 'cell_count',
+    'min_lat', 'max_lat', 'min_lon', 'max_lon',
+    'time_start', 'time_end',
+    'rsrp_mean', 'rsrp_p10', 'rsrp_p50', 'rsrp_p90',
+]
+
+
+def _min(current, value):
+    if value is None:
+        return current
+    return value if current is None else min(current, value)
+
+
+def _max(current, value):
+    if value is None:
+        return current
+    return value if current is None else max(current, value)
+
+
+def _scalar(value):
+    """
+    Valeur Python d'un agrégat pandas (None pour NaN / NaT).
+    """
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return float(value)
+
+
+class ScanStatistics:
+    """
+    Accumulateur des statistiques d'un scan : nombre de lignes, cellules
+    distinctes, boîte englobante, période, moyenne et percentiles RSRP.
+    """
+
+    def __init__(self):
+        self.line_count = 0
+        self.min_lat = self.max_lat = self.min_lon = self.max_lon = None
+        self.time_start = self.time_end = None
+        self._cells = set()
+        self._rsrp_sum = 0
+        self._rsrp_histogram = np.zeros(RSRP_MAX - RSRP_MIN + 1, dtype='int64')
+
+    def update(self, df):
+        """
+        Ajoute les lignes du DataFrame (colonnes du CSV) aux statistiques.
+        """
+        if df.empty:
+            return self
+        self.line_count += len(df)
+        lat = pd.to_numeric(df['lat'], errors='coerce')
+        lon = pd.to_numeric(df['lon'], errors='coerce')
+        self.min_lat = _min(self.min_lat, _scalar(lat.min()))
+        self.max_lat = _max(self.max_lat, _scalar(lat.max()))
+        self.min_lon = _min(self.min_lon, _scalar(lon.min()))
+        self.max_lon = _max(self.max_lon, _scalar(lon.max()))
+
+        time = pd.to_datetime(df['time'], utc=True, errors='coerce', format='ISO8601')
+        self.time_start = _min(self.time_start, _scalar(time.min()))
+        self.time_end = _max(self.time_end, _scalar(time.max()))
+
+        self._cells.update(pd.to_numeric(df['cell_id'], errors='coerce').dropna().astype('int64').unique().tolist())
+
+        rsrp = pd.to_numeric(df['rsrp_dbm'], errors='coerce').dropna().round().astype('int64').to_numpy()
+        self._rsrp_sum += int(rsrp.sum())
+        self._rsrp_histogram += np.bincount(
+            np.clip(rsrp, RSRP_MIN, RSRP_MAX) - RSRP_MIN, minlength=len(self._rsrp_histogram)
+        )
+        return self
+
+    @property
+    def cell_count(self):
+        return len(self._cells)
+
+    @property
+    def rsrp_count(self):
+        return int(self._rsrp_histogram.sum())
+
+    @property
+    def rsrp_mean(self):
+        count = self.rsrp_count
+        return round(self._rsrp_sum / count, 2) if count else None
+
+    def rsrp_percentile(self, q):
+        """
+        Percentile q (0-100) des RSRP, au rang le plus proche : plus petite
+        valeur dont la fréquence cumulée atteint q %.
+        """
+        count = self.rsrp_count
+        if not count:
+            return None
+        rank = max(1, int(np.ceil(q / 100 * count)))
+        return int(np.searchsorted(np.cumsum(self._rsrp_histogram), rank)) + RSRP_MIN
+
+    def as_fields(self):
+        fields = {name: getattr(self, name) for name in STATISTICS_FIELDS if not name.startswith('rsrp_p')}
+        for q in RSRP_PERCENTILES:
+            fields[f'rsrp_p{q}'] = self.rsrp_percentile(q)
+        return fields
+
+    def apply(self, scan):
+        """
+        Reporte les statistiques sur le scan (sans l'enregistrer).
+        """
+        for name, value in self.as_fields().items():
+            setattr(scan, name, value)
+        return scan
+
+    def save(self, scan):
+        self.apply(scan).save(update_fields=STATISTICS_FIELDS + ['updated_at'])
+        return scan
+
+
+STATISTICS_COLUMNS = ['time', 'lat', 'lon', 'cell_id', 'rsrp_dbm']
+STATISTICS_CHUNK_SIZE = 50_000
+
+
+def statistics_from_rows(rows, chunk_size=STATISTICS_CHUNK_SIZE):
+    """
+    Statistiques d'une suite de tuples (STATISTICS_COLUMNS), par exemple
+    ``values_list(*STATISTICS_COLUMNS).iterator()`` sur les lignes d'un scan.
+    """
+    stats = ScanStatistics()
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            stats.update(pd.DataFrame.from_records(chunk, columns=STATISTICS_COLUMNS))
+            chunk = []
+    if chunk:
+        stats.update(pd.DataFrame.from_records(chunk, columns=STATISTICS_COLUMNS))
+    return stats
@@ -0,0 +1,402 @@
+"""
+Scans de drive-test synthétiques, au format d'import (14 colonnes).
+
+Trajet : un véhicule parcourt des tronçons rectilignes séparés
+d'intersections (virages à angle droit le plus souvent), à une vitesse
+propre au type de route, avec des arrêts (feux, bouchons). Les positions
+restent dans un carré de ``extent_m`` mètres de côté autour de ``center``
+(réflexion aux bords). Un relevé dure quelques heures, le suivant reprend
+le lendemain matin. Plusieurs modems, un par opérateur, sont interrogés
+tour à tour : une ligne par ``interval`` secondes.
+
+Réseau : chaque opérateur a ses sites, sur une grille perturbée, à trois
+secteurs. La cellule servante appartient au site le plus proche (secteur
+d'après l'azimut). Le niveau reçu suit un modèle de propagation
+(affaiblissement 128.1 + 37.6·log10(d km), diagramme du secteur, masquage
+corrélé le long du trajet, évanouissements rapides) ; la couche servante
+en découle : NR bande 78 près des sites équipés, LTE bandes 7, 3 puis 20
+en s'éloignant, UMTS sur les sites sans LTE, GSM 900 en limite de
+couverture, puis hors service (colonnes radio vides). Le SINR dépend du
+site voisin le plus fort et de la charge, le RSRQ (Ec/No en UMTS) du SINR.
+
+Une petite part des lignes est invalide comme dans les relevés réels (GPS
+sans fix, hors service) et les arrêts répètent les mêmes points :
+le fichier exerce toutes les étapes de CSVCleaner.
+
+La génération est vectorisée par blocs de ``chunk_size`` lignes (10
+millions de lignes s'écrivent sans tenir en mémoire) et reproductible : même
+``seed`` et même taille de bloc, même fichier.
+"""
+from gsm_coverage.ingest import CSV_COLUMNS
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_CENTER = (52.49, 13.54)
+DEFAULT_EXTENT_M = 20_000
+DEFAULT_OPERATORS = ('262-01', '262-02', '262-03')
+DEFAULT_START = '2026-01-25T08:00:00Z'
+GENERATE_CHUNK_SIZE = 200_000
+
+EARTH_M_PER_DEGREE = 111_320
+
+# Couches : rat, bande, canal, affaiblissement supplémentaire (dB) par
+# rapport à 1800 MHz
+LAYERS = [
+    ('NR', 'NR-BAND78', 636666, 7.0),
+    ('LTE', 'EUTRAN-BAND7', 3350, 4.0),
+    ('LTE', 'EUTRAN-BAND3', 1300, 0.0),
+    ('LTE', 'EUTRAN-BAND20', 6300, -8.0),
+    ('UMTS', 'UTRAN-BAND1', 10836, 2.0),
+    ('GSM', 'GSM-900', 62, -7.0),
+]
+NR, LTE_B7, LTE_B3, LTE_B20, UMTS, GSM = range(len(LAYERS))
+NO_SERVICE = -1
+
+# Puissance d'un élément de ressource de référence, pertes du véhicule
+# déduites (dBm), bruit thermique par élément de ressource (dBm)
+REFERENCE_EIRP_DBM = 22.0
+NOISE_DBM = -125.0
+# Masquage : écart-type (dB) et coefficient de lissage par mesure
+# (distance de corrélation de quelques dizaines de mètres)
+SHADOWING_DB = 7.0
+SHADOWING_ALPHA = 0.2
+
+
+def fold(values, half):
+    """
+    Replie les coordonnées dans [-half, half] (réflexion aux bords), sans
+    discontinuité.
+    """
+    return half - np.abs(np.mod(values + half, 4 * half) - 2 * half)
+
+
+def path_loss_db(distance_m):
+    return 128.1 + 37.6 * np.log10(np.maximum(distance_m, 10) / 1000)
+
+
+def sector_gain_db(offset_deg):
+    """
+    Gain relatif du secteur (ouverture 65°, atténuation bornée à 20 dB).
+    """
+    return -np.minimum(12 * (offset_deg / 65) ** 2, 20)
+
+
+def _db_sum(*levels):
+    return 10 * np.log10(sum(10 ** (level / 10) for level in levels))
+
+
+class Network:
+    """
+    Sites d'un opérateur : grille de pas ``spacing_m`` couvrant la zone
+    (une rangée de marge), positions perturbées.
+    """
+
+    def __init__(self, rng, index, extent_m, spacing_m):
+        self.index = index
+        self.spacing = spacing_m
+        self.count = int(np.ceil(extent_m / spacing_m)) + 3
+        self.origin = -(self.count - 1) * spacing_m / 2 + rng.uniform(-spacing_m / 2, spacing_m / 2, 2)
+        grid = np.indices((self.count, self.count)).reshape(2, -1).T
+        self.sites = self.origin + grid * spacing_m + rng.uniform(-0.35, 0.35, grid.shape) * spacing_m
+        sites = len(self.sites)
+        self.lte = rng.random(sites) < 0.9
+        self.nr = self.lte & (rng.random(sites) < 0.35)
+        # Charge de chaque secteur
+        self.load = rng.uniform(0.1, 0.9, (sites, 3))
+
+    def candidates(self, x, y):
+        """
+        Sites des 3 × 3 cases de grille autour de chaque point : (n, 9).
+        """
+        i = np.rint((x - self.origin[0]) / self.spacing).astype(np.int64)
+        j = np.rint((y - self.origin[1]) / self.spacing).astype(np.int64)
+        offsets = np.arange(-1, 2)
+        i = np.clip(i[:, None, None] + offsets[:, None], 0, self.count - 1)
+        j = np.clip(j[:, None, None] + offsets[None, :], 0, self.count - 1)
+        return (i * self.count + j).reshape(len(x), 9)
+
+
+class DriveTestGenerator:
+    """
+    Générateur de lignes de scan. Les appels successifs à ``frame()``
+    prolongent le même trajet.
+    """
+
+    def __init__(self, seed=0, center=DEFAULT_CENTER, extent_m=DEFAULT_EXTENT_M,
+                 operators=DEFAULT_OPERATORS, start=DEFAULT_START, interval=1.0, spacing_m=900):
+        self.rng = np.random.default_rng(seed)
+        self.center = center
+        self.half = extent_m / 2
+        self.operators = list(operators)
+        self.interval = interval
+        self.networks = [
+            Network(self.rng, index, extent_m, spacing_m * self.rng.uniform(0.85, 1.15))
+            for index in range(len(self.operators))
+        ]
+        # État du trajet d'un bloc à l'autre
+        self.rows = 0
+        self.position = self.rng.uniform(-self.half, self.half, 2)
+        self.heading = self.rng.uniform(0, 360)
+        self.steps = (np.empty(0), np.empty(0))
+        self.shadowing = 0.0
+        self.session_start = pd.Timestamp(start).tz_convert('UTC').tz_localize(None).to_datetime64()
+        self.session_left = 0
+        self.clock = self.session_start
+
+    # --- Trajet ---
+
+    def _segments(self, count):
+        """
+        Caps (degrés) et vitesses (m/s) de ``count`` tronçons et leur durée
+        en nombre de mesures.
+        """
+        rng = self.rng
+        turns = rng.choice([-90, 0, 90, 180], count, p=[0.35, 0.3, 0.33, 0.02]) + rng.normal(0, 8, count)
+        headings = self.heading + np.cumsum(turns)
+        self.heading = headings[-1] % 360
+        road = rng.choice(3, count, p=[0.65, 0.28, 0.07])  # ville, voie rapide, autoroute
+        speeds = rng.uniform(np.array([6, 14, 25])[road], np.array([14, 22, 34])[road])
+        lengths = rng.exponential(np.array([250, 800, 3000])[road]) + 50
+        durations = np.maximum(lengths / speeds / self.interval, 1)
+        # Arrêts (feux, bouchons) avant une partie des intersections
+        stopped = rng.random(count) < 0.15
+        speeds[stopped] = 0
+        durations[stopped] = rng.uniform(5, 60, stopped.sum()) / self.interval
+        return headings, speeds, np.rint(durations).astype(np.int64)
+
+    def _steps(self, rows):
+        """
+        Cap et vitesse de chaque mesure, tronçons en cours reportés au bloc
+        suivant.
+        """
+        headings, speeds = self.steps
+        while len(headings) < rows:
+            segment_headings, segment_speeds, durations = self._segments(max(rows // 20, 16))
+            headings = np.concatenate([headings, np.repeat(segment_headings, durations)])
+            speeds = np.concatenate([speeds, np.repeat(segment_speeds, durations)])
+        self.steps = (headings[rows:], speeds[rows:])
+        return headings[:rows], speeds[:rows]
+
+    def _route(self, rows):
+        headings, speeds = self._steps(rows)
+        speeds = np.maximum(speeds * (1 + self.rng.normal(0, 0.05, rows)), 0) * self.interval
+        radians = np.radians(headings)
+        x = self.position[0] + np.cumsum(speeds * np.sin(radians))
+        y = self.position[1] + np.cumsum(speeds * np.cos(radians))
+        self.position = np.array([x[-1], y[-1]])
+        return fold(x, self.half), fold(y, self.half)
+
+    def _times(self, rows):
+        """
+        Horodatages : relevés de 2 à 4 heures, le suivant le lendemain à
+        partir de 8 h.
+        """
+        times = np.empty(rows, dtype='datetime64[us]')
+        step = np.timedelta64(int(self.interval * 1e6), 'us')
+        done = 0
+        while done < rows:
+            if not self.session_left:
+                if self.rows + done:
+                    day = self.session_start.astype('datetime64[D]') + np.timedelta64(1, 'D')
+                    self.session_start = (
+                        day + np.timedelta64(8, 'h') + np.timedelta64(int(self.rng.integers(0, 90)), 'm')
+                    ).astype('datetime64[us]')
+                    self.clock = self.session_start
+                self.session_left = int(self.rng.uniform(2, 4) * 3600 / self.interval)
+            take = min(rows - done, self.session_left)
+            times[done:done + take] = self.clock + np.arange(take) * step
+            self.clock = self.clock + take * step
+            self.session_left -= take
+            done += take
+        jitter = self.rng.integers(0, 50_000, rows).astype('timedelta64[us]')
+        return times + jitter
+
+    def _shadowing(self, rows):
+        """
+        Masquage corrélé le long du trajet (processus autorégressif d'ordre 1).
+        """
+        alpha = SHADOWING_ALPHA
+        noise = self.rng.normal(0, SHADOWING_DB * np.sqrt((2 - alpha) / alpha), rows)
+        values = pd.Series(np.concatenate([[self.shadowing], noise])).ewm(alpha=alpha, adjust=False).mean()
+        values = values.to_numpy()[1:]
+        self.shadowing = values[-1]
+        return values
+
+    # --- Radio ---
+
+    def _serving(self, network, x, y, shadowing):
+        """
+        Couche, site, secteur et mesures radio des points servis par le
+        réseau.
+        """
+        rng = self.rng
+        rows = len(x)
+        candidates = network.candidates(x, y)
+        dx = x[:, None] - network.sites[candidates, 0]
+        dy = y[:, None] - network.sites[candidates, 1]
+        distances = np.hypot(dx, dy)
+        order = np.argsort(distances, axis=1)[:, :2]
+        nearest = np.take_along_axis(distances, order, axis=1)
+        site = np.take_along_axis(candidates, order[:, :1], axis=1)[:, 0]
+        picked = order[:, 0]
+        bearing = np.degrees(np.arctan2(dx[np.arange(rows), picked], dy[np.arange(rows), picked])) % 360
+        sector = (bearing // 120).astype(np.int64)
+        offset = bearing - (sector * 120 + 60)
+
+        base = (
+            REFERENCE_EIRP_DBM - path_loss_db(nearest[:, 0]) + sector_gain_db(offset)
+            + shadowing + rng.normal(0, 2.5, rows)
+        )
+        interference = REFERENCE_EIRP_DBM - path_loss_db(nearest[:, 1]) - 5 + rng.normal(0, 6, rows)
+        load = network.load[site, sector]
+
+        lte, nr = network.lte[site], network.nr[site]
+        layer = np.select(
+            [
+                nr & (base - LAYERS[NR][3] >= -100) & (rng.random(rows) < 0.7),
+                lte & (base - LAYERS[LTE_B7][3] >= -100),
+                lte & (base - LAYERS[LTE_B3][3] >= -108),
+                lte & (base - LAYERS[LTE_B20][3] >= -120),
+                ~lte & (base + 15 >= -105),
+                base + 25 >= -108,
+            ],
+            [NR, LTE_B7, LTE_B3, LTE_B20, UMTS, GSM],
+            NO_SERVICE,
+        )
+        offsets = np.array([offset for *_, offset in LAYERS])[layer]
+        level = base - offsets
+        sinr = level - _db_sum(interference - offsets + 10 * np.log10(load), np.full(rows, NOISE_DBM))
+        sinr = np.clip(sinr + rng.normal(0, 1, rows), -10, 30)
+        quality = -10 * np.log10(1 + 1 / 10 ** (sinr / 10))
+
+        rsrp = np.rint(np.clip(level, -140, -44))
+        rsrq = np.clip(-3 - 10 * np.log10(1 + 10 * load) + quality + rng.normal(0, 0.5, rows), -20, -3)
+        umts, gsm = layer == UMTS, layer == GSM
+        rsrp[umts] = np.rint(np.clip(level[umts] + 15, -120, -25))
+        rsrq[umts] = np.clip(-2 + quality[umts] + rng.normal(0, 0.5, umts.sum()), -24, 0)
+        rsrp[gsm] = np.rint(np.clip(level[gsm] + 25, -110, -48))
+        rsrq[gsm | (layer == NO_SERVICE)] = np.nan
+        sinr[umts | gsm | (layer == NO_SERVICE)] = np.nan
+        return layer, site, sector, rsrp, np.round(rsrq, 1), np.round(sinr, 1)
+
+    @staticmethod
+    def _identity(network, layer, site, sector):
+        """
+        cell_id et pci : ECI (eNB × 256 + cellule locale) en LTE, NCI en NR,
+        RNC × 65536 + CI en UMTS, CI en GSM ; PCI / PSC / BSIC.
+        """
+        node = 10_000 + network.index * 100_000 + site
+        local = sector + 1
+        cell_id = np.select(
+            [layer == NR, layer == LTE_B7, layer == LTE_B3, layer == LTE_B20, layer == UMTS, layer == GSM],
+            [
+                node * 4096 + local,
+                node * 256 + 20 + local,
+                node * 256 + 10 + local,
+                node * 256 + local,
+                (100 + network.index * 10 + site // 6000) * 65536 + (site % 6000) * 10 + local,
+                (site * 10 + local) % 65535 + 1,
+            ],
+            0,
+        )
+        physical = site * 3 + sector
+        pci = np.select(
+            [layer == NR, layer == UMTS, layer == GSM],
+            [physical % 1008, physical % 512, site % 64],
+            physical % 504,
+        )
+        return cell_id, pci
+
+    # --- Lignes ---
+
+    def frame(self, rows):
+        """
+        DataFrame des ``rows`` lignes suivantes, colonnes CSV_COLUMNS.
+        """
+        rng = self.rng
+        x, y = self._route(rows)
+        times = self._times(rows)
+        shadowing = self._shadowing(rows)
+        operator = (self.rows + np.arange(rows)) % len(self.operators)
+        self.rows += rows
+
+        layer = np.full(rows, NO_SERVICE)
+        cell_id = np.zeros(rows, dtype=np.int64)
+        pci = np.zeros(rows, dtype=np.int64)
+        rsrp, rsrq, sinr = np.zeros(rows), np.zeros(rows), np.zeros(rows)
+        for network in self.networks:
+            mask = operator == network.index
+            served = self._serving(network, x[mask], y[mask], shadowing[mask])
+            layer[mask], site, sector, rsrp[mask], rsrq[mask], sinr[mask] = served
+            cell_id[mask], pci[mask] = self._identity(network, layer[mask], site, sector)
+
+        # Bruit GPS (mètres), position en degrés
+        scale = EARTH_M_PER_DEGREE * np.cos(np.radians(self.center[0]))
+        lat = self.center[0] + (y + rng.normal(0, 2, rows)) / EARTH_M_PER_DEGREE
+        lon = self.center[1] + (x + rng.normal(0, 2, rows)) / scale
+        alt = 35 + 8 * np.sin(x / 1500) + 5 * np.cos(y / 2300) + rng.normal(0, 0.5, rows)
+        gps_fix = rng.choice([3, 2, 0], rows, p=[0.97, 0.025, 0.005])
+        lost = gps_fix == 0
+
+        service = layer != NO_SERVICE
+        layers = np.array([rat for rat, *_ in LAYERS] + [''], dtype=object)[layer]
+        bands = np.array([band for _, band, *_ in LAYERS] + [''], dtype=object)[layer]
+        channels = np.array([channel for _, _, channel, _ in LAYERS] + [0])[layer]
+
+        def nullable(values, mask):
+            # Entiers écrits sans décimale, cellule vide hors service
+            return pd.arrays.IntegerArray(values.astype(np.int64), ~mask)
+
+        return pd.DataFrame({
+            'time': np.char.add(np.datetime_as_string(times, unit='us'), '+00:00'),
+            'lat': np.where(lost, np.nan, lat.round(7)),
+            'lon': np.where(lost, np.nan, lon.round(7)),
+            'alt': np.where(lost, np.nan, alt.round(2)),
+            'gps_fix': gps_fix,
+            'rat': layers,
+            'mccmnc': np.array(self.operators, dtype=object)[operator],
+            'cell_id': nullable(cell_id, service),
+            'pci': nullable(pci, service),
+            'band': bands,
+            'earfcn': nullable(channels, service),
+            'rsrp_dbm': nullable(rsrp.astype(np.int64), service),
+            'rsrq_db': rsrq,
+            'sinr_db': sinr,
+        }, columns=CSV_COLUMNS)
+
+    def chunks(self, rows, chunk_size=GENERATE_CHUNK_SIZE):
+        """
+        ``rows`` lignes, par DataFrames d'au plus ``chunk_size`` lignes.
+        """
+        while rows > 0:
+            size = min(rows, chunk_size)
+            yield self.frame(size)
+            rows -= size
+
+
+def generate_frame(rows, seed=0, **options):
+    """
+    DataFrame de ``rows`` lignes (options de DriveTestGenerator).
+    """
+    return DriveTestGenerator(seed, **options).frame(rows)
+
+
+def write_csv(file, rows, seed=0, chunk_size=GENERATE_CHUNK_SIZE, **options):
+    """
+    Écrit ``rows`` lignes au format CSV d'import dans ``file`` (chemin ou
+    fichier texte ouvert). Retourne le nombre de lignes écrites.
+    """
+    generator = DriveTestGenerator(seed, **options)
+    if isinstance(file, str):
+        with open(file, 'w', newline='') as output:
+            return _write_chunks(output, generator.chunks(rows, chunk_size))
+    return _write_chunks(file, generator.chunks(rows, chunk_size))
+
+
+def _write_chunks(output, chunks):
+    written = 0
+    for chunk in chunks:
+        chunk.to_csv(output, index=False, header=not written)
+        written += len(chunk)
+    return written
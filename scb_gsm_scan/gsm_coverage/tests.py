@@ -1,11 +1,18 @@
-from django.test import TestCase
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
 from django.urls import reverse
 from rest_framework.test import APIClient
-from gsm_coverage.models import GSMData, GSMScan, CSVLine
+from gsm_coverage.models import GSMData, GSMScan, CSVLine, CellAggregate, MeasurementArchive
 from django_factory_all import ModelFactory
 from scb_gsm_scan.utils import login_user_in_test
 from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+import numpy as np
+import pandas as pd
+import importlib.util
+import unittest
 
 
 User = get_user_model()
@@ -149,3 +156,1949 @@ class GsmCoverageTestCase(TestCase):
             url = reverse('csv_line-detail', kwargs={'pk': data['pk']})
             response = self.client.patch(url, {}, format='json')
             self.assertEqual(response.status_code, 200)
+
+
+class IngestTestCase(TestCase):
+    """
+    Base des tests d'import : utilisateur connecté et fichiers CSV de
+    tests/files.
+    """
+
+    def setUp(self):
+        self.factory = ModelFactory(max_depth=7, create_m2m=True)
+        kwargs_user = self.factory.build_create_kwargs(User)
+        self.user = User.objects.create(**kwargs_user)
+        self.client = login_user_in_test(self.user)
+        return super().setUp()
+
+    def read_file(self, name="test.csv", lines=None):
+        """
+        Contenu du fichier ; avec ``lines``, l'en-tête et les ``lines``
+        premières lignes.
+        """
+        import os
+
+        with open(os.path.join(os.path.dirname(__file__), "tests/files", name), "rb") as f:
+            content = f.read()
+        if lines is not None:
+            content = b"\n".join(content.splitlines()[:lines + 1]) + b"\n"
+        return content
+
+    def csv_file(self, name="test.csv", lines=None):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        return SimpleUploadedFile(name, self.read_file(name, lines), content_type="text/csv")
+
+    def post_file(self, name="test.csv", operator="TEST", **extra):
+        data = {"file": self.csv_file(name), "operator": operator, **extra}
+        return self.client.post(reverse('gsm_scan-list'), data, format='multipart')
+
+
+class BulkIngestTestCase(IngestTestCase):
+
+    def test_bulk_insert_lines_batches(self):
+        from gsm_coverage.benchmarks import make_frame
+        from gsm_coverage.ingest import bulk_insert_lines
+
+        df = make_frame(25)
+        df.loc[3, 'pci'] = None
+        scan = GSMScan.objects.create(file='bulk.csv')
+        inserted = bulk_insert_lines(scan, df, batch_size=10)
+
+        self.assertEqual(inserted, 25)
+        self.assertEqual(scan.csv_lines.count(), 25)
+        self.assertEqual(scan.csv_lines.filter(pci__isnull=True).count(), 1)
+
+    @override_settings(GSM_INGEST_BATCH_SIZE=7, GSM_INGEST_COPY=False)
+    def test_create_gsmscan_uses_configured_batch_size(self):
+        import math
+        from django.test.utils import CaptureQueriesContext
+        from gsm_coverage.ingest import get_batch_size
+
+        self.assertEqual(get_batch_size(), 7)
+        self.assertEqual(get_batch_size(3), 3)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_file()
+        self.assertEqual(response.status_code, 201)
+        lines = GSMScan.objects.get(pk=response.data['pk']).csv_lines.count()
+        self.assertGreater(lines, 7)
+        table = connection.ops.quote_name(CSVLine._meta.db_table)
+        inserts = [query for query in queries if query['sql'].startswith(f'INSERT INTO {table}')]
+        self.assertEqual(len(inserts), math.ceil(lines / 7))
+
+
+class StreamingIngestTestCase(IngestTestCase):
+
+    def test_streaming_matches_full_read(self):
+        response = self.post_file("test.csv")
+        self.assertEqual(response.status_code, 201)
+        expected = GSMScan.objects.get(pk=response.data['pk']).csv_lines.count()
+
+        with self.settings(GSM_INGEST_STREAMING_THRESHOLD=0, GSM_INGEST_CHUNK_SIZE=10):
+            response = self.post_file("test.csv", operator="STREAMING")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(GSMScan.objects.get(pk=response.data['pk']).csv_lines.count(), expected)
+
+    @override_settings(GSM_INGEST_STREAMING_THRESHOLD=0)
+    def test_streaming_missing_columns(self):
+        response = self.post_file("test_failure.csv")
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_chunked_ingest_removes_scan(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        content = self.read_file()
+        # Date illisible en fin de fichier : les premiers blocs sont déjà écrits
+        broken = content.splitlines()[-1].split(b',', 1)[1]
+        csv_file = SimpleUploadedFile("broken.csv", content.rstrip(b"\n") + b"\nnot-a-date," + broken + b"\n")
+        with self.settings(GSM_INGEST_STREAMING_THRESHOLD=0, GSM_INGEST_CHUNK_SIZE=10):
+            response = self.client.post(
+                reverse('gsm_scan-list'), {"file": csv_file, "operator": "BROKEN"}, format='multipart',
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(GSMScan.objects.exists())
+        self.assertFalse(CSVLine.objects.exists())
+        self.assertFalse(CellAggregate.objects.exists())
+
+    def test_cleaner_tracks_duplicates_across_chunks(self):
+        from gsm_coverage.benchmarks import make_frame
+        from gsm_coverage.ingest import CSVCleaner
+
+        df = make_frame(20)
+        df = pd.concat([df, df.iloc[:5]], ignore_index=True)
+        cleaner = CSVCleaner()
+        kept = sum(len(cleaner.clean(df.iloc[i:i + 6])) for i in range(0, len(df), 6))
+
+        self.assertEqual(kept, len(CSVCleaner().clean(df)))
+        self.assertEqual(cleaner.rows_rejected, 5)
+
+
+class IngestJobTestCase(IngestTestCase):
+
+    def post_async(self, name):
+        url = reverse('gsm_scan-list') + '?async=true'
+        return self.client.post(url, {"file": self.csv_file(name), "operator": "TEST"}, format='multipart')
+
+    def test_async_upload_returns_job(self):
+        from gsm_coverage.jobs import process_pending
+        from gsm_coverage.models import IngestJob
+
+        response = self.post_async("test.csv")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['state'], IngestJob.PENDING)
+        self.assertEqual(GSMScan.objects.count(), 0)
+
+        self.assertEqual(process_pending(), 1)
+
+        response = self.client.get(reverse('ingest_job-detail', kwargs={'pk': response.data['pk']}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['state'], IngestJob.SUCCEEDED)
+        self.assertEqual(response.data['rows_processed'], 129)
+        scan = GSMScan.objects.get(pk=response.data['scan'])
+        self.assertEqual(scan.csv_lines.count(), 129 - response.data['rows_rejected'])
+        self.assertIsNotNone(response.data['duration'])
+
+    def test_async_upload_rejects_bad_header(self):
+        response = self.post_async("test_failure.csv")
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_job_records_error(self):
+        from django.core.files.base import ContentFile
+        from gsm_coverage.jobs import process_pending
+        from gsm_coverage.models import IngestJob
+
+        header = "time,lat,lon,alt,gps_fix,rat,mccmnc,cell_id,pci,band,earfcn,rsrp_dbm,rsrq_db,sinr_db\n"
+        job = IngestJob(operator="TEST")
+        job.file.save("empty.csv", ContentFile(header + "2026-01-25T09:25:59Z,0,0,1,0,LTE,262-03,1,1,B7,1,-90,-10,5\n"))
+
+        process_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.state, IngestJob.FAILED)
+        self.assertTrue(job.error)
+        self.assertEqual(job.rows_rejected, 1)
+
+    @override_settings(GSM_INGEST_JOB_TIMEOUT=3600)
+    def test_interrupted_jobs_are_recovered(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from gsm_coverage.jobs import process_pending
+        from gsm_coverage.models import IngestJob
+
+        pending, stale, running = (self.post_async("test.csv").data['pk'] for _ in range(3))
+        # Réclamés il y a trois heures : worker arrêté (dernier signe de vie il
+        # y a deux heures) et import long toujours en cours (bloc validé il y a
+        # une minute)
+        started = timezone.now() - timedelta(hours=3)
+        IngestJob.objects.filter(pk=stale).update(
+            state=IngestJob.RUNNING, started_at=started, heartbeat_at=timezone.now() - timedelta(hours=2),
+        )
+        IngestJob.objects.filter(pk=running).update(
+            state=IngestJob.RUNNING, started_at=started, heartbeat_at=timezone.now() - timedelta(minutes=1),
+        )
+
+        with self.assertLogs('gsm_coverage.jobs', 'WARNING'):
+            self.assertEqual(process_pending(), 2)
+        self.assertEqual(IngestJob.objects.get(pk=pending).state, IngestJob.SUCCEEDED)
+        self.assertEqual(IngestJob.objects.get(pk=stale).state, IngestJob.SUCCEEDED)
+        self.assertEqual(IngestJob.objects.get(pk=running).state, IngestJob.RUNNING)
+
+    @override_settings(GSM_INGEST_STREAMING_THRESHOLD=0, GSM_INGEST_CHUNK_SIZE=10, GSM_INGEST_COMMIT_CHUNKS=True)
+    def test_chunked_import_beats_per_chunk(self):
+        import math
+        from unittest import mock
+        from gsm_coverage.jobs import process_pending
+        from gsm_coverage.models import IngestJob
+
+        pk = self.post_async("test.csv").data['pk']
+        with mock.patch.object(IngestJob, 'beat', autospec=True, side_effect=IngestJob.beat) as beat:
+            process_pending()
+        job = IngestJob.objects.get(pk=pk)
+        self.assertEqual(job.state, IngestJob.SUCCEEDED)
+        # Création du scan, puis un signe de vie par bloc validé
+        self.assertEqual(beat.call_count, 1 + math.ceil(129 / 10))
+        self.assertGreaterEqual(job.heartbeat_at, job.started_at)
+
+    @override_settings(GSM_INGEST_JOB_TIMEOUT=3600)
+    def test_partial_scan_is_removed_before_rerun(self):
+        import io
+        from datetime import timedelta
+        from django.db.models import Sum
+        from django.utils import timezone
+        from gsm_coverage.ingest import CSVCleaner, bulk_insert_lines, read_csv
+        from gsm_coverage.jobs import process_pending
+        from gsm_coverage.models import IngestJob
+
+        pk = self.post_async("test.csv").data['pk']
+        # Worker arrêté après avoir validé les premiers blocs du scan
+        partial = GSMScan.objects.create(file='partial.csv')
+        bulk_insert_lines(partial, CSVCleaner().clean(read_csv(io.BytesIO(self.read_file(lines=20)))))
+        IngestJob.objects.filter(pk=pk).update(
+            state=IngestJob.RUNNING, scan=partial, started_at=timezone.now() - timedelta(hours=2),
+            heartbeat_at=timezone.now() - timedelta(hours=2),
+        )
+
+        with self.assertLogs('gsm_coverage.jobs', 'WARNING'):
+            self.assertEqual(process_pending(), 1)
+        job = IngestJob.objects.get(pk=pk)
+        self.assertEqual(job.state, IngestJob.SUCCEEDED)
+        self.assertFalse(GSMScan.objects.filter(pk=partial.pk).exists())
+        self.assertEqual(GSMScan.objects.get().pk, job.scan_id)
+        self.assertEqual(CellAggregate.objects.aggregate(total=Sum('count'))['total'], CSVLine.objects.count())
+
+    def test_queue_is_resumed_at_startup(self):
+        from unittest import mock
+        from gsm_coverage import jobs
+
+        # Appelé par wsgi.py / asgi.py une fois l'application chargée
+        with mock.patch('gsm_coverage.jobs.get_executor') as get_executor:
+            jobs.wake()
+        get_executor.return_value.submit.assert_called_once_with(jobs.process_pending)
+
+
+class BatchUploadTestCase(IngestTestCase):
+
+    @override_settings(GSM_BATCH_WORKERS=2)
+    def test_batch_upload_csv_files(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        files = [
+            SimpleUploadedFile("a.csv", self.read_file("test.csv"), content_type="text/csv"),
+            SimpleUploadedFile("b.csv", self.read_file("test.csv"), content_type="text/csv"),
+            SimpleUploadedFile("c.csv", self.read_file("test_failure.csv"), content_type="text/csv"),
+        ]
+        url = reverse('gsm_scan-batch')
+        response = self.client.post(url, {"files": files, "operator": "TEST"}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([result['name'] for result in response.data], ["a.csv", "b.csv", "c.csv"])
+        self.assertTrue(response.data[2]['error'])
+        # b.csv, copie de a.csv dans le même lot, n'est pas réimporté
+        self.assertTrue(response.data[1]['duplicate'])
+        self.assertEqual(response.data[1]['scan'], response.data[0]['scan'])
+        # Effectifs de l'import d'origine
+        self.assertGreater(response.data[0]['rows_processed'], 0)
+        for field in ('rows_processed', 'rows_rejected'):
+            self.assertEqual(response.data[1][field], response.data[0][field])
+        gsm_data = GSMData.objects.get(operator__name="TEST")
+        self.assertEqual(gsm_data.gsm_scan.count(), 1)
+
+        # Fichier déjà en base : lignes du scan existant
+        upload = SimpleUploadedFile("a.csv", self.read_file("test.csv"), content_type="text/csv")
+        response = self.client.post(url, {"files": [upload], "operator": "TEST"}, format='multipart')
+        self.assertTrue(response.data[0]['duplicate'])
+        self.assertEqual(response.data[0]['rows_processed'], GSMScan.objects.get().line_count)
+
+    def test_zip_members_are_extracted_to_disk(self):
+        import io
+        import os
+        import tempfile
+        import zipfile
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from gsm_coverage.batch import expand_uploads
+
+        buffer = io.BytesIO()
+        content = self.read_file("test.csv")
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr("day1/a.csv", content)
+            archive.writestr("day2/a.csv", content)
+        upload = SimpleUploadedFile("scans.zip", buffer.getvalue(), content_type="application/zip")
+        with tempfile.TemporaryDirectory() as directory:
+            files = expand_uploads([upload], directory)
+            self.assertEqual([batch_file.name for batch_file in files], ["a.csv", "a.csv"])
+            self.assertEqual(len({batch_file.path for batch_file in files}), 2)
+            for batch_file in files:
+                self.assertEqual(os.path.dirname(batch_file.path), directory)
+                with batch_file.open() as f:
+                    self.assertEqual(f.read(), content)
+
+    def test_batch_upload_zip(self):
+        import io
+        import zipfile
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        buffer = io.BytesIO()
+        content = self.read_file("test.csv")
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr("day1/a.csv", content)
+            archive.writestr("day1/B.CSV", b"\n".join(content.splitlines()[:6]) + b"\n")
+            archive.writestr("day2/a.csv", content)
+            archive.writestr("readme.txt", "ignoré")
+
+        upload = SimpleUploadedFile("scans.zip", buffer.getvalue(), content_type="application/zip")
+        url = reverse('gsm_scan-batch')
+        response = self.client.post(url, {"files": [upload], "operator": "TEST"}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([result['name'] for result in response.data], ["a.csv", "B.CSV", "a.csv"])
+        self.assertEqual([result['error'] for result in response.data], ['', '', ''])
+        self.assertEqual([result['duplicate'] for result in response.data], [False, False, True])
+        self.assertEqual(GSMScan.objects.count(), 2)
+
+    def test_database_error_is_reported_per_file(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.db import OperationalError
+        from gsm_coverage import batch
+        from unittest import mock
+
+        content = self.read_file("test.csv")
+        files = [
+            SimpleUploadedFile("a.csv", content, content_type="text/csv"),
+            SimpleUploadedFile("b.csv", b"\n".join(content.splitlines()[:6]) + b"\n", content_type="text/csv"),
+        ]
+        insert = batch.bulk_insert_lines
+
+        def fail_first(scan, df, **kwargs):
+            # a.csv : toutes les lignes de test.csv, b.csv : 5 lignes
+            if len(df) > 5:
+                raise OperationalError("database is locked")
+            return insert(scan, df, **kwargs)
+
+        with mock.patch.object(batch, 'bulk_insert_lines', fail_first), self.assertLogs('gsm_coverage.batch', 'ERROR'):
+            response = self.client.post(reverse('gsm_scan-batch'), {"files": files, "operator": "TEST"}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data[0]['error'])
+        self.assertIsNone(response.data[0]['scan'])
+        self.assertEqual(response.data[1]['error'], '')
+        self.assertEqual(list(GSMScan.objects.values_list('pk', flat=True)), [response.data[1]['scan']])
+
+    def test_unexpected_error_is_reported_per_file(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from gsm_coverage import batch
+        from unittest import mock
+
+        content = self.read_file("test.csv")
+        files = [
+            SimpleUploadedFile("a.csv", content, content_type="text/csv"),
+            SimpleUploadedFile("b.csv", b"\n".join(content.splitlines()[:6]) + b"\n", content_type="text/csv"),
+        ]
+        statistics = batch.ScanStatistics
+
+        def fail_first():
+            if not fail_first.called:
+                fail_first.called = True
+                raise ValueError("statistiques invalides")
+            return statistics()
+        fail_first.called = False
+
+        with mock.patch.object(batch, 'ScanStatistics', fail_first), self.assertLogs('gsm_coverage.batch', 'ERROR'):
+            response = self.client.post(reverse('gsm_scan-batch'), {"files": files, "operator": "TEST"}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([bool(result['error']) for result in response.data], [True, False])
+        self.assertEqual(GSMScan.objects.count(), 1)
+
+
+class ScanDeduplicationTestCase(IngestTestCase):
+
+    def test_identical_upload_returns_existing_scan(self):
+        import hashlib
+        import os
+        first = self.post_file(operator="TEST")
+        self.assertEqual(first.status_code, 201)
+        lines = CSVLine.objects.count()
+
+        second = self.post_file(operator="TEST")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data['pk'], first.data['pk'])
+        self.assertEqual(CSVLine.objects.count(), lines)
+        self.assertEqual(GSMScan.objects.count(), 1)
+
+        self.assertEqual(first.data['digest'], hashlib.sha256(self.read_file()).hexdigest())
+
+    def test_link_identical_scan_to_other_operator(self):
+        first = self.post_file(operator="OP1")
+
+        linked = self.post_file(operator="OP2", link=True)
+        self.assertEqual(linked.status_code, 200)
+        self.assertEqual(linked.data['pk'], first.data['pk'])
+        self.assertTrue(GSMData.objects.get(operator__name="OP2").gsm_scan.filter(pk=first.data['pk']).exists())
+
+        separate = self.post_file(operator="OP3")
+        self.assertEqual(separate.status_code, 201)
+        self.assertNotEqual(separate.data['pk'], first.data['pk'])
+
+
+class CSVSchemaTestCase(TestCase):
+
+    def file_path(self, name):
+        import os
+
+        return os.path.join(os.path.dirname(__file__), "tests/files", name)
+
+    def test_read_csv_declared_types(self):
+        from gsm_coverage.ingest import read_csv
+
+        df = read_csv(self.file_path("test.csv"))
+        self.assertEqual(str(df['rat'].dtype), 'category')
+        self.assertEqual(str(df['rsrp_dbm'].dtype), 'Int16')
+        self.assertEqual(str(df['rsrq_db'].dtype), 'float32')
+        self.assertIsInstance(df['time'].dtype, pd.DatetimeTZDtype)
+
+    def test_inserted_values_keep_csv_precision(self):
+        from gsm_coverage.ingest import CSVCleaner, bulk_insert_lines, read_csv
+
+        scan = GSMScan.objects.create(file='schema.csv')
+        bulk_insert_lines(scan, CSVCleaner().clean(read_csv(self.file_path("test.csv"))))
+        line = scan.csv_lines.order_by('time').first()
+        self.assertEqual(line.rsrq_db, -107.8)
+        self.assertEqual(line.alt, 32.67)
+        self.assertEqual(line.time.isoformat(), '2026-01-25T09:25:59.280110+00:00')
+
+    def test_pyarrow_engine_matches_c_engine(self):
+        import importlib.util
+        from gsm_coverage.ingest import read_csv
+
+        if importlib.util.find_spec('pyarrow') is None:
+            self.skipTest("pyarrow n'est pas installé")
+        c = read_csv(self.file_path("test.csv"), engine='c')
+        arrow = read_csv(self.file_path("test.csv"), engine='pyarrow')
+        pd.testing.assert_frame_equal(c, arrow, check_dtype=False, check_categorical=False)
+
+    def test_engine_defaults_to_pyarrow_when_installed(self):
+        from unittest import mock
+        from gsm_coverage.ingest import get_engine
+
+        with self.settings(GSM_CSV_ENGINE=None):
+            with mock.patch('importlib.util.find_spec', return_value=object()):
+                self.assertEqual(get_engine(), 'pyarrow')
+            with mock.patch('importlib.util.find_spec', return_value=None):
+                self.assertEqual(get_engine(), 'c')
+                self.assertEqual(get_engine('pyarrow'), 'c')
+        with self.settings(GSM_CSV_ENGINE='c'):
+            self.assertEqual(get_engine(), 'c')
+
+
+class SpatialThinningTestCase(TestCase):
+
+    def line_frame(self, count, step_m, cell_id=1):
+        from gsm_coverage.benchmarks import make_frame
+        from gsm_coverage.ingest import apply_schema
+        from gsm_coverage.spatial import EARTH_METERS_PER_DEGREE
+
+        df = apply_schema(make_frame(count))
+        df['cell_id'] = cell_id
+        df['lat'] = 5.0 + np.arange(count) * step_m / EARTH_METERS_PER_DEGREE
+        df['lon'] = 10.0
+        return df
+
+    def test_thinning_is_time_ordered_per_cell(self):
+        from gsm_coverage.spatial import project_meters, thin_points
+
+        df = self.line_frame(50, 2.0)
+        df.loc[25:, 'lat'] = df['lat'].iloc[:25].to_numpy()[::-1]  # aller-retour
+        kept, removed = thin_points(df, 5.0)
+        self.assertEqual(removed, len(df) - len(kept))
+
+        # Deux points conservés successifs sont à au moins 5 m
+        x, y = project_meters(kept['lat'], kept['lon'])
+        self.assertTrue((np.hypot(np.diff(x), np.diff(y)) >= 5.0).all())
+
+        # Chaque point retiré est à moins de 5 m d'un point antérieur
+        x, y = project_meters(df['lat'], df['lon'])
+        for position in np.flatnonzero(~df.index.isin(kept.index)):
+            distance = np.hypot(x[:position] - x[position], y[:position] - y[position])
+            self.assertLess(distance.min(), 5.0)
+
+        other_cell = self.line_frame(50, 2.0, cell_id=2)
+        both, _ = thin_points(pd.concat([df, other_cell], ignore_index=True), 5.0)
+        self.assertEqual(len(both), len(kept) + len(thin_points(other_cell, 5.0)[0]))
+
+    def test_long_run_of_close_points(self):
+        from gsm_coverage.spatial import project_meters, thin_points
+
+        # Trajet continu, 4 m entre deux mesures : un point sur deux est conservé
+        df = self.line_frame(1000, 4.0)
+        kept, removed = thin_points(df, 5.0)
+        self.assertEqual(len(kept), 500)
+        self.assertEqual(removed, 500)
+        x, y = project_meters(kept['lat'], kept['lon'])
+        self.assertTrue((np.hypot(np.diff(x), np.diff(y)) >= 5.0 - 1e-6).all())
+
+    def test_chunked_thinning_matches_full_file(self):
+        from gsm_coverage.ingest import CSVCleaner
+
+        df = self.line_frame(200, 1.5)
+        full = CSVCleaner(distance_m=5)
+        expected = full.clean(df)
+
+        chunked = CSVCleaner(distance_m=5)
+        kept = pd.concat([chunked.clean(df.iloc[i:i + 17]) for i in range(0, len(df), 17)])
+
+        self.assertEqual(list(kept.index), list(expected.index))
+        self.assertEqual(chunked.removed['thinning'], full.removed['thinning'])
+        self.assertGreater(full.removed['thinning'], 0)
+
+    def test_revisited_place_is_kept_after_the_time_window(self):
+        from gsm_coverage.ingest import CSVCleaner
+
+        df = self.line_frame(3, 10.0)
+        df.loc[2, 'lat'] = df.loc[0, 'lat']
+        df['time'] = pd.Timestamp('2026-01-01', tz='UTC') + pd.to_timedelta([0, 10, 7200], unit='s')
+        self.assertEqual(len(CSVCleaner(distance_m=5, window_s=3600).clean(df)), 3)
+        self.assertEqual(len(CSVCleaner(distance_m=5, window_s=0).clean(df)), 2)
+
+    def test_seen_cells_are_bounded_by_the_time_window(self):
+        from gsm_coverage.ingest import CSVCleaner
+
+        # Six heures de trajet, une mesure par seconde tous les 10 m : tout est conservé
+        df = self.line_frame(6 * 3600, 10.0)
+        df['time'] = pd.Timestamp('2026-01-01', tz='UTC') + pd.to_timedelta(np.arange(len(df)), unit='s')
+        for distance_m in (5, 0):
+            cleaner = CSVCleaner(distance_m=distance_m, window_s=600)
+            peak = 0
+            for start in range(0, len(df), 500):
+                cleaner.clean(df.iloc[start:start + 500])
+                peak = max(peak, cleaner.seen_count)
+            self.assertEqual(cleaner.rows_kept, len(df))
+            # Fenêtre en cours et bloc, et non le fichier entier
+            self.assertLessEqual(peak, 600 + 500)
+
+
+class SpatialIndexTestCase(IngestTestCase):
+
+    def setUp(self):
+        from gsm_coverage.benchmarks import make_frame
+        from gsm_coverage.ingest import bulk_insert_lines
+
+        super().setUp()
+
+        rng = np.random.default_rng(3)
+        df = make_frame(500)
+        df['lat'] = rng.uniform(52.3, 52.7, len(df))
+        df['lon'] = rng.uniform(13.2, 13.7, len(df))
+        self.scan = GSMScan.objects.create(file='spatial.csv')
+        bulk_insert_lines(self.scan, df)
+
+    def test_geokey_set_on_ingest_and_save(self):
+        from gsm_coverage.spatial import geokey
+
+        self.assertFalse(CSVLine.objects.filter(geokey__isnull=True).exists())
+        line = CSVLine.objects.first()
+        line.lat, line.lon = 48.85, 2.35
+        line.save(update_fields=['lat', 'lon'])
+        line.refresh_from_db()
+        self.assertEqual(line.geokey, geokey(48.85, 2.35))
+
+    def test_in_bbox_matches_range_scan(self):
+        for bbox in [(13.3, 52.4, 13.45, 52.5), (13.2, 52.3, 13.7, 52.7), (13.61, 52.61, 13.62, 52.62)]:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            expected = set(CSVLine.objects.filter(
+                lat__gte=min_lat, lat__lte=max_lat, lon__gte=min_lon, lon__lte=max_lon
+            ).values_list('pk', flat=True))
+            found = set(CSVLine.objects.in_bbox(*bbox).values_list('pk', flat=True))
+            self.assertEqual(found, expected)
+
+    def test_measurements_bbox_filter(self):
+        url = reverse('measurement-list')
+        response = self.client.get(url, {'bbox': '13.3,52.4,13.45,52.5', 'scan': self.scan.pk, 'count': 'true'})
+        self.assertEqual(response.status_code, 200)
+        expected = CSVLine.objects.in_bbox(13.3, 52.4, 13.45, 52.5).count()
+        self.assertEqual(response.data['count'], expected)
+
+        response = self.client.get(url, {'bbox': '13.5,52.4'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RTreeIndexTestCase(IngestTestCase):
+
+    def setUp(self):
+        from gsm_coverage.benchmarks import make_frame
+        from gsm_coverage.ingest import bulk_insert_lines
+
+        super().setUp()
+
+        rng = np.random.default_rng(4)
+        df = make_frame(400)
+        df['lat'] = rng.uniform(52.4, 52.6, len(df))
+        df['lon'] = rng.uniform(13.3, 13.6, len(df))
+        self.scan = GSMScan.objects.create(file='rtree.csv')
+        bulk_insert_lines(self.scan, df)
+
+    def rtree_ids(self):
+        from django.db import connection
+        from gsm_coverage.rtree import rtree_table
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id FROM {rtree_table()}')
+            return {row[0] for row in cursor.fetchall()}
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', "Index R-tree propre à SQLite")
+    def test_rtree_kept_in_sync(self):
+        self.assertEqual(self.rtree_ids(), set(CSVLine.objects.values_list('pk', flat=True)))
+
+        line = CSVLine.objects.first()
+        line.lat, line.lon = 48.85, 2.35
+        line.save(update_fields=['lat', 'lon'])
+        found = CSVLine.objects.in_bbox(2.3, 48.8, 2.4, 48.9)
+        self.assertEqual(list(found.values_list('pk', flat=True)), [line.pk])
+
+        line.delete()
+        self.assertNotIn(line.pk, self.rtree_ids())
+
+    def test_in_bbox_with_and_without_rtree(self):
+        bbox = (13.35, 52.45, 13.5, 52.55)
+        expected = set(CSVLine.objects.filter(
+            lat__gte=52.45, lat__lte=52.55, lon__gte=13.35, lon__lte=13.5
+        ).values_list('pk', flat=True))
+        self.assertEqual(set(CSVLine.objects.in_bbox(*bbox).values_list('pk', flat=True)), expected)
+        with override_settings(GSM_SPATIAL_RTREE=False):
+            self.assertEqual(set(CSVLine.objects.in_bbox(*bbox).values_list('pk', flat=True)), expected)
+
+    def test_within_radius(self):
+        from gsm_coverage.spatial import haversine_m
+
+        lat, lon, radius = 52.5, 13.45, 3000
+        expected = {
+            pk for pk, line_lat, line_lon in CSVLine.objects.values_list('pk', 'lat', 'lon')
+            if haversine_m(lat, lon, line_lat, line_lon) <= radius
+        }
+        found = CSVLine.objects.within_radius(lat, lon, radius)
+        self.assertTrue(expected)
+        self.assertEqual(set(found.values_list('pk', flat=True)), expected)
+        for line in found:
+            self.assertAlmostEqual(line.distance_m, haversine_m(lat, lon, line.lat, line.lon), places=3)
+
+        url = reverse('measurement-list')
+        response = self.client.get(url, {'near': f'{lat},{lon},{radius}', 'count': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], len(expected))
+        response = self.client.get(url, {'near': f'{lat},{lon},-1'})
+        self.assertEqual(response.status_code, 400)
+
+
+class GSMDataSummaryTestCase(IngestTestCase):
+
+    def setUp(self):
+        from gsm_coverage.benchmarks import make_frame
+        from gsm_coverage.ingest import bulk_insert_lines
+        from gsm_coverage.stats import ScanStatistics
+
+        super().setUp()
+
+        self.gsm_data = GSMData.get(operator="SUMMARY")
+        self.frames = []
+        for seed in range(3):
+            df = make_frame(50, seed=seed)
+            scan = GSMScan.objects.create(file=f'summary{seed}.csv')
+            stats = ScanStatistics()
+            bulk_insert_lines(scan, df, stats=stats)
+            stats.save(scan)
+            self.gsm_data.gsm_scan.add(scan)
+            self.frames.append((scan, df))
+
+    def test_gsmdata_summary(self):
+        url = reverse('gsm_data-list')
+        response = self.client.get(url, {'summary': 'true', 'operator': self.gsm_data.operator.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        data = response.data[0]
+        self.assertNotIn('gsm_scan', data)
+        self.assertEqual(data['scan_count'], 3)
+        self.assertEqual(data['line_count'], 150)
+        lats = pd.concat([df['lat'] for _, df in self.frames])
+        self.assertAlmostEqual(data['bbox'][1], lats.min(), places=3)
+        self.assertAlmostEqual(data['bbox'][3], lats.max(), places=3)
+
+    def test_gsmscan_summary_paginated(self):
+        url = reverse('gsm_scan-list')
+        response = self.client.get(url, {'summary': 'true', 'operator': self.gsm_data.operator.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        for result in response.data['results']:
+            self.assertNotIn('csv_lines', result)
+            self.assertEqual(result['line_count'], 50)
+            self.assertIsNotNone(result['time_start'])
+
+        response = self.client.get(url, {'summary': 'true', 'operator': 0})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_gsmdata_listing_is_summary_by_default(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('gsm_data-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('gsm_scan', response.data[0])
+        self.assertEqual(response.data[0]['line_count'], 150)
+        self.assertFalse(any('csvline' in query['sql'] for query in queries.captured_queries))
+
+    def test_gsmdata_full_listing_query_count(self):
+        url = reverse('gsm_data-list')
+        # Dont 2 requêtes de version des données (cache HTTP) et les archives des scans
+        with self.assertNumQueries(7):
+            response = self.client.get(url, {'summary': 'false'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data[0]['gsm_scan'][0]['csv_lines']), 50)
+
+
+class ScanExportTestCase(IngestTestCase):
+
+    def setUp(self):
+        from gsm_coverage.benchmarks import make_frame
+        from gsm_coverage.ingest import bulk_insert_lines
+
+        super().setUp()
+
+        self.scan = GSMScan.objects.create(file='gsm_coverage/csv/export.csv')
+        bulk_insert_lines(self.scan, make_frame(250))
+        other = GSMScan.objects.create(file='other.csv')
+        bulk_insert_lines(other, make_frame(10, seed=1))
+
+    def test_export_ndjson(self):
+        import json
+
+        url = reverse('gsm_scan-export', args=[self.scan.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('export.ndjson', response['Content-Disposition'])
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 250)
+        self.assertEqual({row['pk'] for row in rows}, set(self.scan.csv_lines.values_list('pk', flat=True)))
+        times = [row['time'] for row in rows]
+        self.assertEqual(times, sorted(times))
+
+    def test_export_csv_is_reimportable(self):
+        import io
+        from gsm_coverage.ingest import CSV_COLUMNS, read_csv
+
+        url = reverse('gsm_scan-export', args=[self.scan.pk])
+        response = self.client.get(url, {'output': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+        df = read_csv(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(list(df.columns), CSV_COLUMNS)
+        self.assertEqual(len(df), 250)
+        self.assertEqual(df['rsrp_dbm'].sum(), sum(self.scan.csv_lines.values_list('rsrp_dbm', flat=True)))
+
+    def test_export_unknown_output(self):
+        url = reverse('gsm_scan-export', args=[self.scan.pk])
+        self.assertEqual(self.client.get(url, {'output': 'xml'}).status_code, 400)
+        url = reverse('gsm_scan-export', args=[0])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class CoverageTileTestCase(IngestTestCase):
+
+    def setUp(self):
+        from gsm_coverage.tiles import get_cache, get_version_cache
+
+        super().setUp()
+
+        get_cache().clear()
+        get_version_cache().clear()
+        self.gsm_data = GSMData.get(operator="TILES")
+        self.operator = self.gsm_data.operator
+        self.add_scan(0, 300)
+
+    def add_scan(self, seed, rows):
+        from gsm_coverage.benchmarks import make_frame
+        from gsm_coverage.ingest import bulk_insert_lines
+
+        from gsm_coverage import tiles
+
+        scan = GSMScan.objects.create(file=f'tiles{seed}.csv')
+        bulk_insert_lines(scan, make_frame(rows, seed=seed))
+        # Tuiles reconstruites par le worker des jobs, exécuté ici dans le test
+        with self.captureOnCommitCallbacks():
+            self.gsm_data.gsm_scan.add(scan)
+        tiles.process_pending()
+        return scan
+
+    def test_rebuild_is_deferred_to_worker(self):
+        from gsm_coverage import jobs, tiles
+        from gsm_coverage.benchmarks import make_frame
+        from gsm_coverage.ingest import bulk_insert_lines
+        from gsm_coverage.models import CoverageTile, PendingTile
+        from unittest import mock
+
+        count = sum(CoverageTile.objects.filter(z=tiles.get_zoom_range()[1]).values_list('line_count', flat=True))
+        scan = GSMScan.objects.create(file='tiles_deferred.csv')
+        bulk_insert_lines(scan, make_frame(50, seed=2))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.gsm_data.gsm_scan.add(scan)
+        self.assertIn(jobs.wake, callbacks)
+        self.assertEqual(set(PendingTile.objects.values_list('x', 'y')), tiles.scan_tiles(scan))
+
+        # Échec : les tuiles réclamées sont remises en attente
+        with mock.patch.object(tiles, 'rebuild', side_effect=RuntimeError), self.assertLogs('gsm_coverage.tiles', 'ERROR'):
+            self.assertEqual(tiles.process_pending(), 0)
+        self.assertEqual(set(PendingTile.objects.values_list('x', 'y')), tiles.scan_tiles(scan))
+
+        self.assertEqual(jobs.process_pending(), 0)
+        self.assertFalse(PendingTile.objects.exists())
+        max_tiles = CoverageTile.objects.filter(z=tiles.get_zoom_range()[1])
+        self.assertEqual(sum(max_tiles.values_list('line_count', flat=True)), count + 50)
+
+    def test_version_is_shared(self):
+        from django.core.cache import caches
+        from gsm_coverage import tiles
+
+        before = tiles._version(self.operator.pk)
+        caches[settings.GSM_RESPONSE_CACHE].set(tiles._version_key(self.operator.pk), before + 1, None)
+        self.assertEqual(tiles._version(self.operator.pk), before + 1)
+
+    def test_pyramid_matches_lines(self):
+        from gsm_coverage.models import CoverageTile
+        from gsm_coverage.spatial import tile_xy
+        from gsm_coverage.tiles import get_zoom_range, lines_tiles
+
+        min_zoom, max_zoom = get_zoom_range()
+        lines = CSVLine.objects.filter(scan__gsmdata=self.gsm_data)
+        for zoom in (min_zoom, max_zoom):
+            stored = CoverageTile.objects.filter(operator=self.operator, z=zoom)
+            self.assertEqual(sum(tile.line_count for tile in stored), lines.count())
+            self.assertEqual({(tile.x, tile.y) for tile in stored}, lines_tiles(lines, zoom))
+
+        # Somme RSRP d'une tuile (toutes technologies et bandes) = somme des lignes qu'elle contient
+        tile = CoverageTile.objects.filter(operator=self.operator, z=max_zoom).first()
+        stored = CoverageTile.objects.filter(operator=self.operator, z=max_zoom, x=tile.x, y=tile.y)
+        lat, lon, rsrp = np.array(list(lines.values_list('lat', 'lon', 'rsrp_dbm')), dtype='float64').T
+        x, y = tile_xy(lat, lon, max_zoom)
+        inside = (x == tile.x) & (y == tile.y)
+        self.assertEqual(sum(sum(other.cells['rsrp_dbm_sum']) for other in stored), rsrp[inside].sum())
+
+    def test_tile_endpoint_and_cache(self):
+        from gsm_coverage.tiles import get_zoom_range
+
+        min_zoom, _ = get_zoom_range()
+        tile = self.operator.coveragetile_set.filter(z=min_zoom).first()
+        url = reverse('coverage_tile', args=[min_zoom, tile.x, tile.y])
+
+        response = self.client.get(url, {'operator': self.operator.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['line_count'], 300)
+        self.assertEqual(sum(response.data['cells']['count']), 300)
+        self.assertEqual(len(response.data['cells']['rsrp_dbm']), len(response.data['cells']['i']))
+
+        response = self.client.get(url, {'operator': self.operator.pk, 'rat': 'LTE'})
+        self.assertEqual(response.data['line_count'], CSVLine.objects.filter(rat='LTE').count())
+
+        # Tuile servie depuis le cache : seule l'authentification interroge la base
+        with self.assertNumQueries(1):
+            self.client.get(url, {'operator': self.operator.pk})
+
+        # Un nouveau scan invalide le cache
+        self.add_scan(1, 50)
+        response = self.client.get(url, {'operator': self.operator.pk})
+        self.assertEqual(response.data['line_count'], 350)
+
+    def test_tile_endpoint_invalid(self):
+        self.assertEqual(self.client.get(reverse('coverage_tile', args=[30, 0, 0])).status_code, 400)
+        self.assertEqual(self.client.get(reverse('coverage_tile', args=[8, 300, 0])).status_code, 400)
+
+
+class ScanStatisticsTestCase(IngestTestCase):
+
+    def assertStatisticsMatchLines(self, scan):
+        lines = scan.csv_lines.all()
+        rsrp = np.array(list(lines.exclude(rsrp_dbm=None).values_list('rsrp_dbm', flat=True)))
+        self.assertEqual(scan.line_count, lines.count())
+        self.assertEqual(scan.cell_count, lines.exclude(cell_id=None).values('cell_id').distinct().count())
+        self.assertEqual(scan.min_lat, min(lines.values_list('lat', flat=True)))
+        self.assertEqual(scan.max_lon, max(lines.values_list('lon', flat=True)))
+        self.assertEqual(scan.time_start, min(lines.values_list('time', flat=True)))
+        self.assertAlmostEqual(scan.rsrp_mean, rsrp.mean(), places=2)
+        for q in (10, 50, 90):
+            self.assertEqual(getattr(scan, f'rsrp_p{q}'), np.percentile(rsrp, q, method='inverted_cdf'))
+
+    def test_statistics_computed_at_ingest(self):
+        response = self.post_file()
+        self.assertEqual(response.status_code, 201)
+        scan = GSMScan.objects.get(pk=response.data['pk'])
+        self.assertStatisticsMatchLines(scan)
+        self.assertEqual(response.data['line_count'], scan.line_count)
+        self.assertEqual(response.data['rsrp_p50'], scan.rsrp_p50)
+
+        with self.settings(GSM_INGEST_STREAMING_THRESHOLD=0, GSM_INGEST_CHUNK_SIZE=10):
+            response = self.post_file(operator="STREAMING")
+        self.assertEqual(response.status_code, 201)
+        self.assertStatisticsMatchLines(GSMScan.objects.get(pk=response.data['pk']))
+
+    def test_statistics_batch_and_refresh(self):
+        import os
+        from gsm_coverage.batch import expand_paths, ingest_batch
+
+        path = os.path.join(os.path.dirname(__file__), "tests/files", "test.csv")
+        result, = ingest_batch("BATCH", expand_paths([path], None), workers=1)
+        scan = GSMScan.objects.get(pk=result.scan)
+        self.assertStatisticsMatchLines(scan)
+
+        line = scan.csv_lines.order_by('pk').first()
+        response = self.client.patch(reverse('csv_line-detail', args=[line.pk]), {'lat': 10.0}, format='json')
+        self.assertEqual(response.status_code, 200)
+        scan.refresh_from_db()
+        self.assertEqual(scan.min_lat, 10.0)
+
+    def test_summary_reads_stored_statistics(self):
+        response = self.post_file()
+        scan = GSMScan.objects.get(pk=response.data['pk'])
+        # Dont 2 requêtes de version des données (cache HTTP)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('gsm_scan-list'), {'summary': 'true'})
+        self.assertEqual(response.data['results'][0]['line_count'], scan.line_count)
+        self.assertEqual(response.data['results'][0]['cell_count'], scan.cell_count)
+
+
+class CellAggregateTestCase(IngestTestCase):
+
+    def snapshot(self):
+        from gsm_coverage.aggregates import AGGREGATE_FIELDS, CELL_KEY
+
+        rows = CellAggregate.objects.order_by(*CELL_KEY).values_list(*CELL_KEY, *AGGREGATE_FIELDS)
+        return [
+            tuple(round(value, 3) if isinstance(value, float) else value for value in row)
+            for row in rows
+        ]
+
+    def assertMatchesRebuild(self):
+        from gsm_coverage import aggregates
+
+        incremental = self.snapshot()
+        self.assertTrue(incremental)
+        aggregates.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_aggregates_maintained_at_ingest(self):
+        response = self.post_file()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sum(CellAggregate.objects.values_list('count', flat=True)),
+                         CSVLine.objects.exclude(cell_id=None).count())
+        self.assertMatchesRebuild()
+
+        with self.settings(GSM_INGEST_STREAMING_THRESHOLD=0, GSM_INGEST_CHUNK_SIZE=10):
+            response = self.post_file(operator="OTHER")
+        self.assertEqual(response.status_code, 201)
+        self.assertMatchesRebuild()
+
+    def test_scan_replacement_reverses_contributions(self):
+        first = self.post_file()
+        self.client.post(reverse('gsm_scan-list'), {"file": self.csv_file(lines=5), "operator": "OTHER"}, format='multipart')
+
+        url = reverse('gsm_scan-detail', kwargs={'pk': first.data['pk']})
+        response = self.client.patch(url, {"file": self.csv_file(lines=3)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(CellAggregate.objects.values_list('count', flat=True)),
+                         CSVLine.objects.exclude(cell_id=None).count())
+        self.assertMatchesRebuild()
+
+    def test_line_update_and_endpoint(self):
+        self.post_file()
+        line = CSVLine.objects.exclude(cell_id=None).order_by('pk').first()
+        response = self.client.patch(reverse('csv_line-detail', args=[line.pk]), {'rsrp_dbm': -20}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertMatchesRebuild()
+
+        aggregate = CellAggregate.objects.get(cell_id=line.cell_id, earfcn=line.earfcn, band=line.band)
+        self.assertEqual(aggregate.rsrp_max, -20)
+        response = self.client.get(reverse('cell-list'), {'cell_id': line.cell_id})
+        self.assertEqual(response.status_code, 200)
+        result = next(item for item in response.data['results'] if item['pk'] == aggregate.pk)
+        self.assertEqual(result['count'], aggregate.count)
+        self.assertAlmostEqual(result['rsrp_mean'], aggregate.mean('rsrp'), places=2)
+        self.assertEqual(len(result['centroid']), 2)
+
+    def test_increments_are_applied_by_the_database(self):
+        from gsm_coverage import aggregates
+
+        self.post_file()
+        df = aggregates.lines_frame(CSVLine.objects.exclude(cell_id=None))
+        df['earfcn'] = None
+        before = CellAggregate.objects.count()
+
+        # Même clé ajoutée deux fois, earfcn manquant compris : un seul agrégat
+        aggregates.add_frame(df)
+        aggregates.add_frame(df)
+        created = CellAggregate.objects.filter(earfcn=None)
+        self.assertEqual(CellAggregate.objects.count(), before + created.count())
+        self.assertEqual(sum(created.values_list('count', flat=True)), 2 * len(df))
+        self.assertEqual(
+            set(created.values_list('rsrp_min', flat=True)),
+            set(df.groupby('cell_id')['rsrp_dbm'].min().astype(float)),
+        )
+
+        aggregates.remove_frame(df)
+        self.assertEqual(sum(created.values_list('count', flat=True)), len(df))
+        aggregates.remove_frame(df)
+        self.assertFalse(created.exists())
+        self.assertEqual(CellAggregate.objects.count(), before)
+        self.assertMatchesRebuild()
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Imports réellement simultanés sous PostgreSQL")
+class CellAggregateConcurrencyTestCase(TransactionTestCase):
+
+    def test_concurrent_ingests_keep_every_contribution(self):
+        import os
+        import threading
+        from django.db import connections, transaction
+        from gsm_coverage import aggregates, ingest
+
+        df = ingest.CSVCleaner().clean(
+            ingest.read_csv(os.path.join(os.path.dirname(__file__), "tests/files", "test.csv"))
+        )
+        workers, errors = 4, []
+        barrier = threading.Barrier(workers)
+
+        def add():
+            try:
+                barrier.wait(timeout=10)
+                with transaction.atomic():
+                    aggregates.add_frame(df)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=add) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        located = df[df['cell_id'].notna()]
+        self.assertEqual(sum(CellAggregate.objects.values_list('count', flat=True)), workers * len(located))
+        self.assertEqual(CellAggregate.objects.count(), len(aggregates.aggregate_frame(df)))
+
+
+class MeasurementPaginationTestCase(IngestTestCase):
+
+    def setUp(self):
+        from datetime import datetime, timedelta, timezone as dt_timezone
+        from gsm_coverage.benchmarks import make_frame
+        from gsm_coverage.ingest import bulk_insert_lines
+
+        super().setUp()
+
+        self.scan = GSMScan.objects.create(file='pages.csv')
+        bulk_insert_lines(self.scan, make_frame(53))
+        # Dates en désordre, nombreuses égalités et quelques dates manquantes
+        start = datetime(2026, 1, 25, 9, tzinfo=dt_timezone.utc)
+        for line in CSVLine.objects.all():
+            line.time = None if line.pk % 5 == 0 else start + timedelta(seconds=line.pk * 7 % 13)
+            line.save(update_fields=['time'])
+
+    def expected_order(self):
+        dated = CSVLine.objects.exclude(time=None).order_by('time', 'pk').values_list('pk', flat=True)
+        undated = CSVLine.objects.filter(time=None).order_by('pk').values_list('pk', flat=True)
+        return list(dated) + list(undated)
+
+    def test_walk_forward_and_backward(self):
+        url = reverse('measurement-list')
+        pages, response = [], self.client.get(url, {'page_size': 7})
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([line['pk'] for line in response.data['results']])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(sum(pages, []), self.expected_order())
+        self.assertTrue(all(len(page) == 7 for page in pages[:-1]))
+
+        backward = []
+        while response.data['previous']:
+            response = self.client.get(response.data['previous'])
+            backward.append([line['pk'] for line in response.data['results']])
+        self.assertEqual(backward[-1], pages[0])
+        self.assertEqual(sum(reversed(backward), []), sum(pages[:-1], []))
+
+    def test_no_offset_count_and_limits(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        url = reverse('measurement-list')
+        response = self.client.get(url, {'page_size': 20})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(response.data['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+
+        response = self.client.get(url, {'count': 'true', 'scan': self.scan.pk})
+        self.assertEqual(response.data['count'], 53)
+
+        with self.settings(GSM_MEASUREMENT_MAX_PAGE_SIZE=10):
+            response = self.client.get(url, {'page_size': 5000})
+        self.assertEqual(len(response.data['results']), 10)
+
+        response = self.client.get(url, {'cursor': 'invalide'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalCacheTestCase(IngestTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.scan = self.post_file().data
+
+    def test_not_modified_and_server_cache(self):
+        for url in (reverse('gsm_scan-list'), reverse('gsm_scan-detail', args=[self.scan['pk']]), reverse('gsm_data-list')):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Last-Modified', response)
+            etag = response['ETag']
+
+            # Réponse du cache : seule la version des données est relue
+            with self.assertNumQueries(3):
+                cached = self.client.get(url)
+            self.assertEqual(cached.content, response.content)
+            self.assertEqual(cached['ETag'], etag)
+
+            with self.assertNumQueries(3):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+
+            response = self.client.get(url, {'summary': 'true'}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalidated_by_writes(self):
+        url = reverse('gsm_data-list') + '?summary=false'
+        etag = self.client.get(url)['ETag']
+
+        # Modification d'une ligne
+        line = self.scan['csv_lines'][0]
+        self.client.patch(reverse('csv_line-detail', args=[line['pk']]), {'rsrp_dbm': -21}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'-21', response.content)
+        etag = response['ETag']
+
+        # Fichier déjà importé, rattaché à un autre opérateur
+        self.post_file(operator="OTHER")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+        # Remplacement du fichier d'un scan
+        scan_url = reverse('gsm_scan-detail', args=[self.scan['pk']])
+        etag = self.client.get(scan_url)['ETag']
+        self.client.patch(scan_url, {}, format='json')
+        self.assertEqual(self.client.get(scan_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class MeasurementFormatsTestCase(IngestTestCase):
+
+    def setUp(self):
+        from gsm_coverage.benchmarks import make_frame
+        from gsm_coverage.ingest import bulk_insert_lines
+
+        super().setUp()
+
+        self.scan = GSMScan.objects.create(file='formats.csv')
+        bulk_insert_lines(self.scan, make_frame(40))
+        self.url = reverse('measurement-list')
+        self.expected = self.client.get(self.url, {'page_size': 25}).data
+
+    @unittest.skipUnless(importlib.util.find_spec('msgpack'), "msgpack n'est pas installé")
+    def test_msgpack(self):
+        import msgpack
+
+        response = self.client.get(self.url, {'page_size': 25}, HTTP_ACCEPT='application/msgpack; version=v1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        data = msgpack.unpackb(response.content)
+        self.assertEqual(data['results'], [dict(row) for row in self.expected['results']])
+        self.assertEqual(data['next'], self.expected['next'])
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow n'est pas installé")
+    def test_arrow(self):
+        import json
+        import pyarrow as pa
+        from django.utils.dateparse import parse_datetime
+
+        response = self.client.get(self.url, {'page_size': 25}, HTTP_ACCEPT='application/vnd.apache.arrow.stream')
+        self.assertEqual(response.status_code, 200)
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.num_rows, 25)
+        self.assertTrue(pa.types.is_dictionary(table.schema.field('rat').type))
+        self.assertEqual(json.loads(table.schema.metadata[b'next']), self.expected['next'])
+        for row, expected in zip(table.to_pylist(), self.expected['results']):
+            self.assertEqual(row['time'], parse_datetime(expected['time']))
+            for field in ('pk', 'lat', 'lon', 'rat', 'cell_id', 'earfcn', 'rsrp_dbm', 'rsrq_db'):
+                self.assertEqual(row[field], expected[field])
+
+        # Erreur de validation : transmise en JSON dans les métadonnées
+        response = self.client.get(self.url, {'bbox': '1,2', 'format': 'arrow'})
+        self.assertEqual(response.status_code, 400)
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertIn('bbox', json.loads(table.schema.metadata[b'json']))
+
+
+class MeasurementFieldsTestCase(IngestTestCase):
+
+    def setUp(self):
+        from gsm_coverage.benchmarks import make_frame
+        from gsm_coverage.ingest import bulk_insert_lines
+
+        super().setUp()
+
+        scan = GSMScan.objects.create(file='fields.csv')
+        df = make_frame(30)
+        df.loc[3, ['earfcn', 'rsrq_db', 'time']] = None
+        bulk_insert_lines(scan, df)
+        self.url = reverse('measurement-list')
+
+    def test_values_path_matches_model_serializer(self):
+        from gsm_coverage.serializers import CSVLineSerializer
+
+        response = self.client.get(self.url, {'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        lines = sorted(CSVLine.objects.all(), key=lambda line: (line.time is None, line.time, line.pk))
+        self.assertEqual(response.json()['results'], CSVLineSerializer(lines, many=True).data)
+
+    def test_sparse_fieldset(self):
+        response = self.client.get(self.url, {'fields': 'pk,rsrp_dbm', 'page_size': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'pk', 'rsrp_dbm'})
+
+        # La clé du curseur est lue même si time n'est pas demandé
+        pks = [row['pk'] for row in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pks += [row['pk'] for row in response.data['results']]
+        self.assertEqual(len(pks), len(set(pks)))
+        self.assertEqual(len(pks), CSVLine.objects.count())
+
+        response = self.client.get(self.url, {'fields': 'pk,geokey'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+
+
+class ScanForeignKeyTestCase(IngestTestCase):
+
+    def test_lines_written_with_scan_key(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_file()
+        self.assertEqual(response.status_code, 201)
+        scan = GSMScan.objects.get(pk=response.data['pk'])
+        self.assertEqual(CSVLine.objects.filter(scan=scan).count(), scan.line_count)
+        self.assertFalse(any('csv_lines' in query['sql'] for query in queries.captured_queries))
+
+        response = self.client.get(reverse('measurement-list'), {'scan': scan.pk, 'count': 'true'})
+        self.assertEqual(response.data['count'], scan.line_count)
+
+    def test_scan_deletion_removes_lines_and_aggregates(self):
+        from gsm_coverage import aggregates
+
+        first = GSMScan.objects.get(pk=self.post_file().data['pk'])
+        with self.settings(GSM_THINNING_DISTANCE_M=0):
+            second = GSMScan.objects.get(pk=self.post_file(operator="OTHER").data['pk'])
+        self.assertNotEqual(first.pk, second.pk)
+
+        first.delete()
+        self.assertFalse(CSVLine.objects.filter(scan_id=first.pk).exists())
+        self.assertEqual(CSVLine.objects.count(), second.line_count)
+        incremental = sorted(CellAggregate.objects.values_list('cell_id', 'count', 'rsrp_min', 'rsrp_max'))
+        aggregates.rebuild()
+        self.assertEqual(incremental, sorted(CellAggregate.objects.values_list('cell_id', 'count', 'rsrp_min', 'rsrp_max')))
+
+    def test_admin_scan_links_to_its_lines(self):
+        from django.test import Client
+
+        scan = GSMScan.objects.get(pk=self.post_file().data['pk'])
+        admin_user = User.objects.create_superuser(email="admin@example.com", password="admin")
+        client = Client()
+        client.force_login(admin_user)
+
+        response = client.get(reverse('admin:gsm_coverage_gsmscan_change', args=[scan.pk]))
+        self.assertEqual(response.status_code, 200)
+        url = reverse('admin:gsm_coverage_csvline_changelist') + f'?scan__id__exact={scan.pk}'
+        self.assertContains(response, url)
+        self.assertNotContains(response, 'csv_lines-TOTAL_FORMS')
+
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, scan.line_count)
+
+
+@unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow n'est pas installé")
+class MeasurementArchiveTestCase(IngestTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.scan = GSMScan.objects.get(pk=self.post_file().data['pk'])
+
+    def history(self, **params):
+        import json
+
+        response = self.client.get(reverse('measurement-history'), params)
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_archive_month(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        before = self.history()
+        call_command('archive_measurements', before='2026-02', stdout=StringIO())
+
+        archive = MeasurementArchive.objects.get()
+        self.assertEqual(archive.month.isoformat(), '2026-01-01')
+        self.assertEqual(archive.line_count, len(before))
+        self.assertFalse(CSVLine.objects.exists())
+        self.assertEqual(list(archive.scans.all()), [self.scan])
+
+        # Mêmes lignes, lues dans l'archive
+        self.assertEqual(self.history(), before)
+        mccmnc = before[-1]['mccmnc']
+        self.assertEqual(self.history(scan=self.scan.pk, mccmnc=mccmnc), [
+            row for row in before if row['mccmnc'] == mccmnc
+        ])
+        self.assertEqual(self.history(time_after='2026-02-01T00:00:00Z'), [])
+
+        response = self.client.get(reverse('measurement_archive-list'))
+        self.assertEqual(response.data['results'][0]['month'], '2026-01')
+
+    def test_history_merges_hot_and_archived_lines(self):
+        from datetime import datetime, timezone as dt_timezone
+        from django.core.management import call_command
+        from gsm_coverage import partitions
+        from io import StringIO
+        from unittest import mock
+
+        call_command('archive_measurements', before='2026-02', stdout=StringIO())
+        count = MeasurementArchive.objects.get().line_count
+        late = CSVLine.objects.create(scan=self.scan, time=datetime(2026, 1, 1, tzinfo=dt_timezone.utc), rat='LTE')
+        hot = CSVLine.objects.create(scan=self.scan, time=datetime(2026, 3, 1, tzinfo=dt_timezone.utc), rat='LTE')
+
+        rows = self.history()
+        self.assertEqual(len(rows), count + 2)
+        self.assertEqual(rows[0]['pk'], late.pk)
+        self.assertEqual(rows[-1]['pk'], hot.pk)
+        self.assertEqual([row['pk'] for row in self.history(time_after='2026-02-01T00:00:00Z')], [hot.pk])
+
+        # Ligne importée après l'archivage du mois : fusionnée avec l'archive,
+        # relue lot par lot
+        with mock.patch.object(partitions, 'ARCHIVE_CHUNK_SIZE', 7), \
+                mock.patch('pyarrow.parquet.read_table', side_effect=AssertionError):
+            call_command('archive_measurements', before='2026-02', stdout=StringIO())
+        archive = MeasurementArchive.objects.get()
+        self.assertEqual(archive.line_count, count + 1)
+        self.assertEqual(list(CSVLine.objects.values_list('pk', flat=True)), [hot.pk])
+        self.assertEqual(self.history(), rows)
+
+    def test_lines_committed_while_archiving_are_kept(self):
+        from datetime import datetime, timezone as dt_timezone
+        from gsm_coverage import partitions
+        from unittest import mock
+
+        batches = partitions._batches
+        created = []
+
+        def batches_then_insert(lines, schema, pks):
+            yield from batches(lines, schema, pks)
+            # Ligne du mois validée après la lecture des lignes à archiver
+            created.append(CSVLine.objects.create(
+                scan=self.scan, time=datetime(2026, 1, 2, tzinfo=dt_timezone.utc), rat='LTE',
+            ))
+
+        count = CSVLine.objects.count()
+        with mock.patch.object(partitions, '_batches', batches_then_insert):
+            archive = partitions.archive_month(partitions.parse_month('2026-01'))
+        self.assertEqual(archive.line_count, count)
+        self.assertEqual(list(CSVLine.objects.values_list('pk', flat=True)), [created[0].pk])
+
+        archive = partitions.archive_month(partitions.parse_month('2026-01'))
+        self.assertEqual(archive.line_count, count + 1)
+        self.assertFalse(CSVLine.objects.exists())
+
+    def test_history_reads_archives_by_row_group(self):
+        from django.core.management import call_command
+        from gsm_coverage import partitions
+        from io import StringIO
+        from unittest import mock
+        import pyarrow.parquet as pq
+
+        before = self.history()
+        with mock.patch.object(partitions, 'ARCHIVE_CHUNK_SIZE', 7):
+            call_command('archive_measurements', before='2026-02', stdout=StringIO())
+        with MeasurementArchive.objects.get().file.open('rb') as source:
+            self.assertGreater(pq.ParquetFile(source).metadata.num_row_groups, 1)
+        self.assertEqual(self.history(), before)
+        middle = before[len(before) // 2]['time']
+        self.assertEqual(self.history(time_after=middle), [row for row in before if row['time'] >= middle])
+        self.assertEqual(self.history(time_before=middle), [row for row in before if row['time'] < middle])
+
+    def test_scan_replacement_and_deletion_purge_archives(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        call_command('archive_measurements', before='2026-02', stdout=StringIO())
+        archive = MeasurementArchive.objects.get()
+        other = CSVLine.objects.create(scan=None, time=archive.first_time, rat='LTE')
+        call_command('archive_measurements', before='2026-02', stdout=StringIO())
+
+        # Nouveau fichier : les lignes archivées de l'ancien ne sont plus lues
+        response = self.client.patch(
+            reverse('gsm_scan-detail', args=[self.scan.pk]), {"file": self.csv_file(lines=3)}, format='multipart',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MeasurementArchive.objects.get().line_count, 1)
+        self.assertEqual(
+            sorted(row['pk'] for row in self.history()),
+            sorted([other.pk, *self.scan.csv_lines.values_list('pk', flat=True)]),
+        )
+
+        call_command('archive_measurements', before='2026-02', stdout=StringIO())
+        self.assertEqual(set(MeasurementArchive.objects.get().scans.all()), {self.scan})
+        self.scan.delete()
+        self.assertEqual([row['pk'] for row in self.history()], [other.pk])
+        self.assertFalse(MeasurementArchive.objects.get().scans.exists())
+
+    def test_purge_opens_only_archives_of_the_scan(self):
+        from django.core.management import call_command
+        from gsm_coverage import partitions
+        from io import StringIO
+        from unittest import mock
+
+        call_command('archive_measurements', before='2026-02', stdout=StringIO())
+        unarchived = GSMScan.objects.create(file='unarchived.csv')
+        with mock.patch.object(partitions, '_save') as save:
+            unarchived.delete()
+        save.assert_not_called()
+
+    def test_merge_keeps_order_batch_by_batch(self):
+        from datetime import datetime, timedelta, timezone as dt_timezone
+        from gsm_coverage import partitions
+        import pyarrow as pa
+
+        schema = pa.schema([('pk', pa.int64()), ('time', pa.timestamp('us', tz='UTC'))])
+        start = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+        def stream(rows):
+            for index in range(0, len(rows), 3):
+                yield pa.RecordBatch.from_pylist(rows[index:index + 3], schema=schema)
+
+        first = [{'pk': pk, 'time': start + timedelta(seconds=2 * pk)} for pk in range(20)]
+        second = [{'pk': 100 + pk, 'time': start + timedelta(seconds=3 * pk)} for pk in range(15)]
+        merged = pa.Table.from_batches(list(partitions._merge([stream(first), stream(second)], schema)), schema)
+        self.assertEqual(merged.to_pylist(), sorted(first + second, key=lambda row: (row['time'], row['pk'])))
+
+    def aggregates_snapshot(self):
+        from gsm_coverage.aggregates import AGGREGATE_FIELDS, CELL_KEY
+
+        rows = CellAggregate.objects.order_by(*CELL_KEY).values_list(*CELL_KEY, *AGGREGATE_FIELDS)
+        return [tuple(round(value, 3) if isinstance(value, float) else value for value in row) for row in rows]
+
+    def test_aggregates_and_tiles_include_archived_lines(self):
+        from django.core.management import call_command
+        from gsm_coverage import aggregates, tiles
+        from gsm_coverage.models import CoverageTile
+        from io import StringIO
+
+        def coverage():
+            return sorted(CoverageTile.objects.values_list('z', 'x', 'y', 'rat', 'band', 'line_count'))
+
+        operator = self.scan.gsmdata_set.get().operator_id
+        tiles.rebuild_all(operator)
+        before, affected, covered = self.aggregates_snapshot(), tiles.scan_tiles(self.scan), coverage()
+        self.assertTrue(before)
+        self.assertTrue(covered)
+
+        call_command('archive_measurements', before='2026-02', stdout=StringIO())
+        self.assertFalse(CSVLine.objects.exists())
+        # Agrégats inchangés par l'archivage, et reconstruits depuis les archives
+        self.assertEqual(self.aggregates_snapshot(), before)
+        aggregates.rebuild()
+        self.assertEqual(self.aggregates_snapshot(), before)
+        stale = list(CellAggregate.objects.all())
+        aggregates._refresh_extremes(stale)
+        aggregates._update(stale, aggregates.MIN_FIELDS + aggregates.MAX_FIELDS)
+        self.assertEqual(self.aggregates_snapshot(), before)
+
+        self.assertEqual(tiles.scan_tiles(self.scan), affected)
+        tiles.rebuild_all(operator)
+        self.assertEqual(coverage(), covered)
+
+        self.scan.delete()
+        self.assertFalse(CellAggregate.objects.exists())
+
+    def test_scan_export_and_retrieve_include_archived_lines(self):
+        import json
+        from django.core.management import call_command
+        from io import StringIO
+
+        def exported():
+            response = self.client.get(reverse('gsm_scan-export', args=[self.scan.pk]))
+            self.assertEqual(response.status_code, 200)
+            return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        def retrieved():
+            response = self.client.get(reverse('gsm_scan-detail', args=[self.scan.pk]))
+            self.assertEqual(response.status_code, 200)
+            return sorted(response.json()['csv_lines'], key=lambda row: row['pk'])
+
+        export, lines = exported(), retrieved()
+        self.assertEqual(len(lines), self.scan.line_count)
+        call_command('archive_measurements', before='2026-02', stdout=StringIO())
+        self.assertFalse(CSVLine.objects.exists())
+        self.assertEqual(exported(), export)
+        self.assertEqual(retrieved(), lines)
+
+
+class CopyIngestTestCase(IngestTestCase):
+
+    def cleaned_frame(self):
+        import os
+        from gsm_coverage.ingest import CSVCleaner, read_csv
+
+        with open(os.path.join(os.path.dirname(__file__), "tests/files", "test.csv"), "rb") as f:
+            return CSVCleaner().clean(read_csv(f))
+
+    def test_copy_chunks_match_bulk_lines(self):
+        import csv
+        from gsm_coverage.ingest import COPY_FIELDS, COPY_NULL, build_csv_lines, copy_chunks
+
+        df = self.cleaned_frame()
+        scan = GSMScan.objects.create(file='copy.csv')
+        rows = [row for chunk in copy_chunks(df, scan, chunk_size=10) for row in csv.reader(chunk.splitlines())]
+        lines = build_csv_lines(df, scan)
+        self.assertEqual(len(rows), len(lines))
+
+        fields = [CSVLine._meta.get_field(name).attname for name in COPY_FIELDS[:-2]]
+        for row, line in zip(rows, lines):
+            self.assertEqual(len(row), len(COPY_FIELDS))
+            expected = [COPY_NULL if getattr(line, field) is None else str(getattr(line, field)) for field in fields]
+            self.assertEqual(row[:len(fields)], expected)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', "COPY n'est disponible que sous PostgreSQL")
+    def test_copy_ingest_matches_inserts(self):
+        from gsm_coverage.ingest import use_copy, write_lines
+
+        self.assertTrue(use_copy())
+        df = self.cleaned_frame()
+        columns = ['time', 'lat', 'lon', 'alt', 'rat', 'mccmnc', 'cell_id', 'pci', 'band', 'earfcn',
+                   'rsrp_dbm', 'rsrq_db', 'sinr_db', 'geokey']
+        written = {}
+        for copy in (True, False):
+            scan = GSMScan.objects.create(file=f'copy_{copy}.csv')
+            self.assertEqual(write_lines(scan, df, copy=copy), len(df))
+            written[copy] = list(scan.csv_lines.order_by('pk').values_list(*columns))
+        self.assertEqual(written[True], written[False])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "Profil propre à SQLite")
+class SQLiteProfileTestCase(SimpleTestCase):
+    """
+    Lectures pendant un import sur une base fichier (la base de test est en
+    mémoire, sans WAL) : connexion « concurrency » créée pour ces tests.
+    """
+    alias = 'concurrency'
+
+    @classmethod
+    def setUpClass(cls):
+        import os
+        import tempfile
+        from django.db import connections
+
+        super().setUpClass()
+        # Connexion ajoutée après la configuration des bases de test : elle
+        # n'est ni créée par le runner ni interdite aux threads
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings[cls.alias] = dict(
+            connections['default'].settings_dict, NAME=os.path.join(cls.directory.name, 'db.sqlite3'),
+        )
+        cls.databases = {cls.alias}
+
+    @classmethod
+    def tearDownClass(cls):
+        from django.db import connections
+
+        connections[cls.alias].close()
+        del connections[cls.alias]
+        del connections.settings[cls.alias]
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        from django.db import connections
+
+        with connections[self.alias].schema_editor() as editor:
+            editor.create_model(GSMScan)
+            editor.create_model(CSVLine)
+        return super().setUp()
+
+    def tearDown(self):
+        from django.db import connections
+
+        with connections[self.alias].schema_editor() as editor:
+            editor.delete_model(CSVLine)
+            editor.delete_model(GSMScan)
+        return super().tearDown()
+
+    def lines(self, scan, count):
+        return [
+            CSVLine(scan=scan, lat=48.0 + i * 1e-5, lon=2.0, rat='LTE', mccmnc='20801', band='B3', cell_id=i)
+            for i in range(count)
+        ]
+
+    def test_connection_pragmas(self):
+        from django.db import connections
+        from gsm_coverage.pragmas import current
+
+        values = current(connections[self.alias])
+        self.assertEqual(values['journal_mode'], 'wal')
+        self.assertEqual(values['synchronous'], 1)
+        self.assertEqual(values['temp_store'], 2)
+        self.assertEqual(values['busy_timeout'], settings.GSM_SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(values['cache_size'], settings.GSM_SQLITE_PRAGMAS['cache_size'])
+
+    @override_settings(GSM_SQLITE_PRAGMAS=dict(settings.GSM_SQLITE_PRAGMAS, cache_size=50, busy_timeout=200))
+    def test_reads_during_large_upload(self):
+        import threading
+        import time
+        from django.db import connections, transaction
+
+        committed, written, done = 1000, threading.Event(), threading.Event()
+        errors = []
+
+        def upload():
+            try:
+                with transaction.atomic(using=self.alias):
+                    scan = GSMScan.objects.using(self.alias).create(file='concurrency.csv')
+                    CSVLine.objects.using(self.alias).bulk_create(self.lines(scan, committed))
+                # Transaction plus grande que le cache : écrite dans le fichier avant validation
+                with transaction.atomic(using=self.alias):
+                    CSVLine.objects.using(self.alias).bulk_create(self.lines(scan, 20_000), batch_size=2000)
+                    written.set()
+                    done.wait(10)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                written.set()
+                connections[self.alias].close()
+
+        thread = threading.Thread(target=upload)
+        thread.start()
+        try:
+            self.assertTrue(written.wait(30))
+            start = time.perf_counter()
+            # Lecture de l'état validé, sans attendre la fin de l'import
+            count = CSVLine.objects.using(self.alias).count()
+            elapsed = time.perf_counter() - start
+        finally:
+            done.set()
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(count, committed)
+        self.assertLess(elapsed, 0.2)
+        self.assertEqual(CSVLine.objects.using(self.alias).count(), committed + 20_000)
+
+
+class AsyncReadViewTestCase(IngestTestCase):
+
+    def setUp(self):
+        from django.test import AsyncClient
+
+        super().setUp()
+        self.async_client = AsyncClient()
+        self.async_client.cookies['access'] = self.client.cookies['access'].value
+
+        self.scan = GSMScan.objects.get(pk=self.post_file().data['pk'])
+
+    async def drf_get(self, url, params=None, **extra):
+        from asgiref.sync import sync_to_async
+
+        return await sync_to_async(self.client.get)(url, params or {}, **extra)
+
+    async def test_gsm_data_matches_drf(self):
+        for params in ({}, {'summary': 'true'}, {'summary': 'false'}):
+            expected = await self.drf_get(reverse('gsm_data-list'), params)
+            response = await self.async_client.get(reverse('async_gsm_data-list'), params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), expected.json())
+
+    async def test_gsm_data_operator_filter(self):
+        operator = await Group.objects.aget(name="TEST")
+        for params in ({'operator': operator.pk}, {'operator': operator.pk, 'summary': 'false'}):
+            expected = await self.drf_get(reverse('gsm_data-list'), params)
+            response = await self.async_client.get(reverse('async_gsm_data-list'), params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), expected.json())
+            self.assertEqual(len(response.json()), 1)
+
+        # Opérateur inconnu : erreur de validation du filtre, comme DRF
+        params = {'operator': operator.pk + 1000}
+        expected = await self.drf_get(reverse('gsm_data-list'), params)
+        response = await self.async_client.get(reverse('async_gsm_data-list'), params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+
+    async def test_scan_detail_matches_drf_and_is_conditional(self):
+        for params in ({}, {'summary': 'true'}):
+            expected = await self.drf_get(reverse('gsm_scan-detail', args=[self.scan.pk]), params)
+            response = await self.async_client.get(reverse('async_gsm_scan-detail', args=[self.scan.pk]), params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), expected.json())
+
+        url = reverse('async_gsm_scan-detail', args=[self.scan.pk])
+        etag = (await self.async_client.get(url))['ETag']
+        response = await self.async_client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get(reverse('async_gsm_scan-detail', args=[self.scan.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_measurement_pages_match_drf(self):
+        from urllib.parse import parse_qs, urlparse
+
+        params = {'scan': self.scan.pk, 'page_size': 10, 'count': 'true', 'fields': 'pk,time,rsrp_dbm'}
+        pages = 0
+        while True:
+            expected = (await self.drf_get(reverse('measurement-list'), params)).json()
+            response = await self.async_client.get(reverse('async_measurement-list'), params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual(data['results'], expected['results'])
+            self.assertEqual(data['count'], self.scan.line_count)
+            pages += 1
+            if not data['next']:
+                self.assertIsNone(expected['next'])
+                break
+            params['cursor'] = parse_qs(urlparse(data['next']).query)['cursor'][0]
+        self.assertEqual(pages, -(-self.scan.line_count // 10))
+
+    async def test_export_streams_lines(self):
+        from asgiref.sync import sync_to_async
+
+        expected = await self.drf_get(reverse('gsm_scan-export', args=[self.scan.pk]), {'output': 'csv'})
+        expected = await sync_to_async(lambda: b''.join(expected.streaming_content))()
+        response = await self.async_client.get(reverse('async_gsm_scan-export', args=[self.scan.pk]), {'output': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), expected)
+
+        response = await self.async_client.get(reverse('async_gsm_scan-export', args=[self.scan.pk]), {'output': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_errors_match_drf(self):
+        from django.test import AsyncClient
+
+        response = await AsyncClient().get(reverse('async_measurement-list'))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+
+        response = await self.async_client.get(reverse('async_measurement-list'), {'bbox': '1,2'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bbox', response.json())
+
+    async def test_concurrent_reads(self):
+        import asyncio
+
+        url = reverse('async_measurement-list')
+        responses = await asyncio.gather(*(
+            self.async_client.get(url, {'scan': self.scan.pk, 'page_size': 5}) for _ in range(10)
+        ))
+        self.assertEqual({response.status_code for response in responses}, {200})
+        self.assertEqual(len({response.content for response in responses}), 1)
+
+
+class SyntheticDriveTestCase(IngestTestCase):
+
+    def test_generated_csv_format(self):
+        from gsm_coverage.ingest import CSV_COLUMNS, CSVCleaner, read_csv
+        from gsm_coverage.synthetic import write_csv
+        from io import BytesIO, StringIO
+
+        output = StringIO()
+        self.assertEqual(write_csv(output, 3000, seed=1, chunk_size=1000), 3000)
+        content = output.getvalue()
+        self.assertEqual(content.splitlines()[0], ','.join(CSV_COLUMNS))
+
+        df = read_csv(BytesIO(content.encode()))
+        self.assertEqual(len(df), 3000)
+        self.assertTrue(df['time'].is_monotonic_increasing)
+        self.assertTrue(set(df['rat'].dropna()) <= {'NR', 'LTE', 'UMTS', 'GSM'})
+        self.assertTrue(df['rsrp_dbm'].dropna().between(-140, -25).all())
+        self.assertTrue(df['rsrq_db'].dropna().between(-24, 0).all())
+
+        # Lignes invalides et points répétés : le nettoyage en retire une partie
+        cleaner = CSVCleaner()
+        kept = cleaner.clean(df)
+        self.assertTrue(0 < len(kept) < len(df))
+        self.assertGreater(cleaner.removed['gps'], 0)
+
+        again = StringIO()
+        write_csv(again, 3000, seed=1, chunk_size=1000)
+        self.assertEqual(again.getvalue(), content)
+
+    def test_generated_csv_upload(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from gsm_coverage.synthetic import write_csv
+        from io import StringIO
+
+        output = StringIO()
+        write_csv(output, 500, seed=2)
+        csv_file = SimpleUploadedFile("synthetic.csv", output.getvalue().encode(), content_type="text/csv")
+        response = self.client.post(reverse('gsm_scan-list'), {"file": csv_file, "operator": "TEST"}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        scan = GSMScan.objects.get(pk=response.data['pk'])
+        self.assertGreater(scan.csv_lines.count(), 400)
+        self.assertEqual(set(scan.csv_lines.values_list('mccmnc', flat=True)), {'262-01', '262-02', '262-03'})
+
+    def test_bench_suite(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from gsm_coverage.management.commands.bench_suite import STAGES
+        from io import StringIO
+        import json
+        import os
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'results.json')
+            call_command('bench_suite', sizes='200', repeat=1, output=path, label='test', stdout=StringIO())
+            with open(path) as source:
+                report = json.load(source)
+            self.assertEqual(report['label'], 'test')
+            self.assertEqual(report['environment']['database'], connection.vendor)
+            [result] = report['results']
+            self.assertEqual(result['rows'], 200)
+            self.assertEqual(list(result['stages']), STAGES)
+            self.assertEqual(result['stages']['parse']['rows'], 200)
+            self.assertEqual(result['stages']['export']['rows'], result['stages']['insert']['rows'])
+
+            # Référence plus rapide que toute mesure possible
+            for stage in result['stages'].values():
+                stage['seconds'] = 1e-9
+            with open(path, 'w') as output:
+                json.dump(report, output)
+            with self.assertRaises(CommandError):
+                call_command('bench_suite', sizes='200', repeat=1, baseline=path, min_delta=0,
+                             fail_on_regression=True, stdout=StringIO())
+        # Transactions annulées : rien n'est conservé en base
+        self.assertFalse(GSMScan.objects.exists())
+
+
+@override_settings(
+    GSM_SERVER_TIMING=True, GSM_SERVER_TIMING_SAMPLE_RATE=1.0, GSM_SERVER_TIMING_SQL=True,
+    GSM_SERVER_TIMING_HEADER=True, GSM_SERVER_TIMING_LOG_MIN_MS=60_000,
+)
+class ServerTimingTestCase(IngestTestCase):
+
+    def setUp(self):
+        from scb_gsm_scan import timing
+
+        # Connexion ouverte avant l'activation des mesures : wrapper SQL posé ici
+        if timing._execute not in connection.execute_wrappers:
+            timing.instrument(connection)
+            self.addCleanup(connection.execute_wrappers.remove, timing._execute)
+        return super().setUp()
+
+    def metrics(self, response):
+        """
+        {nom: paramètres} de l'en-tête Server-Timing.
+        """
+        metrics = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_read_timings(self):
+        self.post_file()
+        response = self.client.get(reverse('gsm_data-list'))
+        self.assertEqual(response.status_code, 200)
+        metrics = self.metrics(response)
+        self.assertTrue({'db', 'auth', 'serialize', 'total'} <= set(metrics))
+        self.assertRegex(metrics['db']['desc'], r'^"\d+ queries"$')
+        self.assertGreaterEqual(float(metrics['total']['dur']), float(metrics['serialize']['dur']))
+        self.assertEqual(response['Timing-Allow-Origin'], ', '.join(settings.CORS_ALLOWED_ORIGINS))
+
+    def test_ingest_timings(self):
+        response = self.post_file()
+        self.assertEqual(response.status_code, 201)
+        metrics = self.metrics(response)
+        for name in ('ingest.validate', 'ingest.read', 'ingest.clean', 'ingest.create', 'ingest.insert'):
+            self.assertIn(name, metrics)
+        self.assertGreaterEqual(float(metrics['ingest.create']['dur']), float(metrics['ingest.insert']['dur']))
+
+    def test_sampling_and_sql_settings(self):
+        with self.settings(GSM_SERVER_TIMING_SAMPLE_RATE=0):
+            response = login_user_in_test(self.user).get(reverse('gsm_data-list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+        with self.settings(GSM_SERVER_TIMING_SQL=False):
+            response = login_user_in_test(self.user).get(reverse('gsm_data-list'))
+        self.assertNotIn('db', self.metrics(response))
+
+        with self.settings(GSM_SERVER_TIMING_HEADER=False):
+            response = login_user_in_test(self.user).get(reverse('gsm_data-list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_structured_log(self):
+        import json
+
+        with self.settings(GSM_SERVER_TIMING_LOG_MIN_MS=0), self.assertLogs('scb_gsm_scan.timing', 'INFO') as logs:
+            self.client.get(reverse('measurement-list'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'measurement-list')
+        self.assertEqual(record['status'], 200)
+        self.assertIn('db', record['timings'])
+        self.assertEqual(record['timings']['total']['count'], 1)
+
+        with self.settings(GSM_SERVER_TIMING_LOG_MIN_MS=60_000), self.assertNoLogs('scb_gsm_scan.timing', 'INFO'):
+            self.client.get(reverse('measurement-list'))
+
+    async def test_async_view_timings(self):
+        from django.test import AsyncClient
+
+        client = AsyncClient()
+        client.cookies['access'] = self.client.cookies['access'].value
+        response = await client.get(reverse('async_measurement-list'))
+        self.assertEqual(response.status_code, 200)
+        metrics = self.metrics(response)
+        self.assertTrue({'db', 'auth', 'serialize', 'total'} <= set(metrics))
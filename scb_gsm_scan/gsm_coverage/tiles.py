@@ -0,0 +1,464 @@
+"""
+Pyramide de tuiles de couverture (RSRP / RSRQ / SINR agrégés).
+
+Chaque tuile web mercator z/x/y est découpée en TILE_BINS × TILE_BINS
+cases ; une case agrège les mesures des points qu'elle contient (nombre
+de points, sommes et effectifs par mesure). Les tuiles sont stockées par
+opérateur, technologie et bande (CoverageTile) :
+
+- au zoom maximal, elles sont calculées depuis les lignes (vectorisé),
+  table chaude et archives mensuelles (gsm_coverage.partitions) ;
+- aux zooms inférieurs, depuis leurs quatre tuiles filles, les sommes
+  étant additives.
+
+À l'ajout d'un scan, seules les tuiles qu'il touche (et leurs ancêtres)
+sont reconstruites. La reconstruction ne se fait pas dans la requête :
+les tuiles touchées sont enregistrées (PendingTile) dans la transaction de
+l'import puis reconstruites par le worker des jobs (gsm_coverage.jobs,
+``manage.py run_ingest_jobs``).
+
+Les tuiles servies sont gardées dans un cache LRU propre au processus
+(alias de cache ``gsm_tiles``), sous une version changée à chaque
+reconstruction. Les versions sont lues dans le cache partagé
+``settings.GSM_RESPONSE_CACHE`` : une reconstruction faite par un worker
+invalide les tuiles de tous les processus.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from gsm_coverage.models import CoverageTile, CSVLine, GSMScan, PendingTile
+from gsm_coverage.spatial import GEOKEY_ZOOM, morton, tile_xy, tiles_bbox
+import logging
+import numpy as np
+import pandas as pd
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+TILE_BIN_BITS = 6
+TILE_BINS = 1 << TILE_BIN_BITS
+METRICS = ['rsrp_dbm', 'rsrq_db', 'sinr_db']
+
+TILE_KEYS = ['rat', 'band', 'x', 'y']
+CELL_KEYS = ['i', 'j']
+CELL_VALUES = ['count'] + [f'{metric}_sum' for metric in METRICS] + [f'{metric}_n' for metric in METRICS]
+CELL_COLUMNS = CELL_KEYS + CELL_VALUES
+
+# Nombre d'intervalles de clés spatiales par requête de lignes
+RANGES_PER_QUERY = 200
+# Nombre de tuiles en attente réclamées à la fois par un worker
+PENDING_CHUNK_SIZE = 5000
+
+
+def get_zoom_range():
+    """
+    Zooms (min, max) de la pyramide : ``settings.GSM_TILE_MIN_ZOOM`` et
+    ``settings.GSM_TILE_MAX_ZOOM``.
+    """
+    min_zoom = getattr(settings, 'GSM_TILE_MIN_ZOOM', 6)
+    max_zoom = min(getattr(settings, 'GSM_TILE_MAX_ZOOM', 14), GEOKEY_ZOOM)
+    return min(min_zoom, max_zoom), max_zoom
+
+
+# --- Agrégation ---
+
+def _empty_cells():
+    return pd.DataFrame({column: pd.Series(dtype='int64') for column in TILE_KEYS + CELL_COLUMNS})
+
+
+def bin_lines(df, zoom):
+    """
+    Agrège les lignes (colonnes lat, lon, rat, band et mesures) en cases
+    des tuiles du zoom donné.
+    """
+    df = df[df['lat'].notna() & df['lon'].notna()]
+    if df.empty:
+        return _empty_cells()
+    px, py = tile_xy(df['lat'], df['lon'], zoom + TILE_BIN_BITS)
+    px, py = px.astype('int64'), py.astype('int64')
+    cells = pd.DataFrame({
+        'rat': df['rat'].to_numpy(),
+        'band': df['band'].to_numpy(),
+        'x': px >> TILE_BIN_BITS,
+        'y': py >> TILE_BIN_BITS,
+        'i': px & (TILE_BINS - 1),
+        'j': py & (TILE_BINS - 1),
+        'count': 1,
+    })
+    for metric in METRICS:
+        values = pd.to_numeric(df[metric], errors='coerce').to_numpy(dtype='float64')
+        cells[f'{metric}_sum'] = np.nan_to_num(values)
+        cells[f'{metric}_n'] = (~np.isnan(values)).astype('int64')
+    return cells.groupby(TILE_KEYS + CELL_KEYS, as_index=False, sort=False)[CELL_VALUES].sum()
+
+
+def parent_cells(cells):
+    """
+    Agrège les cases de tuiles filles en cases de leurs tuiles parentes
+    (zoom - 1) : une case parente regroupe 2 × 2 cases filles.
+    """
+    if cells.empty:
+        return _empty_cells()
+    gx = ((cells['x'].to_numpy(dtype='int64') << TILE_BIN_BITS) + cells['i'].to_numpy(dtype='int64')) >> 1
+    gy = ((cells['y'].to_numpy(dtype='int64') << TILE_BIN_BITS) + cells['j'].to_numpy(dtype='int64')) >> 1
+    parents = cells[['rat', 'band'] + CELL_VALUES].assign(
+        x=gx >> TILE_BIN_BITS, y=gy >> TILE_BIN_BITS,
+        i=gx & (TILE_BINS - 1), j=gy & (TILE_BINS - 1),
+    )
+    return parents.groupby(TILE_KEYS + CELL_KEYS, as_index=False, sort=False)[CELL_VALUES].sum()
+
+
+def tiles_to_cells(tiles):
+    """
+    DataFrame des cases de tuiles stockées (une ligne par case).
+    """
+    tiles = [tile for tile in tiles if tile.cells]
+    if not tiles:
+        return _empty_cells()
+    sizes = [len(tile.cells['i']) for tile in tiles]
+    data = {
+        key: np.repeat([getattr(tile, key) for tile in tiles], sizes)
+        for key in TILE_KEYS
+    }
+    for column in CELL_COLUMNS:
+        data[column] = np.concatenate([tile.cells[column] for tile in tiles])
+    return pd.DataFrame(data)
+
+
+def cells_to_tiles(operator_id, zoom, cells):
+    """
+    Instances CoverageTile (non enregistrées) des cases données.
+    """
+    if cells.empty:
+        return []
+    cells = cells.sort_values(TILE_KEYS, kind='stable')
+    keys = cells[TILE_KEYS]
+    starts = np.flatnonzero(keys.ne(keys.shift()).any(axis=1).to_numpy())
+    ends = np.append(starts[1:], len(cells))
+    columns = {column: cells[column].tolist() for column in CELL_COLUMNS}
+    counts = np.add.reduceat(cells['count'].to_numpy(), starts)
+    rats, bands = cells['rat'].to_numpy(), cells['band'].to_numpy()
+    xs, ys = cells['x'].to_numpy(), cells['y'].to_numpy()
+    return [
+        CoverageTile(
+            operator_id=operator_id, rat=rats[start], band=bands[start], z=zoom,
+            x=int(xs[start]), y=int(ys[start]), line_count=int(count),
+            cells={column: values[start:end] for column, values in columns.items()},
+        )
+        for start, end, count in zip(starts, ends, counts)
+    ]
+
+
+# --- Reconstruction ---
+
+def _tile_key_ranges(tiles, zoom):
+    """
+    Intervalles de clés spatiales (geokey) couverts par les tuiles du zoom
+    donné, fusionnés lorsqu'ils sont contigus.
+    """
+    if not tiles:
+        return []
+    xs, ys = zip(*tiles)
+    shift = 2 * (GEOKEY_ZOOM - zoom)
+    codes = np.unique(morton(np.array(xs, dtype=np.uint64), np.array(ys, dtype=np.uint64)))
+    breaks = np.flatnonzero(np.diff(codes) != 1) + 1
+    starts = codes[np.concatenate([[0], breaks])]
+    ends = codes[np.concatenate([breaks - 1, [len(codes) - 1]])]
+    return [(int(start) << shift, ((int(end) + 1) << shift) - 1) for start, end in zip(starts, ends)]
+
+
+def _in_tiles(df, tiles, zoom):
+    """
+    Lignes du DataFrame (colonnes lat, lon) situées dans les tuiles (x, y).
+    """
+    df = df[df['lat'].notna() & df['lon'].notna()]
+    x, y = tile_xy(df['lat'], df['lon'], zoom)
+    keys = (x.astype('int64') << 32) | y.astype('int64')
+    wanted = np.array([(tx << 32) | ty for tx, ty in tiles], dtype='int64')
+    return df[np.isin(keys, wanted)]
+
+
+def _scan_ids(operator_id):
+    return list(GSMScan.objects.filter(gsmdata__operator=operator_id).values_list('pk', flat=True))
+
+
+def operator_cells(operator_id, tiles, zoom):
+    """
+    Cases des tuiles données, calculées depuis les lignes de l'opérateur,
+    archivées comprises.
+    """
+    from gsm_coverage import partitions
+
+    ranges = _tile_key_ranges(tiles, zoom)
+    columns = ['lat', 'lon', 'rat', 'band'] + METRICS
+    frames = []
+    for start in range(0, len(ranges), RANGES_PER_QUERY):
+        condition = Q()
+        for low, high in ranges[start:start + RANGES_PER_QUERY]:
+            condition |= Q(geokey__range=(low, high))
+        rows = CSVLine.objects.filter(condition, scan__gsmdata__operator=operator_id).values_list(*columns)
+        frames.append(bin_lines(pd.DataFrame.from_records(list(rows), columns=columns), zoom))
+    archived = partitions.archived_frames(columns, bbox=tiles_bbox(tiles, zoom), scan_id=_scan_ids(operator_id))
+    for frame in archived:
+        frames.append(bin_lines(_in_tiles(frame, tiles, zoom), zoom))
+    if not frames:
+        return _empty_cells()
+    return pd.concat(frames, ignore_index=True)
+
+
+def _select(operator_id, zoom, tiles):
+    candidates = CoverageTile.objects.filter(
+        operator_id=operator_id, z=zoom,
+        x__in={x for x, _ in tiles}, y__in={y for _, y in tiles},
+    )
+    return candidates, lambda tile: (tile.x, tile.y) in tiles
+
+
+def _replace(operator_id, zoom, tiles, cells):
+    candidates, selected = _select(operator_id, zoom, tiles)
+    stale = [tile.pk for tile in candidates.only('pk', 'x', 'y') if selected(tile)]
+    CoverageTile.objects.filter(pk__in=stale).delete()
+    CoverageTile.objects.bulk_create(cells_to_tiles(operator_id, zoom, cells), batch_size=500)
+
+
+def rebuild(operator_id, tiles):
+    """
+    Reconstruit, pour l'opérateur, les tuiles (x, y) du zoom maximal
+    données puis leurs ancêtres jusqu'au zoom minimal.
+
+    Chaque niveau est calculé à partir des cases du niveau inférieur tout
+    juste reconstruites, complétées des tuiles sœurs lues en base.
+    """
+    min_zoom, max_zoom = get_zoom_range()
+    tiles = set(tiles)
+    if not tiles:
+        return
+    with transaction.atomic():
+        cells = operator_cells(operator_id, tiles, max_zoom)
+        _replace(operator_id, max_zoom, tiles, cells)
+        for zoom in range(max_zoom - 1, min_zoom - 1, -1):
+            parents = {(x >> 1, y >> 1) for x, y in tiles}
+            siblings = {
+                (2 * x + dx, 2 * y + dy) for x, y in parents for dx in (0, 1) for dy in (0, 1)
+            } - tiles
+            candidates, selected = _select(operator_id, zoom + 1, siblings)
+            stored = tiles_to_cells(tile for tile in candidates if selected(tile))
+            cells = parent_cells(pd.concat([cells, stored], ignore_index=True))
+            _replace(operator_id, zoom, parents, cells)
+            tiles = parents
+    invalidate(operator_id)
+
+
+def lines_tiles(lines, zoom=None):
+    """
+    Tuiles (x, y) du zoom maximal contenant les lignes du QuerySet.
+    """
+    if zoom is None:
+        zoom = get_zoom_range()[1]
+    coordinates = np.array(
+        list(lines.filter(lat__isnull=False, lon__isnull=False).values_list('lat', 'lon')),
+        dtype='float64',
+    ).reshape(-1, 2)
+    if not len(coordinates):
+        return set()
+    x, y = tile_xy(coordinates[:, 0], coordinates[:, 1], zoom)
+    return set(zip(x.tolist(), y.tolist()))
+
+
+def archived_tiles(scan_ids, zoom=None):
+    """
+    Tuiles (x, y) du zoom maximal contenant les lignes archivées des scans.
+    """
+    from gsm_coverage import partitions
+
+    if zoom is None:
+        zoom = get_zoom_range()[1]
+    found = set()
+    for frame in partitions.archived_frames(['lat', 'lon'], scan_id=scan_ids):
+        frame = frame.dropna()
+        x, y = tile_xy(frame['lat'], frame['lon'], zoom)
+        found.update(zip(x.tolist(), y.tolist()))
+    return found
+
+
+def scan_tiles(scan):
+    """
+    Tuiles du zoom maximal touchées par les lignes du scan, archivées
+    comprises.
+    """
+    return lines_tiles(scan.csv_lines.all()) | archived_tiles([scan.pk])
+
+
+def schedule_rebuild(operator_ids, tiles):
+    """
+    Enregistre les tuiles à reconstruire dans la transaction en cours ;
+    après sa validation, le cache des opérateurs est invalidé et un worker
+    des jobs est réveillé.
+
+    Une tuile déjà en attente est mise à jour, ce qui la verrouille jusqu'à
+    la fin de la transaction : un worker ne peut la réclamer qu'une fois
+    les lignes de l'import visibles.
+    """
+    from gsm_coverage import jobs
+
+    operator_ids = [operator_id for operator_id in set(operator_ids) if operator_id is not None]
+    tiles = set(tiles)
+    if not operator_ids or not tiles:
+        return
+    _add_pending(operator_ids, tiles)
+
+    def invalidate_all():
+        for operator_id in operator_ids:
+            invalidate(operator_id)
+
+    transaction.on_commit(invalidate_all, robust=True)
+    transaction.on_commit(jobs.wake, robust=True)
+
+
+def _add_pending(operator_ids, tiles):
+    PendingTile.objects.bulk_create(
+        [PendingTile(operator_id=operator_id, x=x, y=y) for operator_id in operator_ids for x, y in tiles],
+        batch_size=500, update_conflicts=True, unique_fields=['operator', 'x', 'y'], update_fields=['updated_at'],
+    )
+
+
+def claim_pending():
+    """
+    Réclame les tuiles en attente d'un opérateur : (opérateur, tuiles), ou
+    None si la file est vide. Les tuiles verrouillées par une transaction
+    en cours (import non validé, autre worker) sont laissées.
+    """
+    with transaction.atomic():
+        pending = PendingTile.objects.select_for_update(skip_locked=True).order_by('pk')
+        first = pending.first()
+        if first is None:
+            return None
+        claimed = list(pending.filter(operator_id=first.operator_id).values_list('pk', 'x', 'y')[:PENDING_CHUNK_SIZE])
+        PendingTile.objects.filter(pk__in=[pk for pk, _, _ in claimed]).delete()
+    return first.operator_id, {(x, y) for _, x, y in claimed}
+
+
+def process_pending():
+    """
+    Reconstruit les tuiles en attente jusqu'à épuisement de la file.
+    Retourne le nombre de tuiles du zoom maximal reconstruites. En cas
+    d'erreur, les tuiles réclamées sont remises en attente.
+    """
+    processed = 0
+    while True:
+        claimed = claim_pending()
+        if claimed is None:
+            return processed
+        operator_id, tiles = claimed
+        try:
+            rebuild(operator_id, tiles)
+        except Exception:
+            logger.exception("Échec de la reconstruction des tuiles de l'opérateur %s", operator_id)
+            _add_pending([operator_id], tiles)
+            return processed
+        processed += len(tiles)
+
+
+def rebuild_all(operator_id):
+    """
+    Reconstruit toute la pyramide de l'opérateur.
+    """
+    CoverageTile.objects.filter(operator_id=operator_id).delete()
+    affected = lines_tiles(CSVLine.objects.filter(scan__gsmdata__operator=operator_id))
+    rebuild(operator_id, affected | archived_tiles(_scan_ids(operator_id)))
+
+
+# --- Lecture et cache ---
+
+def get_cache():
+    return caches[getattr(settings, 'GSM_TILE_CACHE', 'gsm_tiles')]
+
+
+def get_version_cache():
+    """
+    Cache des versions, partagé entre les processus.
+    """
+    return caches[settings.GSM_RESPONSE_CACHE]
+
+
+def _version_key(operator_id):
+    return f'coverage-tiles:version:{operator_id or "all"}'
+
+
+def _version(operator_id):
+    """
+    Version courante des tuiles de l'opérateur (ou de tous). Une version
+    absente (expirée ou évincée) est recréée avec une nouvelle valeur :
+    les entrées antérieures ne sont jamais resservies.
+    """
+    cache = get_version_cache()
+    key = _version_key(operator_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def invalidate(operator_id=None):
+    cache = get_version_cache()
+    version = time.time_ns()
+    cache.set(_version_key(None), version, None)
+    if operator_id is not None:
+        cache.set(_version_key(operator_id), version, None)
+
+
+def _mean(sums, counts):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.round(sums / counts, 2)
+    return [None if n == 0 else float(value) for value, n in zip(means, counts)]
+
+
+def render_tile(z, x, y, operator=None, rat=None, band=None):
+    """
+    Tuile z/x/y agrégée sur les tuiles stockées correspondant aux filtres :
+    par case (colonnes i, j), nombre de points et moyenne de chaque mesure.
+    """
+    tiles = CoverageTile.objects.filter(z=z, x=x, y=y)
+    if operator is not None:
+        tiles = tiles.filter(operator_id=operator)
+    if rat:
+        tiles = tiles.filter(rat=rat)
+    if band:
+        tiles = tiles.filter(band=band)
+
+    cells = tiles_to_cells(tiles)
+    cells = cells.groupby(CELL_KEYS, as_index=False)[CELL_VALUES].sum()
+    data = {
+        'z': z, 'x': x, 'y': y,
+        'size': TILE_BINS,
+        'line_count': int(cells['count'].sum()),
+        'cells': {
+            'i': cells['i'].tolist(),
+            'j': cells['j'].tolist(),
+            'count': cells['count'].tolist(),
+        },
+    }
+    for metric in METRICS:
+        data['cells'][metric] = _mean(
+            cells[f'{metric}_sum'].to_numpy(dtype='float64'), cells[f'{metric}_n'].to_numpy(dtype='int64')
+        )
+    return data
+
+
+def get_tile(z, x, y, operator=None, rat=None, band=None):
+    """
+    render_tile servie depuis le cache LRU lorsque la tuile y est déjà.
+    """
+    cache = get_cache()
+    key = f'coverage-tiles:{z}:{x}:{y}:{operator}:{rat}:{band}'
+    version = _version(operator)
+    data = cache.get(key, version=version)
+    if data is None:
+        data = render_tile(z, x, y, operator=operator, rat=rat, band=band)
+        cache.set(key, data, version=version)
+    return data
@@ -0,0 +1,55 @@
+"""
+Gestionnaires d'upload calculant l'empreinte SHA-256 des fichiers pendant
+leur réception, sans relecture du fichier une fois reçu.
+
+L'empreinte est exposée sur le fichier uploadé par l'attribut ``sha256``.
+"""
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+import hashlib
+
+
+class HashingUploadMixin:
+
+    def new_file(self, *args, **kwargs):
+        self._sha256 = hashlib.sha256()
+        return super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self._sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self._sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def file_digest(file):
+    """
+    Empreinte SHA-256 d'un fichier : celle calculée à l'upload si elle
+    existe, sinon calculée par lecture en blocs.
+    """
+    digest = getattr(file, 'sha256', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    if hasattr(file, 'chunks'):
+        for chunk in file.chunks():
+            sha256.update(chunk)
+    else:
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        for chunk in iter(lambda: file.read(64 * 1024), b''):
+            sha256.update(chunk)
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return sha256.hexdigest()
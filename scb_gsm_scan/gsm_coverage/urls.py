@@ -1,13 +1,26 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from gsm_coverage import views
+from gsm_coverage import asyncviews, views
 
 router = DefaultRouter()
 
 router.register(r'gsm_data', views.GSMDataViewSet, basename='gsm_data')
 router.register(r'gsm_scan', views.GSMScanViewSet, basename='gsm_scan')
 router.register(r'csv_line', views.CSVLineViewSet, basename='csv_line')
+router.register(r'measurements', views.MeasurementViewSet, basename='measurement')
+router.register(r'cells', views.CellAggregateViewSet, basename='cell')
+router.register(r'measurement_archives', views.MeasurementArchiveViewSet, basename='measurement_archive')
+router.register(r'jobs', views.IngestJobViewSet, basename='ingest_job')
 
 urlpatterns = [
     path('gsm_coverage/', include(router.urls)),
+    path('gsm_coverage/tiles/<int:z>/<int:x>/<int:y>/', views.CoverageTileView.as_view(), name='coverage_tile'),
+    # Lectures asynchrones (déploiement ASGI, voir gsm_coverage.asyncviews)
+    path('gsm_coverage/async/gsm_data/', asyncviews.GSMDataListView.as_view(), name='async_gsm_data-list'),
+    path('gsm_coverage/async/gsm_scan/<int:pk>/', asyncviews.GSMScanDetailView.as_view(), name='async_gsm_scan-detail'),
+    path(
+        'gsm_coverage/async/gsm_scan/<int:pk>/export/', asyncviews.GSMScanExportView.as_view(),
+        name='async_gsm_scan-export',
+    ),
+    path('gsm_coverage/async/measurements/', asyncviews.MeasurementListView.as_view(), name='async_measurement-list'),
 ]
@@ -1,26 +1,337 @@
-from rest_framework import viewsets, permissions, mixins
+from rest_framework import viewsets, permissions, mixins, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.generics import get_object_or_404
+import tempfile
+import zipfile
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from gsm_coverage.models import GSMData, GSMScan, CSVLine
-from gsm_coverage.serializers import GSMDataSerializer, GSMScanSerializer, CSVLineSerializer
+from gsm_coverage.models import GSMData, GSMScan, CSVLine, IngestJob, CellAggregate, MeasurementArchive
+from gsm_coverage.serializers import (
+    GSMDataSerializer, GSMScanSerializer, CSVLineSerializer, IngestJobSerializer,
+    GSMScanBatchSerializer, GSMScanBatchResultSerializer,
+    GSMDataSummarySerializer, GSMScanSummarySerializer, CellAggregateSerializer,
+    CSVLineValuesSerializer, MeasurementArchiveSerializer,
+)
+from gsm_coverage.filters import CSVLineFilter, GSMScanFilter
+from gsm_coverage.pagination import MeasurementCursorPagination, query_flag
+from gsm_coverage.renderers import binary_renderers
+from rest_framework.settings import api_settings
+from gsm_coverage import aggregates, batch, jobs, tiles
+from gsm_coverage.caching import CachedReadMixin
+from gsm_coverage.export import EXPORT_FORMATS
+from gsm_coverage.partitions import MeasurementHistory
+from rest_framework.exceptions import ValidationError
+from django.http import StreamingHttpResponse
+import os
 from django_filters.rest_framework import DjangoFilterBackend
 
 
-class GSMDataViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
-    queryset = GSMData.objects.all()
+SUMMARY_PARAMETER = OpenApiParameter(
+    'summary', bool,
+    description="Représentation résumée (nombre de lignes, boîte englobante, période) sans les lignes.",
+)
+
+GSM_DATA_SUMMARY_PARAMETER = OpenApiParameter(
+    'summary', bool, default=True,
+    description=(
+        "Opérateurs résumés, sans leurs scans (par défaut). ``false`` : scans et "
+        "lignes imbriqués, non paginés."
+    ),
+)
+
+OUTPUT_PARAMETER = OpenApiParameter(
+    'output', str, enum=tuple(EXPORT_FORMATS), default='ndjson',
+    description="Format de l'export : NDJSON (un objet JSON par ligne) ou CSV (format d'import).",
+)
+EXPORT_RESPONSES = {(200, 'application/x-ndjson'): str, (200, 'text/csv'): str}
+
+
+def export_output(request):
+    """
+    Format d'export demandé (paramètre ``output``).
+    """
+    # Le paramètre ``format`` est réservé par DRF à la négociation du rendu
+    output = request.query_params.get('output', 'ndjson').lower()
+    if output not in EXPORT_FORMATS:
+        raise ValidationError({'output': [f"Format inconnu. Formats disponibles : {', '.join(EXPORT_FORMATS)}."]})
+    return output
+
+
+def scan_export_name(scan):
+    return os.path.splitext(os.path.basename(scan.file.name))[0] or f'scan_{scan.pk}'
+
+
+def export_response(request, source, name):
+    """
+    Export en flux (paramètre ``output``) des lignes de ``source``.
+    """
+    output = export_output(request)
+    content_type, render = EXPORT_FORMATS[output]
+    response = StreamingHttpResponse(render(source), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{name}.{output}"'
+    return response
+
+
+class GSMDataViewSet(CachedReadMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Données par opérateur. Par défaut, chaque opérateur est résumé sans ses
+    scans : les scans se consultent (paginés) via
+    ``gsm_scan/?summary=true&operator=<id>`` et les lignes via
+    ``measurements/?scan=<id>``. Les scans et toutes leurs lignes ne sont
+    imbriqués qu'avec ``?summary=false``.
+
+    Réponses conditionnelles (ETag / Last-Modified) et mises en cache
+    jusqu'au prochain changement des données (voir gsm_coverage.caching).
+    """
+    queryset = GSMData.objects.select_related('operator').prefetch_related('gsm_scan__csv_lines', 'gsm_scan__archives')
     serializer_class = GSMDataSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = None
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['operator'] 
+
+    def get_queryset(self):
+        if query_flag(self.request, 'summary', default=True):
+            return GSMData.objects.with_summary()
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if query_flag(self.request, 'summary', default=True):
+            return GSMDataSummarySerializer
+        return super().get_serializer_class()
+
+    @extend_schema(parameters=[GSM_DATA_SUMMARY_PARAMETER])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
     
-class GSMScanViewSet(viewsets.ModelViewSet):
-    queryset = GSMScan.objects.all()
+class GSMScanViewSet(CachedReadMixin, viewsets.ModelViewSet):
+    """
+    Scans GSM : import (unitaire, asynchrone ou groupé), remplacement du
+    fichier et export. Les lectures (list / retrieve) sont conditionnelles
+    et mises en cache comme celles de gsm_data.
+    """
+    queryset = GSMScan.objects.prefetch_related('csv_lines', 'archives').order_by('-pk')
     serializer_class = GSMScanSerializer
     permission_classes = [permissions.IsAuthenticated]
     http_method_names = ['get', 'post', 'patch']
-    
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = GSMScanFilter
+
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve') and query_flag(self.request, 'summary'):
+            # Statistiques stockées sur le scan : aucune ligne n'est lue
+            return GSMScan.objects.order_by('-pk')
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve') and query_flag(self.request, 'summary'):
+            return GSMScanSummarySerializer
+        return super().get_serializer_class()
+
+    @extend_schema(parameters=[SUMMARY_PARAMETER])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(parameters=[SUMMARY_PARAMETER])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'async', bool,
+                description="Import en tâche de fond : retourne 202 et l'identifiant du job."
+            ),
+        ],
+        responses={200: GSMScanSerializer, 201: GSMScanSerializer, 202: IngestJobSerializer},
+    )
+    def create(self, request, *args, **kwargs):
+        if not query_flag(request, 'async'):
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            self.perform_create(serializer)
+            # Fichier déjà importé : le scan existant est retourné
+            code = status.HTTP_200_OK if serializer.duplicate_of is not None else status.HTTP_201_CREATED
+            return Response(serializer.data, status=code, headers=self.get_success_headers(serializer.data))
+
+        serializer = IngestJobSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        job = serializer.save(created_by=request.user)
+        jobs.enqueue(job)
+        return Response(IngestJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @extend_schema(
+        request=GSMScanBatchSerializer,
+        responses={201: GSMScanBatchResultSerializer(many=True)},
+        summary="Import groupé de fichiers CSV",
+        description=(
+            "Accepte plusieurs fichiers CSV et/ou une archive zip. Les fichiers sont "
+            "nettoyés en parallèle puis chacun est enregistré comme un GSMScan de l'opérateur."
+        ),
+    )
+    @action(detail=False, methods=['post'], url_path='batch', url_name='batch')
+    def batch(self, request):
+        serializer = GSMScanBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Membres des archives zip extraits le temps de l'import
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                files = batch.expand_uploads(serializer.validated_data['files'], directory)
+            except zipfile.BadZipFile:
+                return Response({'files': ["L'archive zip est invalide."]}, status=status.HTTP_400_BAD_REQUEST)
+            if not files:
+                return Response({'files': ["Aucun fichier CSV à importer."]}, status=status.HTTP_400_BAD_REQUEST)
+
+            results = batch.ingest_batch(
+                serializer.validated_data['operator'], files, link=serializer.validated_data['link']
+            )
+        imported = any(result.scan is not None for result in results)
+        return Response(
+            GSMScanBatchResultSerializer(results, many=True).data,
+            status=status.HTTP_201_CREATED if imported else status.HTTP_400_BAD_REQUEST,
+        )
+
+    @extend_schema(
+        parameters=[OUTPUT_PARAMETER],
+        responses=EXPORT_RESPONSES,
+        summary="Export en flux des mesures d'un scan",
+    )
+    @action(detail=True, methods=['get'], url_path='export', url_name='export')
+    def export(self, request, pk=None):
+        # Sans le prefetch de get_queryset(), qui chargerait toutes les lignes ;
+        # lignes des mois archivés comprises
+        scan = get_object_or_404(GSMScan.objects.all(), pk=pk)
+        history = MeasurementHistory(scan.csv_lines.all(), {'scan': scan.pk})
+        return export_response(request, history, scan_export_name(scan))
+
+
+class CoverageTileView(APIView):
+    """
+    Tuile de couverture z/x/y (web mercator) : pour chaque case non vide
+    de la grille, nombre de points et moyennes RSRP / RSRQ / SINR.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('operator', int, description="Identifiant du groupe opérateur."),
+            OpenApiParameter('rat', str),
+            OpenApiParameter('band', str),
+        ],
+        responses={200: dict},
+        summary="Tuile de couverture agrégée",
+    )
+    def get(self, request, z, x, y):
+        min_zoom, max_zoom = tiles.get_zoom_range()
+        if not min_zoom <= z <= max_zoom:
+            return Response(
+                {'z': [f"Le zoom doit être compris entre {min_zoom} et {max_zoom}."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return Response({'x': ["Tuile hors de la grille."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        operator = request.query_params.get('operator')
+        if operator is not None and not operator.isdigit():
+            return Response({'operator': ["Identifiant invalide."]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(tiles.get_tile(
+            z, x, y,
+            operator=int(operator) if operator is not None else None,
+            rat=request.query_params.get('rat') or None,
+            band=request.query_params.get('band') or None,
+        ))
+
+
+class CellAggregateViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Statistiques par cellule radio, lues depuis les agrégats tenus à jour à
+    l'import (sans parcourir les lignes).
+    """
+    queryset = CellAggregate.objects.all()
+    serializer_class = CellAggregateSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['mccmnc', 'rat', 'cell_id', 'band', 'earfcn']
+
+
+class MeasurementArchiveViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Mois de mesures archivés (voir gsm_coverage.partitions), lisibles via
+    ``measurements/history/``.
+    """
+    queryset = MeasurementArchive.objects.all()
+    serializer_class = MeasurementArchiveSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+
+class IngestJobViewSet(
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet
+):
+    """
+    Suivi des jobs d'import asynchrone : état, lignes traitées / rejetées et durée.
+    """
+    queryset = IngestJob.objects.all()
+    serializer_class = IngestJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['state', 'operator']
+
+
+class MeasurementViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Lecture des mesures, filtrables par scan, opérateur, réseau, période et
+    boîte englobante (``bbox=min_lon,min_lat,max_lon,max_lat``) ou rayon
+    autour d'un point (``near=lat,lon,rayon_m``).
+
+    Pagination par curseur sur (time, id) : suivre les liens next / previous.
+    Formats : JSON, MessagePack ou Arrow IPC selon l'en-tête Accept (voir
+    gsm_coverage.renderers). ``fields=pk,time,...`` limite les champs
+    retournés ; les lignes sont lues en tuples (``values_list``) et
+    sérialisées sans instance de modèle (CSVLineValuesSerializer).
+
+    La liste ne lit que la table des mesures ; ``history/`` exporte en flux
+    les mêmes filtres sur toute la période, mois archivés compris.
+    """
+    queryset = CSVLine.objects.all()
+    serializer_class = CSVLineSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = CSVLineFilter
+    pagination_class = MeasurementCursorPagination
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + binary_renderers()
+
+    @extend_schema(parameters=[
+        OpenApiParameter(
+            'fields', str,
+            description="Champs retournés, séparés par des virgules (par défaut : tous).",
+        ),
+    ])
+    def list(self, request, *args, **kwargs):
+        serializer = CSVLineValuesSerializer(request.query_params.get('fields'))
+        queryset = self.filter_queryset(self.get_queryset())
+        # time et pk sont lus après les champs demandés : clé du curseur
+        rows = queryset.values_list(*serializer.columns('time', 'pk'), named=True)
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(serializer.to_representation(page))
+
+    @extend_schema(
+        parameters=[OUTPUT_PARAMETER],
+        responses=EXPORT_RESPONSES,
+        summary="Export en flux des mesures, mois archivés compris",
+    )
+    @action(detail=False, methods=['get'], url_path='history', url_name='history')
+    def history(self, request):
+        filterset = self.filterset_class(request.query_params, queryset=self.get_queryset(), request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return export_response(request, MeasurementHistory(filterset.qs, filterset.form.cleaned_data), 'measurements')
+
 
 class CSVLineViewSet(viewsets.ModelViewSet):
     queryset = CSVLine.objects.all()
@@ -28,6 +339,15 @@ class CSVLineViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     http_method_names = ['patch']
 
+    def perform_update(self, serializer):
+        lines = CSVLine.objects.filter(pk=serializer.instance.pk)
+        before = aggregates.lines_frame(lines)
+        line = serializer.save()
+        aggregates.remove_frame(before)
+        aggregates.add_frame(aggregates.lines_frame(lines))
+        if line.scan is not None:
+            line.scan.refresh_statistics()
+
 
 
 
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'scb_gsm_scan.settings')
 
 application = get_asgi_application()
+
+# Reprend les imports laissés en attente ou interrompus par le processus précédent
+from gsm_coverage import jobs  # noqa: E402
+
+jobs.wake()
@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En premier : mesure la requête entière (scb_gsm_scan.timing)
+    "scb_gsm_scan.timing.ServerTimingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -80,11 +82,41 @@ WSGI_APPLICATION = 'scb_gsm_scan.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite par défaut. Profil PostgreSQL (DB_ENGINE=postgresql, pilote
+# psycopg : extra « postgres ») : imports simultanés et lignes écrites par COPY.
+if os.getenv("DB_ENGINE", "sqlite") == "postgresql":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("DB_NAME", "scb_gsm_scan"),
+            'USER': os.getenv("DB_USER", "postgres"),
+            'PASSWORD': os.getenv("DB_PASSWORD", ""),
+            'HOST': os.getenv("DB_HOST", "localhost"),
+            'PORT': os.getenv("DB_PORT", "5432"),
+            'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", 60)),
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            # BEGIN IMMEDIATE : voir gsm_coverage.pragmas
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        }
+    }
+
+# PRAGMA appliqués à chaque connexion SQLite (gsm_coverage.pragmas)
+GSM_SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv("GSM_SQLITE_JOURNAL_MODE", "WAL"),
+    'synchronous': os.getenv("GSM_SQLITE_SYNCHRONOUS", "NORMAL"),
+    # Négatif : taille en Kio (64 Mio)
+    'cache_size': int(os.getenv("GSM_SQLITE_CACHE_SIZE", -64 * 1024)),
+    'mmap_size': int(os.getenv("GSM_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    'temp_store': os.getenv("GSM_SQLITE_TEMP_STORE", "MEMORY"),
+    # Millisecondes
+    'busy_timeout': int(os.getenv("GSM_SQLITE_BUSY_TIMEOUT", 10_000)),
 }
 
 
@@ -168,10 +200,92 @@ SPECTACULAR_SETTINGS = {
     'SCHEMA_PATH_PREFIX_TRIM': False,
 }
 
+# Ingestion des scans GSM
+# Les gestionnaires d'upload calculent l'empreinte SHA-256 des fichiers à la réception
+FILE_UPLOAD_HANDLERS = [
+    "gsm_coverage.uploadhandler.HashingMemoryFileUploadHandler",
+    "gsm_coverage.uploadhandler.HashingTemporaryFileUploadHandler",
+]
+# Moteur de lecture CSV : "c" ou "pyarrow" ; vide = pyarrow s'il est installé, sinon "c"
+GSM_CSV_ENGINE = os.getenv("GSM_CSV_ENGINE") or None
+# Distance minimale (m) entre deux points conservés d'une même cellule
+GSM_THINNING_DISTANCE_M = float(os.getenv("GSM_THINNING_DISTANCE_M", 5))
+# Fenêtre de temps (s) de l'éclaircissement : un lieu revisité après la
+# fenêtre garde un nouveau point ; 0 pour une seule fenêtre (mémoire non bornée)
+GSM_THINNING_WINDOW_S = float(os.getenv("GSM_THINNING_WINDOW_S", 3600))
+GSM_INGEST_BATCH_SIZE = int(os.getenv("GSM_INGEST_BATCH_SIZE", 2000))
+# Sous PostgreSQL, lignes écrites par COPY FROM STDIN plutôt que par INSERT
+GSM_INGEST_COPY = os.getenv("GSM_INGEST_COPY", "True") == "True"
+# Au-delà de ce seuil (octets), le fichier est lu et inséré par blocs
+GSM_INGEST_STREAMING_THRESHOLD = int(os.getenv("GSM_INGEST_STREAMING_THRESHOLD", 50 * 1024 * 1024))
+GSM_INGEST_CHUNK_SIZE = int(os.getenv("GSM_INGEST_CHUNK_SIZE", 100_000))
+# En streaming, chaque bloc est validé dans sa propre transaction (le scan
+# est supprimé si l'import échoue) plutôt qu'en une seule transaction
+GSM_INGEST_COMMIT_CHUNKS = os.getenv("GSM_INGEST_COMMIT_CHUNKS", "True") == "True"
+# Nombre de threads traitant les imports asynchrones
+GSM_INGEST_WORKERS = int(os.getenv("GSM_INGEST_WORKERS", 2))
+# Durée (s) sans signe de vie (réclamation, bloc validé) au-delà de laquelle
+# un import "running" est considéré interrompu et remis en attente ; doit
+# dépasser le plus long import non découpé en blocs validés
+GSM_INGEST_JOB_TIMEOUT = int(os.getenv("GSM_INGEST_JOB_TIMEOUT", 3600))
+# Nombre de processus pour les imports groupés (par défaut : nombre de cœurs)
+GSM_BATCH_WORKERS = int(os.getenv("GSM_BATCH_WORKERS", 0)) or None
+# Index R-tree SQLite des coordonnées des mesures (créé ou supprimé par migrate)
+GSM_SPATIAL_RTREE = os.getenv("GSM_SPATIAL_RTREE", "True") == "True"
+# Pyramide de tuiles de couverture : zooms précalculés
+GSM_TILE_MIN_ZOOM = int(os.getenv("GSM_TILE_MIN_ZOOM", 6))
+GSM_TILE_MAX_ZOOM = int(os.getenv("GSM_TILE_MAX_ZOOM", 14))
+# Pagination par curseur des mesures : taille de page par défaut et maximale
+GSM_MEASUREMENT_PAGE_SIZE = int(os.getenv("GSM_MEASUREMENT_PAGE_SIZE", 500))
+GSM_MEASUREMENT_MAX_PAGE_SIZE = int(os.getenv("GSM_MEASUREMENT_MAX_PAGE_SIZE", 10_000))
+# Nombre de mois gardés dans la table des mesures : les mois plus anciens
+# sont archivés en Parquet par archive_measurements
+GSM_ARCHIVE_AFTER_MONTHS = int(os.getenv("GSM_ARCHIVE_AFTER_MONTHS", 12))
+# Cache LRU des tuiles servies (alias de CACHES)
+GSM_TILE_CACHE = "gsm_tiles"
+# Cache des réponses gsm_data / gsm_scan (alias de CACHES) et taille
+# maximale (octets) d'une réponse mise en cache
+GSM_RESPONSE_CACHE = "gsm_responses"
+GSM_RESPONSE_CACHE_MAX_BYTES = int(os.getenv("GSM_RESPONSE_CACHE_MAX_BYTES", 5 * 1024 * 1024))
+# Temps par requête en en-têtes Server-Timing (scb_gsm_scan.timing) :
+# part des requêtes mesurées, mesure du SQL (coût par requête SQL), envoi
+# de l'en-tête et journalisation des requêtes plus lentes que LOG_MIN_MS.
+# Hors DEBUG, désactivé par défaut et, une fois activé, limité à 5 % des
+# requêtes par défaut
+GSM_SERVER_TIMING = os.getenv("GSM_SERVER_TIMING", str(DEBUG)) == "True"
+GSM_SERVER_TIMING_SAMPLE_RATE = float(os.getenv("GSM_SERVER_TIMING_SAMPLE_RATE", 1.0 if DEBUG else 0.05))
+GSM_SERVER_TIMING_SQL = os.getenv("GSM_SERVER_TIMING_SQL", "True") == "True"
+GSM_SERVER_TIMING_HEADER = os.getenv("GSM_SERVER_TIMING_HEADER", "True") == "True"
+GSM_SERVER_TIMING_LOG_MIN_MS = float(os.getenv("GSM_SERVER_TIMING_LOG_MIN_MS", 500))
+
+# Tests sans Server-Timing, quel que soit DEBUG (scb_gsm_scan.test_runner)
+TEST_RUNNER = "scb_gsm_scan.test_runner.TestRunner"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "gsm_tiles": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "gsm-tiles",
+        "TIMEOUT": int(os.getenv("GSM_TILE_CACHE_TIMEOUT", 300)),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("GSM_TILE_CACHE_ENTRIES", 2048))},
+    },
+    "gsm_responses": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "gsm-responses",
+        "TIMEOUT": int(os.getenv("GSM_RESPONSE_CACHE_TIMEOUT", 300)),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("GSM_RESPONSE_CACHE_ENTRIES", 512))},
+    },
+}
+
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS").split(',')
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Origines autorisées à lire les durées Server-Timing (Timing-Allow-Origin)
+GSM_SERVER_TIMING_ALLOW_ORIGINS = CORS_ALLOWED_ORIGINS
+
 
 # Configuration de logging pour le debugging
 LOGGING = {
@@ -188,6 +302,14 @@ LOGGING = {
             'class': 'logging.StreamHandler',
         },
     },
+    'loggers': {
+        # Une ligne JSON par requête lente (GSM_SERVER_TIMING_LOG_MIN_MS)
+        'scb_gsm_scan.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
             # 'propagate': True,
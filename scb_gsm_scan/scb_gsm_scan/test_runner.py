@@ -0,0 +1,23 @@
+"""
+Lanceur des tests (TEST_RUNNER).
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    DiscoverRunner sans mesure Server-Timing (scb_gsm_scan.timing), quel
+    que soit l'environnement (.env, DEBUG) : ni wrapper SQL sur les
+    connexions, ni lignes JSON dans la sortie. ServerTimingTestCase la
+    réactive pour ses propres tests.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._settings = override_settings(GSM_SERVER_TIMING=False)
+        self._settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._settings.disable()
+        super().teardown_test_environment(**kwargs)
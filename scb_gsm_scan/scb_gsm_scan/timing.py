@@ -0,0 +1,217 @@
+"""
+Temps passés par requête, exposés en en-têtes Server-Timing.
+
+ServerTimingMiddleware ouvre, pour chaque requête échantillonnée
+(GSM_SERVER_TIMING_SAMPLE_RATE), un relevé porté par une ContextVar : il
+suit la requête dans le code synchrone comme asynchrone (sync_to_async
+copie le contexte). Sont relevés :
+
+- ``db`` : nombre et durée des requêtes SQL (execute_wrapper posé sur
+  chaque connexion à sa création, GSM_SERVER_TIMING_SQL) ;
+- ``auth`` : authentification JWT (requête de l'utilisateur comprise) ;
+- ``serialize`` : sérialisation des objets de la réponse ;
+- ``ingest.*`` : étapes d'un import (validate, read, clean, create,
+  insert) ;
+- ``total`` : durée de la requête vue par le middleware.
+
+Les mesures se recouvrent (le SQL de l'authentification compte aussi dans
+``db``). Elles sont envoyées dans l'en-tête Server-Timing
+(GSM_SERVER_TIMING_HEADER) et journalisées en une ligne JSON sur le logger
+``scb_gsm_scan.timing`` pour les requêtes plus lentes que
+GSM_SERVER_TIMING_LOG_MIN_MS. Une réponse en flux n'est mesurée que
+jusqu'à son premier octet.
+
+Hors requête échantillonnée, span() et le wrapper SQL se limitent à la
+lecture de la ContextVar ; GSM_SERVER_TIMING=False retire le middleware.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.serializers import ListSerializer
+import json
+import logging
+import random
+import time
+
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('server_timing', default=None)
+
+
+class RequestTimings:
+    """
+    Mesures d'une requête : {nom: [durée (s), nombre]}.
+    """
+
+    def __init__(self, sql=True):
+        self.sql = sql
+        self.metrics = {}
+        self.start = time.perf_counter()
+        self._open = set()
+
+    def add(self, name, seconds, count=1):
+        metric = self.metrics.setdefault(name, [0.0, 0])
+        metric[0] += seconds
+        metric[1] += count
+
+    def stop(self):
+        self.add('total', time.perf_counter() - self.start)
+
+    def header(self):
+        """
+        Valeur de l'en-tête Server-Timing (durées en ms).
+        """
+        entries = []
+        for name, (seconds, count) in self.metrics.items():
+            entry = f'{name};dur={seconds * 1000:.1f}'
+            if name == 'db':
+                entry += f';desc="{count} queries"'
+            entries.append(entry)
+        return ', '.join(entries)
+
+    def as_dict(self):
+        return {
+            name: {'ms': round(seconds * 1000, 3), 'count': count}
+            for name, (seconds, count) in self.metrics.items()
+        }
+
+
+def current():
+    """
+    Relevé de la requête en cours, None hors requête échantillonnée.
+    """
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """
+    Ajoute la durée du bloc à la mesure ``name`` de la requête en cours.
+    Un bloc imbriqué dans un bloc de même nom n'est pas compté deux fois.
+    """
+    timings = _current.get()
+    if timings is None or name in timings._open:
+        yield
+        return
+    timings._open.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._open.discard(name)
+        timings.add(name, time.perf_counter() - start)
+
+
+class TimedSerializerMixin:
+    """
+    Compte la sérialisation dans la mesure ``serialize``. Seuls les objets
+    de premier niveau sont chronométrés : les serializers imbriqués (et
+    leurs lignes) sont inclus dans leur parent, sans coût par ligne.
+    """
+
+    def to_representation(self, instance):
+        parent = self.parent
+        if parent is not None and (parent.parent is not None or not isinstance(parent, ListSerializer)):
+            return super().to_representation(instance)
+        with span('serialize'):
+            return super().to_representation(instance)
+
+
+# --- SQL ---
+
+def _execute(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None or not timings.sql:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('db', time.perf_counter() - start)
+
+
+def instrument(connection):
+    """
+    Pose le wrapper SQL sur la connexion (receveur connection_created de
+    gsm_coverage.signals).
+    """
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+# --- Middleware ---
+
+class ServerTimingMiddleware:
+    """
+    Relève les temps des requêtes échantillonnées ; en-tête Server-Timing
+    et ligne de journal JSON.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.GSM_SERVER_TIMING:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = settings.GSM_SERVER_TIMING_SAMPLE_RATE
+        self.sql = settings.GSM_SERVER_TIMING_SQL
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def start(self):
+        """
+        Relevé d'une requête échantillonnée, None sinon.
+        """
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return None
+        return RequestTimings(sql=self.sql)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = self.start()
+        if timings is None:
+            return self.get_response(request)
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = self.start()
+        if timings is None:
+            return await self.get_response(request)
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        timings.stop()
+        if settings.GSM_SERVER_TIMING_HEADER:
+            header = timings.header()
+            if response.has_header('Server-Timing'):
+                header = f"{response['Server-Timing']}, {header}"
+            response['Server-Timing'] = header
+            if settings.GSM_SERVER_TIMING_ALLOW_ORIGINS:
+                # Durées lisibles par le front (PerformanceResourceTiming) depuis ces origines
+                response['Timing-Allow-Origin'] = ', '.join(settings.GSM_SERVER_TIMING_ALLOW_ORIGINS)
+        total_ms = timings.metrics['total'][0] * 1000
+        if total_ms >= settings.GSM_SERVER_TIMING_LOG_MIN_MS and logger.isEnabledFor(logging.INFO):
+            match = request.resolver_match
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'timings': timings.as_dict(),
+            }
+            logger.info(json.dumps(record, separators=(',', ':')), extra={'server_timing': record})
+        return response
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'scb_gsm_scan.settings')
 
 application = get_wsgi_application()
+
+# Reprend les imports laissés en attente ou interrompus par le processus précédent
+from gsm_coverage import jobs  # noqa: E402
+
+jobs.wake()